@@ -0,0 +1,281 @@
+import os
+import csv
+import time
+import shutil
+import logging
+import tempfile
+import threading
+from sqlalchemy import bindparam, create_engine, text
+from sqlalchemy.pool import NullPool
+
+try:
+    import duckdb_engine
+except ImportError:
+    duckdb_engine = None
+
+logger = logging.getLogger(__name__)
+
+# DuckDB file the analytics tables are copied to after every load; unset disables the mirror
+MIRROR_PATH = os.environ.get("ANALYTICS_MIRROR_PATH")
+
+# Tables copied to the mirror. Sketches are merged in Python, and RFM snapshots can be built by
+# rfm_snapshots.py between loads and are looked up on the primary, so queries reading those stay there.
+MIRRORED_TABLES = (
+    "categories", "products", "customers", "orders", "order_items", "inventory", "data_version",
+    "daily_product_sales", "daily_category_sales", "customer_first_purchases", "cohort_retention",
+    "product_sales_velocity", "low_stock_alerts",
+)
+
+# Rows read from the primary database and spooled to DuckDB per batch
+COPY_BATCH_ROWS = 50000
+
+# Changed keys of a table an incremental refresh replaces row by row; a table with more is copied whole
+DELTA_MAX_KEYS = 50000
+
+# Keys per IN list when reading changed rows from the primary database, within SQLite's bind limit
+KEY_BATCH = 500
+
+# Spooled CSV marker for NULL, so empty strings survive the copy
+CSV_NULL = "\\N"
+
+_refresh_lock = threading.Lock()
+
+class AnalyticsMirror:
+    """A DuckDB copy of the analytics tables that registry queries read when it holds the current data.
+
+    Each refresh builds a new file beside the mirror and renames it into place, so readers never see a
+    half-copied mirror and the loader never waits on them. Every read opens its own read-only
+    connection, which picks up the newest file.
+    """
+
+    def __init__(self, path):
+        from query_registry import QueryRegistry
+
+        self.path = os.path.abspath(path)
+        self.registry = QueryRegistry()
+        self.queries = set()
+        self.engine = None
+        self._version = None
+        self._lock = threading.Lock()
+
+    def configure(self, hot_reload=False):
+        """Compile the registry for DuckDB and note which queries read only mirrored tables"""
+        from app import db
+        from connections import apply_duckdb_settings, duckdb_settings
+        from sql_dialects import referenced_tables
+
+        self.registry.configure("duckdb", hot_reload=hot_reload)
+        self.registry.load_all()
+        self.queries = {
+            name for name in self.registry.names()
+            if referenced_tables(self.registry.get(name).sql) & set(db.metadata.tables) <= set(MIRRORED_TABLES)
+        }
+        self.engine = create_engine(f"duckdb:///{self.path}", poolclass=NullPool, connect_args={"read_only": True})
+        apply_duckdb_settings(self.engine, duckdb_settings())
+
+    def version(self):
+        """Data version the mirror file was copied at, or None before the first refresh"""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        identity = (stat.st_ino, stat.st_mtime_ns)
+        with self._lock:
+            if self._version is not None and self._version[0] == identity:
+                return self._version[1]
+        with self.engine.connect() as connection:
+            version = connection.execute(text("SELECT version FROM data_version WHERE id = 1")).scalar()
+        with self._lock:
+            self._version = (identity, version)
+        return version
+
+    def serves(self, name):
+        """Whether the query reads only mirrored tables and the mirror holds the current data version"""
+        from query_cache import query_cache
+
+        if name not in self.queries:
+            return False
+        try:
+            return self.version() == query_cache.data_version()[0]
+        except Exception as e:
+            logger.warning(f"Analytics mirror unavailable: {str(e)}")
+            return False
+
+def analytics_source(name):
+    """The registry and engine a registry query runs on: the mirror when it serves the query, else (registry, None)"""
+    from flask import current_app
+    from query_registry import query_registry
+
+    mirror = current_app.extensions.get("analytics_mirror")
+    if mirror is not None and mirror.serves(name):
+        return mirror.registry, mirror.engine
+    return query_registry, None
+
+def _select(table, where=""):
+    """SELECT of a table's columns on the primary database, typed so SQLite's text dates and integer
+    booleans come back as Python values"""
+    from app import db
+    from db_utils import get_db_dialect, translate_sql
+
+    columns = list(db.metadata.tables[table].columns)
+    names = ", ".join(column.name for column in columns)
+    return db.text(translate_sql(f"SELECT {names} FROM {table}{where}", get_db_dialect())).columns(*columns)
+
+def _copy_table(table, target):
+    """Stream one table from the primary database into the same-named DuckDB table"""
+    from app import db
+
+    columns = db.metadata.tables[table].columns
+    definitions = ", ".join(f"{column.name} {column.type.compile(dialect=target.dialect)}" for column in columns)
+    # Plain columnar tables: keys and constraints were enforced by the primary database
+    target.exec_driver_sql(f"CREATE TABLE {table} ({definitions})")
+    return _append_rows(table, target, _select(table))
+
+def _append_rows(table, target, statement, params=None):
+    """Spool the rows of a primary-database SELECT into a DuckDB table through CSV batches"""
+    from app import db
+
+    result = db.session.execute(statement.execution_options(yield_per=COPY_BATCH_ROWS), params or {})
+    count = 0
+    try:
+        for batch in result.partitions():
+            with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="", delete=False) as spool:
+                writer = csv.writer(spool)
+                for row in batch:
+                    writer.writerow([CSV_NULL if value is None else value for value in row])
+            try:
+                target.exec_driver_sql(
+                    f"COPY {table} FROM '{spool.name}' (FORMAT csv, HEADER false, NULL '{CSV_NULL}')"
+                )
+            finally:
+                os.remove(spool.name)
+            count += len(batch)
+    finally:
+        result.close()
+    return count
+
+def _replace_rows(table, target, change):
+    """Bring one table of a copied mirror up to date: whole, or only the rows with the changed keys"""
+    if change is None or len(change[1]) > DELTA_MAX_KEYS:
+        target.exec_driver_sql(f"DROP TABLE {table}")
+        return _copy_table(table, target)
+
+    column, keys = change
+    keys = sorted(str(key) for key in keys)
+    with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="", delete=False) as spool:
+        csv.writer(spool).writerows([key] for key in keys)
+    try:
+        # Keys are compared as text, so dates match their ISO strings
+        target.exec_driver_sql(
+            f"DELETE FROM {table} WHERE CAST({column} AS VARCHAR) IN "
+            f"(SELECT key FROM read_csv('{spool.name}', header = false, columns = {{'key': 'VARCHAR'}}))"
+        )
+    finally:
+        os.remove(spool.name)
+
+    statement = _select(table, f" WHERE {column} IN :keys").bindparams(bindparam("keys", expanding=True))
+    return sum(
+        _append_rows(table, target, statement, {"keys": keys[start:start + KEY_BATCH]})
+        for start in range(0, len(keys), KEY_BATCH)
+    )
+
+def _copy_mirror_at(path, building, version):
+    """Copy the mirror file to building if it holds the given data version; False when it does not"""
+    if not os.path.exists(path):
+        return False
+    # A byte copy: readers keep using the current file until the rename
+    shutil.copyfile(path, building)
+    engine = create_engine(f"duckdb:///{building}", poolclass=NullPool)
+    try:
+        with engine.connect() as target:
+            copied_version = target.exec_driver_sql("SELECT version FROM data_version WHERE id = 1").scalar()
+    finally:
+        engine.dispose()
+    if copied_version == version:
+        return True
+    for stale in (building, building + ".wal"):
+        if os.path.exists(stale):
+            os.remove(stale)
+    return False
+
+def refresh_analytics_mirror(path=None, changes=None):
+    """Bring the DuckDB mirror up to date with the primary database and swap the new file into place.
+
+    Without changes every mirrored table is copied into a new file, which takes time in proportion to
+    the whole history. An incremental load passes changes, mapping each table it changed to None (copy
+    it whole) or (key column, changed key values): the current mirror file is copied byte for byte and
+    only those tables and rows are replaced, provided the file holds the data version just before the
+    load. Otherwise, for instance after a failed refresh, the mirror is rebuilt in full.
+    """
+    from db_utils import get_db_dialect, get_data_version_state
+
+    path = path or MIRROR_PATH
+    if not path or get_db_dialect() == "duckdb":
+        return None
+    if duckdb_engine is None:
+        raise ImportError("The analytics mirror requires duckdb and duckdb-engine")
+    path = os.path.abspath(path)
+    building = path + ".building"
+
+    with _refresh_lock:
+        started = time.perf_counter()
+        for stale in (building, building + ".wal"):
+            if os.path.exists(stale):
+                os.remove(stale)
+        version = get_data_version_state()[0]
+        incremental = changes is not None and _copy_mirror_at(path, building, version - 1)
+        engine = create_engine(f"duckdb:///{building}", poolclass=NullPool)
+        rows = {}
+        try:
+            with engine.begin() as target:
+                for table in MIRRORED_TABLES:
+                    if not incremental:
+                        rows[table] = _copy_table(table, target)
+                    elif table in changes or table == "data_version":
+                        rows[table] = _replace_rows(table, target, changes.get(table))
+            with engine.connect() as target:
+                # Fold the write-ahead log into the file before it is renamed
+                target.exec_driver_sql("CHECKPOINT")
+        finally:
+            engine.dispose()
+        os.replace(building, path)
+
+    elapsed = time.perf_counter() - started
+    kind = "incrementally" if incremental else "in full"
+    logger.info(f"Analytics mirror refreshed {kind} with {sum(rows.values())} rows in {elapsed:.2f}s")
+    return {"path": path, "rows": rows, "incremental": incremental, "seconds": round(elapsed, 3)}
+
+def init_analytics_mirror(app):
+    """Serve registry queries from the DuckDB mirror at ANALYTICS_MIRROR_PATH, when one is configured"""
+    from db_utils import get_db_dialect
+    from query_registry import query_registry
+
+    app.extensions["analytics_mirror"] = None
+    if not MIRROR_PATH:
+        return
+    if get_db_dialect() == "duckdb":
+        logger.warning("ANALYTICS_MIRROR_PATH ignored: the primary database is DuckDB already")
+        return
+    if duckdb_engine is None:
+        raise ImportError("The analytics mirror requires duckdb and duckdb-engine")
+    mirror = AnalyticsMirror(MIRROR_PATH)
+    mirror.configure(hot_reload=query_registry.hot_reload)
+    app.extensions["analytics_mirror"] = mirror
+    logger.info(f"Analytics mirror at {mirror.path} serves {len(mirror.queries)} queries")
+
+if __name__ == "__main__":
+    import argparse
+    from app import app
+
+    parser = argparse.ArgumentParser(description="Rebuild the DuckDB analytics mirror from the primary database")
+    parser.add_argument("--path", default=MIRROR_PATH, help="Mirror file (default: ANALYTICS_MIRROR_PATH)")
+    args = parser.parse_args()
+    if not args.path:
+        parser.error("no mirror path: pass --path or set ANALYTICS_MIRROR_PATH")
+
+    with app.app_context():
+        result = refresh_analytics_mirror(args.path)
+        if result is None:
+            parser.error("the primary database is DuckDB already")
+        for table, count in result["rows"].items():
+            print(f"{table}: {count} rows")
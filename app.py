@@ -4,9 +4,10 @@ from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
 from sqlalchemy.orm import DeclarativeBase
 from werkzeug.middleware.proxy_fix import ProxyFix
+from connections import engine_options, init_connections
 
-# Configure logging
-logging.basicConfig(level=logging.DEBUG)
+# Configure logging; per-query and per-route timings are logged at DEBUG
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper())
 
 class Base(DeclarativeBase):
     pass
@@ -23,21 +24,49 @@ def create_app():
     # Database configuration
     database_url = os.environ.get("DATABASE_URL", "sqlite:///analytics.db")
     app.config["SQLALCHEMY_DATABASE_URI"] = database_url
-    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
-        "pool_recycle": 300,
-        "pool_pre_ping": True,
-    }
+    app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(database_url)
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
     
     # Initialize extensions
     db.init_app(app)
     
     with app.app_context():
+        # SQLite pragmas and the read-only engine for analytics queries
+        init_connections(app)
+        
         # Import models
         import models
         
         # Create tables
         db.create_all()
+
+        # Upgrade tables created by earlier versions, which create_all leaves as they are
+        from migrations import init_migrations
+        init_migrations(app)
+
+        # Default PostgreSQL partitions, or the SQLite views over yearly archives
+        from partitions import init_partitions
+        init_partitions(app)
+        
+        # Compile analytics queries for the active dialect
+        from query_registry import init_query_registry
+        init_query_registry(app)
+        
+        # DuckDB copy of the analytics tables, rebuilt after each load
+        from analytics_mirror import init_analytics_mirror
+        init_analytics_mirror(app)
+        
+        # Optional NumPy engine for RFM, cohort and repeat-rate queries
+        from columnar_engine import init_columnar_engine
+        init_columnar_engine(app)
+        
+        # Latency histograms and response sizes for /metrics
+        from metrics import init_metrics
+        init_metrics(app)
+        
+        # ETags, 304s and brotli/gzip compression for analytics responses
+        from responses import init_responses
+        init_responses(app)
         
         # Register routes
         from routes import register_routes
@@ -0,0 +1,297 @@
+import os
+import calendar
+import logging
+import threading
+from decimal import Decimal, ROUND_HALF_UP
+from rfm_snapshots import rfm_segment
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency, only needed when ANALYTICS_ENGINE=columnar
+    np = None
+
+logger = logging.getLogger(__name__)
+
+SECONDS_PER_DAY = 86400
+
+# Queries this engine can answer, by registry name
+SUPPORTED_QUERIES = ("rfm", "cohort_retention", "repeat_rate")
+
+def _sql_round(value, digits):
+    """ROUND(value, digits) as the database does it: half away from zero on the stored double"""
+    return float(Decimal(float(value)).quantize(Decimal(1).scaleb(-digits), rounding=ROUND_HALF_UP))
+
+def _date_bound(date_string):
+    """Epoch seconds of midnight on date_string, as compared against order_date
+
+    order_date >= date_string holds exactly when ts >= bound, and
+    order_date <= date_string exactly when ts < bound: a timestamp on the
+    day itself sorts after the bare date. An overflowing day such as
+    2024-02-31 still sorts before the next month, so it is clamped there.
+    """
+    year, month, day = (int(part) for part in date_string[:10].split("-"))
+    day = min(day, calendar.monthrange(year, month)[1] + 1)
+    return int(np.datetime64(f"{year:04d}-{month:02d}-01", "s").astype(np.int64)) + (day - 1) * SECONDS_PER_DAY
+
+def _month_string(month_index):
+    """Format months since 1970-01 the way the SQL returns a month, e.g. 2024-03-01"""
+    return f"{1970 + month_index // 12:04d}-{month_index % 12 + 1:02d}-01"
+
+def _ntile(order, buckets):
+    """NTILE(buckets) for rows visited in the given order; returns the bucket of each row"""
+    n = len(order)
+    size, remainder = divmod(n, buckets)
+    positions = np.arange(n)
+    big = remainder * (size + 1)
+    tiles = np.where(
+        positions < big,
+        positions // (size + 1),
+        remainder + (positions - big) // max(size, 1)
+    ) + 1
+    result = np.empty(n, dtype=np.int64)
+    result[order] = tiles
+    return result
+
+class ColumnarStore:
+    """orders and order_items held as compact NumPy columns"""
+
+    def __init__(self, customer_ids, order_customer, order_ts, order_paid, item_order, item_revenue):
+        self.customer_ids = customer_ids          # sorted unique customer ids; codes index into it
+        self.order_customer = order_customer      # int32 customer code per order
+        self.order_ts = order_ts                  # int64 epoch seconds per order
+        self.order_day = order_ts // SECONDS_PER_DAY
+        self.order_month = order_ts.astype("datetime64[s]").astype("datetime64[M]").astype(np.int64)
+        self.order_paid = order_paid              # bool, payment_status = 'paid'
+        self.item_order = item_order              # int64 order row per order item
+        self.item_revenue = item_revenue          # float64 unit_price * quantity - discount
+
+        # First paid order month per customer (what customer_first_purchases holds)
+        first_ts = np.full(len(customer_ids), np.iinfo(np.int64).max, dtype=np.int64)
+        np.minimum.at(first_ts, order_customer[order_paid], order_ts[order_paid])
+        self.has_paid_order = first_ts != np.iinfo(np.int64).max
+        self.cohort_month = np.full(len(customer_ids), -1, dtype=np.int64)
+        self.cohort_month[self.has_paid_order] = (
+            first_ts[self.has_paid_order].astype("datetime64[s]").astype("datetime64[M]").astype(np.int64)
+        )
+
+    @classmethod
+    def load(cls):
+        """Read orders and order_items from the database into column arrays"""
+        from app import db
+        from db_utils import translate_sql, get_db_dialect
+
+        # Translated so SQLite also reads the yearly archives
+        dialect = get_db_dialect()
+        orders = db.session.execute(db.text(translate_sql(
+            "SELECT order_id, customer_id, order_date, payment_status FROM orders", dialect
+        ))).fetchall()
+        order_ids = np.array([row[0] for row in orders], dtype=object)
+        customer_ids, order_customer = np.unique(
+            np.array([row[1] for row in orders], dtype=str), return_inverse=True
+        )
+        order_ts = np.array(
+            [str(row[2])[:19] for row in orders], dtype="datetime64[s]"
+        ).astype(np.int64)
+        order_paid = np.array([row[3] == 'paid' for row in orders], dtype=bool)
+
+        order_index = {order_id: i for i, order_id in enumerate(order_ids)}
+        items = db.session.execute(db.text(translate_sql(
+            "SELECT order_id, (unit_price * quantity) - discount FROM order_items", dialect
+        ))).fetchall()
+        item_order = np.array([order_index[row[0]] for row in items], dtype=np.int64)
+        item_revenue = np.array([float(row[1]) for row in items], dtype=np.float64)
+
+        logger.info(f"Columnar store loaded {len(orders)} orders and {len(items)} order items")
+        return cls(
+            customer_ids, order_customer.astype(np.int32), order_ts, order_paid, item_order, item_revenue
+        )
+
+    def rfm(self, as_of_date):
+        """Same rows, scores and order as rfm.sql"""
+        as_of = _date_bound(as_of_date)
+        as_of_day = as_of // SECONDS_PER_DAY
+        n_customers = len(self.customer_ids)
+
+        order_selected = self.order_paid & (self.order_ts < as_of)
+        item_selected = order_selected[self.item_order]
+        items = self.item_order[item_selected]
+        item_customer = self.order_customer[items]
+
+        monetary = np.bincount(item_customer, weights=self.item_revenue[item_selected], minlength=n_customers)
+        joined_orders = np.unique(items)
+        frequency = np.bincount(self.order_customer[joined_orders], minlength=n_customers)
+        last_day = np.full(n_customers, np.iinfo(np.int64).min, dtype=np.int64)
+        np.maximum.at(last_day, self.order_customer[joined_orders], self.order_day[joined_orders])
+
+        customers = np.nonzero((frequency > 0) & (monetary > 0))[0]
+        recency = (as_of_day - last_day[customers]).astype(np.int64)
+        frequency = frequency[customers]
+        monetary = monetary[customers]
+
+        # Customer codes follow customer_id order, the NTILE tie-breaker
+        r_score = 6 - _ntile(np.lexsort((customers, recency)), 5)
+        f_score = _ntile(np.lexsort((customers, frequency)), 5)
+        m_score = _ntile(np.lexsort((customers, monetary)), 5)
+        rfm_total = r_score + f_score + m_score
+        monetary_rounded = np.array([_sql_round(value, 2) for value in monetary])
+
+        rows = []
+        for i in np.lexsort((customers, -monetary_rounded, -rfm_total)):
+            r, f, m = int(r_score[i]), int(f_score[i]), int(m_score[i])
+            rows.append({
+                "customer_id": str(self.customer_ids[customers[i]]),
+                "recency_days": int(recency[i]),
+                "frequency": int(frequency[i]),
+                "monetary": float(monetary_rounded[i]),
+                "r_score": r,
+                "f_score": f,
+                "m_score": m,
+                "rfm_total": r + f + m,
+                "segment": rfm_segment(r, f, m),
+            })
+        return rows
+
+    def cohort_retention(self, start_date, end_date, horizon):
+        """Same rows and order as cohort_retention.sql"""
+        cohort_strings = {}
+        for month in np.unique(self.cohort_month[self.has_paid_order]):
+            label = _month_string(int(month))
+            if start_date <= label <= end_date:
+                cohort_strings[int(month)] = label
+        if not cohort_strings:
+            return []
+
+        in_cohort = np.isin(self.cohort_month, list(cohort_strings))
+        cohort_sizes = np.bincount(self.cohort_month[in_cohort] - min(cohort_strings))
+
+        selected = self.order_paid & in_cohort[self.order_customer]
+        customers = self.order_customer[selected]
+        cohorts = self.cohort_month[customers]
+        months_since = self.order_month[selected] - cohorts
+        keep = months_since <= horizon
+
+        activity = np.unique(
+            np.stack([cohorts[keep], months_since[keep], customers[keep].astype(np.int64)]), axis=1
+        )
+        cells, counts = np.unique(activity[:2], axis=1, return_counts=True)
+
+        rows = []
+        for (cohort, since), active in zip(cells.T, counts):
+            size = int(cohort_sizes[cohort - min(cohort_strings)])
+            rows.append({
+                "cohort_month": cohort_strings[int(cohort)],
+                "months_since": int(since),
+                "active_customers": int(active),
+                "cohort_size": size,
+                "retention_rate": _sql_round(active * 100.0 / size, 2),
+            })
+        return rows
+
+    def repeat_rate(self, start_date, end_date):
+        """Same rows and order as repeat_rate.sql"""
+        selected = (
+            self.order_paid
+            & (self.order_ts >= _date_bound(start_date))
+            & (self.order_ts < _date_bound(end_date))
+        )
+        customers = self.order_customer[selected].astype(np.int64)
+        months = self.order_month[selected]
+        repeat = self.cohort_month[customers] < months
+
+        pairs = np.unique(np.stack([months, customers, repeat.astype(np.int64)]), axis=1)
+        rows = []
+        for month in np.unique(pairs[0]):
+            in_month = pairs[0] == month
+            total = int(np.count_nonzero(in_month))
+            repeat_customers = int(np.count_nonzero(pairs[2][in_month]))
+            rows.append({
+                "month": _month_string(int(month)),
+                "total_customers": total,
+                "repeat_customers": repeat_customers,
+                "repeat_rate": _sql_round(repeat_customers * 100.0 / total, 2) if total > 0 else 0,
+            })
+        return rows
+
+_store = None
+_store_version = None
+_store_lock = threading.Lock()
+
+def get_store():
+    """Return the column store, reloading it when the data version has changed"""
+    global _store, _store_version
+    from db_utils import get_data_version
+
+    version = get_data_version()
+    with _store_lock:
+        if _store is None or _store_version != version:
+            _store = ColumnarStore.load()
+            _store_version = version
+        return _store
+
+def execute_columnar(name, params):
+    """Answer a supported registry query from the column store"""
+    store = get_store()
+    if name == "rfm":
+        return store.rfm(params["as_of_date"])
+    if name == "cohort_retention":
+        return store.cohort_retention(params["start_date"], params["end_date"], int(params["horizon"]))
+    if name == "repeat_rate":
+        return store.repeat_rate(params["start_date"], params["end_date"])
+    raise ValueError(f"Columnar engine does not support query {name}")
+
+def init_columnar_engine(app):
+    """Select the analytics engine from ANALYTICS_ENGINE (sql or columnar)"""
+    engine = os.environ.get("ANALYTICS_ENGINE", "sql").lower()
+    if engine not in ("sql", "columnar"):
+        raise ValueError(f"Unknown ANALYTICS_ENGINE: {engine}")
+    if engine == "columnar" and np is None:
+        raise ImportError("ANALYTICS_ENGINE=columnar requires numpy")
+    app.config["ANALYTICS_ENGINE"] = engine
+    logger.info(f"Analytics engine: {engine}")
+
+def _comparable(row):
+    """Normalize a result row so SQL and columnar output compare equal across drivers"""
+    normalized = {}
+    for key, value in row.items():
+        if key in ("month", "cohort_month"):
+            value = str(value)[:10]
+        elif isinstance(value, (int, float, Decimal)):
+            value = float(value)
+        normalized[key] = value
+    return normalized
+
+def verify(params_by_query):
+    """Compare columnar and SQL results; returns {query: number of mismatched rows}"""
+    from db_utils import execute_query
+    from query_registry import query_registry
+
+    mismatches = {}
+    for name, params in params_by_query.items():
+        sql_rows = execute_query(query_registry.statement(name, params), params)
+        columnar_rows = execute_columnar(name, params)
+        bad = abs(len(sql_rows) - len(columnar_rows))
+        for sql_row, columnar_row in zip(sql_rows, columnar_rows):
+            if _comparable(sql_row) != _comparable(columnar_row):
+                bad += 1
+        mismatches[name] = bad
+    return mismatches
+
+if __name__ == "__main__":
+    import argparse
+    from app import app
+
+    parser = argparse.ArgumentParser(description="Check the columnar engine against the SQL queries")
+    parser.add_argument("--as-of", default="2024-12-31")
+    parser.add_argument("--start", default="2024-01-01")
+    parser.add_argument("--end", default="2024-12-31")
+    parser.add_argument("--horizon", type=int, default=12)
+    args = parser.parse_args()
+
+    with app.app_context():
+        results = verify({
+            "rfm": {"as_of_date": args.as_of},
+            "cohort_retention": {"start_date": args.start, "end_date": args.end, "horizon": args.horizon},
+            "repeat_rate": {"start_date": args.start, "end_date": args.end},
+        })
+        for name, bad in results.items():
+            print(f"{name}: {'OK' if bad == 0 else f'{bad} mismatched rows'}")
@@ -0,0 +1,267 @@
+import os
+import time
+import logging
+import threading
+import zlib
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import OperationalError
+
+logger = logging.getLogger(__name__)
+
+# SQLite pragmas applied to every new connection: (pragma, environment variable, default)
+SQLITE_PRAGMAS = [
+    ("journal_mode", "SQLITE_JOURNAL_MODE", "WAL"),
+    ("synchronous", "SQLITE_SYNCHRONOUS", "NORMAL"),
+    ("busy_timeout", "SQLITE_BUSY_TIMEOUT_MS", "5000"),
+    ("mmap_size", "SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)),
+    ("cache_size", "SQLITE_CACHE_SIZE", "-65536"),
+    ("temp_store", "SQLITE_TEMP_STORE", "MEMORY"),
+]
+
+# Pragmas a read-only connection cannot or need not set
+SQLITE_WRITER_PRAGMAS = {"journal_mode", "synchronous"}
+
+# DuckDB settings applied to every new connection: (setting, environment variable, default)
+DUCKDB_SETTINGS = [
+    # PostgreSQL truncates integer / integer, and the queries are written for PostgreSQL
+    ("integer_division", None, "true"),
+    ("threads", "DUCKDB_THREADS", ""),
+    ("memory_limit", "DUCKDB_MEMORY_LIMIT", ""),
+]
+
+# Queries run by the reader threads of the benchmark, with dashboard-like params
+BENCHMARK_QUERIES = [
+    ("kpi", {"target_date": "2024-01-15", "next_date": "2024-01-16"}),
+    ("kpi_series", {"start_date": "2024-01-01", "end_date": "2024-04-01"}),
+    ("revenue_by_month_category", {"start_date": "2024-01-01", "end_date": "2024-12-31"}),
+    ("rfm", {"as_of_date": "2024-12-31"}),
+    ("top_products", {"start_date": "2024-01-01", "end_date": "2024-12-31", "limit_n": 10}),
+    ("order_funnel", {"start_date": "2024-01-01", "end_date": "2024-12-31"}),
+]
+
+def _is_memory_sqlite(database_url):
+    return database_url.startswith("sqlite") and (database_url in ("sqlite://", "sqlite:///") or ":memory:" in database_url)
+
+def _postgres_options(read_only=False):
+    """libpq startup options for statement timeouts and read-only sessions"""
+    settings = []
+    timeout = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", 0))
+    if timeout:
+        settings.append(f"-c statement_timeout={timeout}")
+    if read_only:
+        settings.append("-c default_transaction_read_only=on")
+    return " ".join(settings)
+
+def engine_options(database_url):
+    """SQLAlchemy engine options for the primary (read-write) engine"""
+    options = {
+        "pool_recycle": 300,
+        "pool_pre_ping": True,
+    }
+    if not _is_memory_sqlite(database_url):
+        options["pool_size"] = int(os.environ.get("DB_POOL_SIZE", 5))
+        options["max_overflow"] = int(os.environ.get("DB_MAX_OVERFLOW", 10))
+        options["pool_timeout"] = float(os.environ.get("DB_POOL_TIMEOUT", 30))
+    if database_url.startswith("postgresql"):
+        startup = _postgres_options()
+        if startup:
+            options["connect_args"] = {"options": startup}
+    return options
+
+def sqlite_pragmas(read_only=False):
+    """Configured (pragma, value) pairs, skipping any set to an empty string"""
+    pragmas = []
+    for pragma, variable, default in SQLITE_PRAGMAS:
+        value = os.environ.get(variable, default)
+        if value and not (read_only and pragma in SQLITE_WRITER_PRAGMAS):
+            pragmas.append((pragma, value))
+    if read_only:
+        pragmas.append(("query_only", "ON"))
+    return pragmas
+
+def sqlite_hashtext(value):
+    """Stand-in for PostgreSQL's hashtext(): a stable signed 32-bit hash of a string"""
+    if value is None:
+        return None
+    digest = zlib.crc32(value.encode("utf-8"))
+    return digest - (1 << 32) if digest >= 1 << 31 else digest
+
+def apply_sqlite_pragmas(engine, pragmas):
+    """Run the pragmas on every connection the engine opens, and register hashtext()"""
+    @event.listens_for(engine, "connect")
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in pragmas:
+            cursor.execute(f"PRAGMA {pragma} = {value}")
+        cursor.close()
+        # Used by the customer-hash sampling of approximate analytics
+        dbapi_connection.create_function("hashtext", 1, sqlite_hashtext, deterministic=True)
+
+def duckdb_settings():
+    """Configured (setting, value) pairs, skipping any set to an empty string"""
+    settings = []
+    for setting, variable, default in DUCKDB_SETTINGS:
+        value = os.environ.get(variable, default) if variable else default
+        if value:
+            settings.append((setting, value))
+    return settings
+
+def apply_duckdb_settings(engine, settings):
+    """Run SET for each setting on every connection the engine opens"""
+    @event.listens_for(engine, "connect")
+    def set_settings(dbapi_connection, connection_record):
+        for setting, value in settings:
+            dbapi_connection.execute(f"SET {setting} = '{value}'")
+
+def create_read_engine(engine):
+    """Open a separate read-only engine on the same database, or on DATABASE_READ_URL"""
+    url = engine.url
+    if url.get_backend_name() == "duckdb":
+        # One process cannot open a DuckDB file read-only while it holds it read-write;
+        # readers of the primary engine already see committed snapshots without blocking the loader
+        return None
+    if url.get_backend_name() == "sqlite":
+        if not url.database or url.database == ":memory:":
+            return None
+        read_engine = create_engine(
+            f"sqlite:///file:{url.database}?mode=ro&uri=true",
+            **engine_options(str(url))
+        )
+        apply_sqlite_pragmas(read_engine, sqlite_pragmas(read_only=True))
+        return read_engine
+
+    read_url = os.environ.get("DATABASE_READ_URL") or url.render_as_string(hide_password=False)
+    options = engine_options(read_url)
+    options["pool_size"] = int(os.environ.get("DB_READ_POOL_SIZE", options["pool_size"]))
+    options["connect_args"] = {"options": _postgres_options(read_only=True)}
+    return create_engine(read_url, **options)
+
+def init_connections(app):
+    """Tune the primary engine and open the read-only engine used by analytics queries"""
+    from app import db
+
+    engine = db.engine
+    if engine.url.get_backend_name() == "sqlite":
+        apply_sqlite_pragmas(engine, sqlite_pragmas())
+        # Connections opened before the listener existed miss the pragmas
+        engine.dispose()
+    elif engine.url.get_backend_name() == "duckdb":
+        apply_duckdb_settings(engine, duckdb_settings())
+        engine.dispose()
+
+    read_engine = None
+    if os.environ.get("DB_READ_ONLY_ANALYTICS", "true").lower() in ("1", "true", "yes"):
+        read_engine = create_read_engine(engine)
+    app.extensions["read_engine"] = read_engine
+    logger.info(f"Read-only analytics connections: {'on' if read_engine is not None else 'off'}")
+
+def read_bind():
+    """Engine for analytics reads in the current app, or None to use the session's default"""
+    from flask import current_app
+    return current_app.extensions.get("read_engine")
+
+def _percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+def _run_readers_and_writer(writer_engine, reader_engine, readers, seconds):
+    """Run reader threads against the registry queries while one thread keeps rewriting rows"""
+    from query_registry import query_registry
+
+    statements = [(query_registry.statement(name, params), params) for name, params in BENCHMARK_QUERIES]
+    stop = threading.Event()
+    lock = threading.Lock()
+    latencies = []
+    counts = {"reads": 0, "read_errors": 0, "writes": 0, "write_errors": 0}
+
+    def reader(offset):
+        i = offset
+        while not stop.is_set():
+            statement, params = statements[i % len(statements)]
+            i += 1
+            started = time.perf_counter()
+            try:
+                with reader_engine.connect() as connection:
+                    connection.execute(statement, params).fetchall()
+            except OperationalError:
+                with lock:
+                    counts["read_errors"] += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+                counts["reads"] += 1
+
+    def writer():
+        # Stands in for /load-data: rewrite the fact tables in one transaction per pass
+        while not stop.is_set():
+            try:
+                with writer_engine.begin() as connection:
+                    connection.execute(text("UPDATE orders SET payment_amount = payment_amount"))
+                    connection.execute(text("UPDATE order_items SET discount = discount"))
+                with lock:
+                    counts["writes"] += 1
+            except OperationalError:
+                with lock:
+                    counts["write_errors"] += 1
+
+    threads = [threading.Thread(target=writer)]
+    threads += [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    counts["reads_per_sec"] = round(counts["reads"] / seconds, 1)
+    counts["read_p50_ms"] = round(_percentile(latencies, 0.50) * 1000, 2)
+    counts["read_p99_ms"] = round(_percentile(latencies, 0.99) * 1000, 2)
+    return counts
+
+def benchmark(readers=8, seconds=5.0):
+    """Compare reader throughput with default connections and with the tuned connection layer"""
+    from app import db
+
+    url = db.engine.url.render_as_string(hide_password=False)
+    results = {}
+    # Changing the SQLite journal mode needs every other connection closed
+    db.session.remove()
+    db.engine.dispose()
+    if read_bind() is not None:
+        read_bind().dispose()
+
+    baseline = create_engine(url, pool_size=readers + 1, max_overflow=0)
+    if baseline.url.get_backend_name() == "sqlite":
+        with baseline.connect() as connection:
+            connection.exec_driver_sql("PRAGMA journal_mode = DELETE")
+    results["default"] = _run_readers_and_writer(baseline, baseline, readers, seconds)
+    baseline.dispose()
+
+    tuned = create_engine(url, **dict(engine_options(url), pool_size=readers + 1))
+    if tuned.url.get_backend_name() == "sqlite":
+        apply_sqlite_pragmas(tuned, sqlite_pragmas())
+    elif tuned.url.get_backend_name() == "duckdb":
+        apply_duckdb_settings(tuned, duckdb_settings())
+    read_engine = create_read_engine(tuned) or tuned
+    results["tuned"] = _run_readers_and_writer(tuned, read_engine, readers, seconds)
+    read_engine.dispose()
+    tuned.dispose()
+    return results
+
+if __name__ == "__main__":
+    import argparse
+    from app import app
+
+    parser = argparse.ArgumentParser(description="Benchmark concurrent readers during writes")
+    parser.add_argument("--readers", type=int, default=8, help="Concurrent reader threads")
+    parser.add_argument("--seconds", type=float, default=5.0, help="Duration of each run")
+    args = parser.parse_args()
+
+    with app.app_context():
+        for config, result in benchmark(args.readers, args.seconds).items():
+            print(
+                f"{config}: {result['reads_per_sec']} reads/sec, p50 {result['read_p50_ms']} ms, "
+                f"p99 {result['read_p99_ms']} ms, {result['read_errors']} read errors, {result['writes']} writes"
+            )
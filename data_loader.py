@@ -1,36 +1,598 @@
 import os
+import io
+import re
 import csv
+import time
+import hashlib
 import logging
+import tempfile
 from datetime import datetime
 
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:  # optional dependency, only needed for Parquet/Arrow ingest and export
+    pa = None
+
 logger = logging.getLogger(__name__)
 
+def _parse_date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+def _parse_datetime(value):
+    return datetime.strptime(value, '%Y-%m-%d %H:%M:%S') if value else None
+
+def _parse_bool(value):
+    return (value or 'true').lower() == 'true'
+
+def _parse_int(value):
+    return int(value) if value else None
+
+def _parse_float(value):
+    return float(value) if value else None
+
+def _parse_discount(value):
+    return float(value or 0)
+
+def _parse_str(value):
+    return value
+
+def _coerce(parse, value):
+    """Parse CSV text; values read from Parquet/Arrow are already typed"""
+    return parse(value) if value is None or isinstance(value, str) else value
+
+# Bulk load layout for each table, in dependency order:
+# (table, csv file, conflict key columns, [(column, parser), ...])
+BULK_TABLES = [
+    ("categories", "categories.csv", ["category_id"], [
+        ("category_id", _parse_int),
+        ("category_name", _parse_str),
+    ]),
+    ("products", "products.csv", ["product_id"], [
+        ("product_id", _parse_int),
+        ("category_id", _parse_int),
+        ("product_name", _parse_str),
+        ("unit_cost", _parse_float),
+        ("unit_price", _parse_float),
+        ("is_active", _parse_bool),
+    ]),
+    ("customers", "customers.csv", ["customer_id"], [
+        ("customer_id", _parse_str),
+        ("first_order_date", _parse_date),
+        ("last_order_date", _parse_date),
+        ("signup_date", _parse_date),
+        ("customer_city", _parse_str),
+        ("customer_state", _parse_str),
+        ("email", _parse_str),
+    ]),
+    ("orders", "orders.csv", ["order_id"], [
+        ("order_id", _parse_str),
+        ("customer_id", _parse_str),
+        ("order_date", _parse_datetime),
+        ("order_status", _parse_str),
+        ("payment_amount", _parse_float),
+        ("payment_status", _parse_str),
+    ]),
+    ("order_items", "order_items.csv", ["order_id", "line_number"], [
+        ("order_id", _parse_str),
+        ("line_number", _parse_int),
+        ("product_id", _parse_int),
+        ("quantity", _parse_int),
+        ("unit_price", _parse_float),
+        ("discount", _parse_discount),
+    ]),
+    ("inventory", "inventory.csv", ["product_id"], [
+        ("product_id", _parse_int),
+        ("on_hand_qty", _parse_int),
+        ("reorder_point", _parse_int),
+        ("reorder_qty", _parse_int),
+    ]),
+]
+
+# File extension for each source format; columnar files share the CSV's base name
+SOURCE_EXTENSIONS = {
+    "csv": ".csv",
+    "parquet": ".parquet",
+    "arrow": ".arrow",
+}
+
+# Columns copied from other tables once a table's rows are staged, rather than read from the source file
+DERIVED_COLUMNS = {
+    "order_items": [
+        ("order_date", "UPDATE {staging} SET order_date = "
+                       "(SELECT o.order_date FROM orders o WHERE o.order_id = {staging}.order_id)"),
+    ],
+}
+
+# Column referencing a parent table per child table; staged rows whose parent was never loaded are dropped
+PARENT_KEYS = {
+    "order_items": ("order_id", "orders"),
+}
+
+# Column whose maximum is kept as the table's high-water mark
+HIGH_WATER_COLUMNS = {
+    "orders": "order_date",
+}
+
+# Source rows read between progress reports
+PROGRESS_INTERVAL = 1000
+
+# Bytes before the stored file offset that must be unchanged for an append-only tail read
+TAIL_HASH_BYTES = 4096
+
+INDEX_PATTERN = re.compile(r"CREATE\s+INDEX\s+IF\s+NOT\s+EXISTS\s+(\w+)\s+ON\s+(\w+)", re.IGNORECASE)
+
 class DataLoader:
-    def __init__(self):
-        self.data_dir = "data"
+    def __init__(self, bulk=False, chunk_size=10000, incremental=False, source_format="csv", data_dir="data",
+                 progress=None, check_canceled=None):
+        if source_format not in SOURCE_EXTENSIONS:
+            raise ValueError(f"Unsupported source format: {source_format}")
+        if source_format != "csv" and pa is None:
+            raise ImportError(f"Loading {source_format} files requires pyarrow")
+        self.data_dir = data_dir
+        self.source_format = source_format
+        # Columnar sources are typed already and only go through the staging-table path
+        self.bulk = bulk or source_format != "csv"
+        self.chunk_size = chunk_size
+        self.incremental = incremental
+        # Called as progress(table, rows_done, rows_total) while each source file is read
+        self.progress = progress
+        # Called between load stages and staged chunks; raising from it stops the load there
+        self.check_canceled = check_canceled or (lambda: None)
+        self.stats = {}
+        self.rows_read = {}
+        self._watermarks = {}
+        self._affected_days = set()
+        self._affected_orders = set()
+        self._affected_customers = set()
+        # Incremental loads only: orders and customers read, and what each derived table refresh rewrote
+        self._read_orders = set()
+        self._read_customers = set()
+        self._refreshed = {}
         
     def load_all_data(self):
         """Load all CSV data into the database"""
         try:
             from app import db
             
-            # Load in dependency order
-            self.load_categories()
-            self.load_products()
-            self.load_customers()
-            self.load_orders()
-            self.load_order_items()
-            self.load_inventory()
+            if self.bulk:
+                self.load_all_bulk()
+            else:
+                # Load in dependency order
+                for load_table in (self.load_categories, self.load_products, self.load_customers,
+                                   self.load_orders, self.load_order_items, self.load_inventory):
+                    self.check_canceled()
+                    load_table()
+            
+            # Rows that landed in the live SQLite tables for an archived year move to that year's archive
+            from models import ARCHIVED
+            if ARCHIVED:
+                self.check_canceled()
+                from partitions import settle_archives
+                settle_archives()
             
             # Create indexes after loading data
+            self.check_canceled()
             self.create_indexes()
             
+            self.check_canceled()
+            self.refresh_derived_tables()
+            
+            # The last point a load stops at: the mirror below is refreshed from this load's data
+            self.check_canceled()
+            # Invalidate cached query results in every worker
+            from db_utils import bump_data_version
+            bump_data_version()
+            
+            # Analytics reads fall back to the primary database until the mirror holds this version;
+            # a failed refresh leaves the load in place
+            from analytics_mirror import refresh_analytics_mirror
+            try:
+                refresh_analytics_mirror(changes=self.mirror_changes() if self.incremental else None)
+            except Exception as e:
+                logger.error(f"Error refreshing analytics mirror: {str(e)}")
+            
             logger.info("All data loaded successfully")
             
         except Exception as e:
             logger.error(f"Error loading data: {str(e)}")
             raise
     
+    def load_all_bulk(self):
+        """Load every table through a staging table, with secondary indexes dropped"""
+        if not self.incremental:
+            # Rebuilding indexes only pays off when most of the table is rewritten
+            self.drop_indexes([table for table, _, _, _ in BULK_TABLES])
+        for table, filename, key_columns, columns in BULK_TABLES:
+            self.check_canceled()
+            self.bulk_load_table(table, filename, key_columns, columns)
+    
+    def bulk_load_table(self, table, filename, key_columns, columns):
+        """Stream a source file into a staging table in chunks, then upsert it into the target table"""
+        from app import db
+        from db_utils import get_db_dialect, translate_sql
+        from models import PARTITIONED
+        from partitions import PARTITIONED_TABLES, PARTITION_COLUMN, ensure_month_partitions
+        
+        filename = os.path.splitext(filename)[0] + SOURCE_EXTENSIONS[self.source_format]
+        filepath = os.path.join(self.data_dir, filename)
+        if not os.path.exists(filepath):
+            logger.warning(f"{table} file not found: {filepath}")
+            return
+        
+        derived = DERIVED_COLUMNS.get(table, [])
+        names = [name for name, _ in columns] + [name for name, _ in derived]
+        column_list = ", ".join(names)
+        staging = f"stg_{table}"
+        dialect = get_db_dialect()
+        partitioned = PARTITIONED and table in PARTITIONED_TABLES
+        if partitioned:
+            # Unique keys on a partitioned table must include the partition column
+            key_columns = key_columns + [PARTITION_COLUMN]
+        started = time.perf_counter()
+        count = 0
+        
+        try:
+            db.session.execute(db.text(f"DROP TABLE IF EXISTS {staging}"))
+            db.session.execute(db.text(
+                f"CREATE TEMP TABLE {staging} AS SELECT {column_list} FROM {table} WHERE 1 = 0"
+            ))
+            
+            chunk = []
+            rows = self._read_csv(table, filepath) if self.source_format == "csv" else self._read_columnar(table, filepath)
+            for row in rows:
+                chunk.append(row)
+                if len(chunk) >= self.chunk_size:
+                    count += self._stage_chunk(table, staging, columns, chunk, dialect)
+                    chunk = []
+                    self.check_canceled()
+            if chunk:
+                count += self._stage_chunk(table, staging, columns, chunk, dialect)
+            self.check_canceled()
+            if table in PARENT_KEYS:
+                count -= self._drop_orphans(table, staging, dialect)
+            for _, statement in derived:
+                db.session.execute(db.text(translate_sql(statement.format(staging=staging), dialect)))
+            if partitioned:
+                first, last = db.session.execute(db.text(
+                    f"SELECT MIN({PARTITION_COLUMN}), MAX({PARTITION_COLUMN}) FROM {staging}"
+                )).one()
+                ensure_month_partitions(first, last)
+            
+            if key_columns:
+                updates = ", ".join(f"{name} = excluded.{name}" for name in names if name not in key_columns)
+                upsert = (
+                    f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging} WHERE true "
+                    f"ON CONFLICT ({', '.join(key_columns)}) DO UPDATE SET {updates}"
+                )
+            else:
+                upsert = f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging}"
+            db.session.execute(db.text(upsert))
+            db.session.execute(db.text(f"DROP TABLE IF EXISTS {staging}"))
+            db.session.commit()
+            self._save_watermark(table)
+            
+        except Exception:
+            db.session.rollback()
+            raise
+        
+        elapsed = time.perf_counter() - started
+        rate = count / elapsed if elapsed > 0 else float(count)
+        self.stats[table] = {"rows": count, "seconds": round(elapsed, 3), "rows_per_sec": round(rate, 1)}
+        logger.info(f"Bulk loaded {count} {table} rows in {elapsed:.2f}s ({rate:.0f} rows/sec)")
+    
+    def _drop_orphans(self, table, staging, dialect):
+        """Delete staged rows whose parent row does not exist, returning how many were dropped"""
+        from app import db
+        from db_utils import translate_sql
+        
+        column, parent = PARENT_KEYS[table]
+        missing = (
+            f"FROM {staging} WHERE NOT EXISTS "
+            f"(SELECT 1 FROM {parent} p WHERE p.{column} = {staging}.{column})"
+        )
+        orphans = db.session.execute(db.text(translate_sql(f"SELECT COUNT(*) {missing}", dialect))).scalar()
+        if orphans:
+            db.session.execute(db.text(translate_sql(f"DELETE {missing}", dialect)))
+            logger.warning(f"Skipped {orphans} {table} rows whose {column} is not in {parent}")
+        return orphans
+    
+    def _stage_chunk(self, table, staging, columns, chunk, dialect):
+        """Write one chunk of source rows into the staging table"""
+        from app import db
+        
+        names = [name for name, _ in columns]
+        if dialect == "postgresql":
+            # COPY parses the CSV text server-side
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in chunk:
+                writer.writerow(['' if row.get(name) is None else row[name] for name in names])
+            buffer.seek(0)
+            raw = db.session.connection().connection.driver_connection
+            with raw.cursor() as cursor:
+                cursor.copy_expert(f"COPY {staging} ({', '.join(names)}) FROM STDIN WITH (FORMAT csv)", buffer)
+        elif dialect == "duckdb":
+            # DuckDB's CSV reader parses a spooled chunk far faster than row-by-row inserts
+            with tempfile.NamedTemporaryFile("w", suffix=".csv", newline="", delete=False) as spool:
+                writer = csv.writer(spool)
+                for row in chunk:
+                    writer.writerow(['' if row.get(name) is None else row[name] for name in names])
+            try:
+                db.session.execute(db.text(
+                    f"COPY {staging} ({', '.join(names)}) FROM '{spool.name}' (FORMAT csv, HEADER false)"
+                ))
+            finally:
+                os.remove(spool.name)
+        else:
+            # Bind types from the model table keep stored values identical to the ORM path
+            target = db.metadata.tables[table]
+            statement = db.text(
+                f"INSERT INTO {staging} ({', '.join(names)}) VALUES ({', '.join(':' + name for name in names)})"
+            ).bindparams(*[db.bindparam(name, type_=target.c[name].type) for name in names])
+            params = [{name: _coerce(parse, row.get(name)) for name, parse in columns} for row in chunk]
+            db.session.execute(statement, params)
+        return len(chunk)
+    
+    def _read_csv(self, table, filepath):
+        """Yield CSV rows as dicts; in incremental mode only rows past the table's watermark"""
+        from app import db
+        from models import LoadWatermark
+        
+        watermark = db.session.get(LoadWatermark, table)
+        high_water_mark = watermark.high_water_mark if watermark else None
+        
+        with open(filepath, 'rb') as raw:
+            fieldnames = next(csv.reader([raw.readline().decode('utf-8-sig')]))
+            header_end = start = raw.tell()
+            size = os.fstat(raw.fileno()).st_size
+            
+            if self.incremental and watermark is not None:
+                if start <= watermark.file_offset <= size and self._tail_hash(raw, watermark.file_offset) == watermark.tail_hash:
+                    # File only grew since the last load: read just the appended tail
+                    start = watermark.file_offset
+                else:
+                    # File was rewritten: rescan all of it. Rows are upserted on their keys, so rows
+                    # already loaded are rewritten unchanged and late rows of any date are picked up
+                    logger.info(f"{table} file changed since last load, rescanning from the start")
+            
+            tail_read = start > header_end
+            total = self._count_lines(raw, start) if self.progress else None
+            raw.seek(start)
+            reader = csv.DictReader(io.TextIOWrapper(raw, encoding='utf-8', newline=''), fieldnames=fieldnames)
+            high_water_mark = yield from self._track_rows(table, reader, high_water_mark, tail_read, total)
+            
+            offset = raw.tell()
+            self._watermarks[table] = {
+                "file_offset": offset,
+                "tail_hash": self._tail_hash(raw, offset),
+                "high_water_mark": high_water_mark,
+                "rows_loaded": self.rows_read[table],
+            }
+    
+    def _read_columnar(self, table, filepath):
+        """Yield typed rows from a Parquet or Arrow IPC file, one record batch at a time"""
+        from app import db
+        from models import LoadWatermark
+        
+        watermark = db.session.get(LoadWatermark, table)
+        high_water_mark = watermark.high_water_mark if watermark else None
+        
+        with open(filepath, 'rb') as raw:
+            size = os.fstat(raw.fileno()).st_size
+            # The footer holds the schema and batch metadata, so it changes whenever the contents do
+            tail_hash = self._tail_hash(raw, size)
+        
+        if self.incremental and watermark is not None:
+            if watermark.file_offset == size and watermark.tail_hash == tail_hash:
+                logger.info(f"{table} file unchanged since last load, skipping")
+                self.rows_read[table] = 0
+                return
+            # Columnar files are rewritten rather than appended: rescan and upsert every row
+            logger.info(f"{table} file changed since last load, rescanning")
+        
+        total = self._count_record_batch_rows(filepath) if self.progress else None
+        high_water_mark = yield from self._track_rows(
+            table, self._iter_record_batches(filepath), high_water_mark, False, total
+        )
+        self._watermarks[table] = {
+            "file_offset": size,
+            "tail_hash": tail_hash,
+            "high_water_mark": high_water_mark,
+            "rows_loaded": self.rows_read[table],
+        }
+    
+    def _iter_record_batches(self, filepath):
+        """Yield rows as dicts, decoding at most chunk_size rows of a file at once"""
+        if self.source_format == "parquet":
+            batches = pa.parquet.ParquetFile(filepath).iter_batches(batch_size=self.chunk_size)
+            for batch in batches:
+                yield from batch.to_pylist()
+        else:
+            with pa.memory_map(filepath, 'r') as source:
+                reader = pa.ipc.open_file(source)
+                for i in range(reader.num_record_batches):
+                    yield from reader.get_batch(i).to_pylist()
+    
+    def _count_lines(self, raw, start):
+        """Data lines from start to the end of a CSV file (quoted newlines make this an estimate)"""
+        raw.seek(start)
+        count = 0
+        last = b"\n"
+        for block in iter(lambda: raw.read(1024 * 1024), b""):
+            count += block.count(b"\n")
+            last = block[-1:]
+        return count + (last != b"\n")
+    
+    def _count_record_batch_rows(self, filepath):
+        """Rows in a Parquet or Arrow IPC file, from its metadata"""
+        if self.source_format == "parquet":
+            return pa.parquet.ParquetFile(filepath).metadata.num_rows
+        with pa.memory_map(filepath, 'r') as source:
+            reader = pa.ipc.open_file(source)
+            return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    
+    def _track_rows(self, table, rows, high_water_mark, tail_read, total=None):
+        """Apply watermarks and line numbers to source rows, returning the new high-water mark"""
+        high_water_column = HIGH_WATER_COLUMNS.get(table)
+        line_numbers = {}
+        count = 0
+        scanned = 0
+        if self.progress:
+            self.progress(table, 0, total)
+        
+        for row in rows:
+            scanned += 1
+            if self.progress and scanned % PROGRESS_INTERVAL == 0:
+                self.progress(table, scanned, total)
+            if high_water_column:
+                value = row[high_water_column]
+                value = value if isinstance(value, str) else str(value)
+                if high_water_mark is None or value > high_water_mark:
+                    high_water_mark = value
+            if table == "order_items":
+                self._assign_line_number(row, line_numbers, tail_read)
+            if self.incremental:
+                # Remember what changed so derived tables are refreshed for those days only
+                if table == "orders":
+                    self._affected_days.add(str(row['order_date'])[:10])
+                    self._affected_customers.add(row['customer_id'])
+                    self._read_orders.add(row['order_id'])
+                elif table == "order_items":
+                    self._affected_orders.add(row['order_id'])
+                elif table == "customers":
+                    self._read_customers.add(row['customer_id'])
+            count += 1
+            yield row
+        
+        if self.progress:
+            self.progress(table, scanned, scanned)
+        self.rows_read[table] = count
+        return high_water_mark
+    
+    def _assign_line_number(self, row, line_numbers, tail_read):
+        """Give an order item its natural key: its position within the order in the file"""
+        from app import db
+        from db_utils import translate_sql, get_db_dialect
+        
+        order_id = row['order_id']
+        if row.get('line_number'):
+            line_numbers[order_id] = int(row['line_number'])
+            return
+        if order_id not in line_numbers:
+            line_numbers[order_id] = 0
+            if tail_read:
+                # Lines of this order may already have been loaded from the head of the file
+                line_numbers[order_id] = db.session.execute(
+                    db.text(translate_sql(
+                        "SELECT COALESCE(MAX(line_number), 0) FROM order_items WHERE order_id = :order_id",
+                        get_db_dialect()
+                    )),
+                    {"order_id": order_id}
+                ).scalar()
+        line_numbers[order_id] += 1
+        row['line_number'] = line_numbers[order_id]
+    
+    def _tail_hash(self, raw, offset):
+        """Hash the bytes just before offset, restoring the file position afterwards"""
+        position = raw.tell()
+        begin = max(0, offset - TAIL_HASH_BYTES)
+        raw.seek(begin)
+        digest = hashlib.sha256(raw.read(offset - begin)).hexdigest()
+        raw.seek(position)
+        return digest
+    
+    def _save_watermark(self, table):
+        """Persist the watermark reached by the last read of a table's source file"""
+        from app import db
+        from models import LoadWatermark
+        
+        state = self._watermarks.pop(table, None)
+        if state is None:
+            return
+        
+        db.session.merge(LoadWatermark(table_name=table, updated_at=datetime.utcnow(), **state))
+        db.session.commit()
+    
+    def refresh_derived_tables(self):
+        """Bring the rollups and customer first purchases up to date with what this load changed"""
+        from rollups import refresh_daily_rollups, refresh_customer_first_purchases, order_days
+        from rollups import refresh_cohort_retention, refresh_low_stock_alerts
+        from sketches import refresh_customer_sketches, customer_cohorts, customer_order_days
+        from rfm_snapshots import invalidate_rfm_snapshots, refresh_rfm_snapshots
+        
+        if not self.incremental:
+            refresh_customer_first_purchases()
+            refresh_customer_sketches()
+            refresh_cohort_retention()
+            invalidate_rfm_snapshots()
+        elif self._affected_customers:
+            cohorts = customer_cohorts(self._affected_customers)
+            refresh_customer_first_purchases(self._affected_customers)
+            self._refreshed["customer_first_purchases"] = ("customer_id", self._affected_customers)
+            self._refreshed["cohort_retention"] = None
+            # A customer who moved to another cohort is in the sketches and retention cells of all their order days
+            moved = {
+                customer_id for customer_id, cohort in customer_cohorts(self._affected_customers).items()
+                if cohorts.get(customer_id, cohort) != cohort
+            }
+            cohort_days = self._affected_days | {day.isoformat() for day in customer_order_days(moved)}
+            refresh_customer_sketches(cohort_days)
+            refresh_cohort_retention(cohort_days)
+        
+        self.check_canceled()
+        days = None
+        if self.incremental:
+            days = self._affected_days | {day.isoformat() for day in order_days(self._affected_orders)}
+            # Snapshots as of a changed day or later counted the old orders; the month ends are rebuilt below
+            invalidate_rfm_snapshots(days)
+        
+        if not self.incremental or self.rows_read.get("products"):
+            # Product costs feed every day's margin, so a product change rebuilds everything
+            refresh_daily_rollups()
+            self._refreshed.update(daily_product_sales=None, daily_category_sales=None)
+        elif days:
+            refresh_daily_rollups(days)
+            self._refreshed.update(daily_product_sales=("sale_date", days), daily_category_sales=("sale_date", days))
+        
+        # Sales rates read the rollups, so alerts follow them; inventory changes alone rebuild them too
+        self.check_canceled()
+        if not self.incremental or days or self.rows_read.get("products") or self.rows_read.get("inventory"):
+            refresh_low_stock_alerts()
+            self._refreshed.update(product_sales_velocity=None, low_stock_alerts=None)
+        
+        # Month-end RFM snapshots are built here so that requests only ever read them
+        self.check_canceled()
+        refresh_rfm_snapshots()
+    
+    def mirror_changes(self):
+        """What an incremental load changed in each table of the analytics mirror: None for the whole
+        table, or (key column, changed key values); tables it did not change are left out"""
+        changes = {
+            "orders": ("order_id", self._read_orders),
+            # An order's items are replaced with it, so items of a changed order follow its new date
+            "order_items": ("order_id", self._read_orders | self._affected_orders),
+            "customers": ("customer_id", self._read_customers),
+        }
+        # The catalog tables are small and copied whole when their files had new rows
+        changes.update({table: None for table in ("categories", "products", "inventory") if self.rows_read.get(table)})
+        changes.update(self._refreshed)
+        return {table: change for table, change in changes.items() if change is None or change[1]}
+    
+    def drop_indexes(self, tables):
+        """Drop the secondary indexes from create_indexes.sql on the given tables"""
+        from app import db
+        
+        with open("queries/create_indexes.sql", 'r') as f:
+            indexes_sql = f.read()
+        
+        for index_name, table in INDEX_PATTERN.findall(indexes_sql):
+            if table in tables:
+                db.session.execute(db.text(f"DROP INDEX IF EXISTS {index_name}"))
+        db.session.commit()
+        logger.info("Secondary indexes dropped for bulk load")
+    
     def load_categories(self):
         """Load categories from CSV"""
         from app import db
@@ -40,24 +602,22 @@ class DataLoader:
         if not os.path.exists(filepath):
             logger.warning(f"Categories file not found: {filepath}")
             return
+        
+        count = 0
+        for row in self._read_csv("categories", filepath):
+            category = Category(
+                category_id=int(row['category_id']),
+                category_name=row['category_name']
+            )
+            db.session.merge(category)
+            count += 1
             
-        with open(filepath, 'r', newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            count = 0
-            
-            for row in reader:
-                category = Category(
-                    category_id=int(row['category_id']),
-                    category_name=row['category_name']
-                )
-                db.session.merge(category)
-                count += 1
-                
-                if count % 100 == 0:
-                    db.session.commit()
-            
-            db.session.commit()
-            logger.info(f"Loaded {count} categories")
+            if count % 100 == 0:
+                db.session.commit()
+        
+        db.session.commit()
+        self._save_watermark("categories")
+        logger.info(f"Loaded {count} categories")
     
     def load_products(self):
         """Load products from CSV"""
@@ -68,28 +628,26 @@ class DataLoader:
         if not os.path.exists(filepath):
             logger.warning(f"Products file not found: {filepath}")
             return
+        
+        count = 0
+        for row in self._read_csv("products", filepath):
+            product = Product(
+                product_id=int(row['product_id']),
+                category_id=int(row['category_id']),
+                product_name=row['product_name'],
+                unit_cost=float(row['unit_cost']),
+                unit_price=float(row['unit_price']),
+                is_active=row.get('is_active', 'true').lower() == 'true'
+            )
+            db.session.merge(product)
+            count += 1
             
-        with open(filepath, 'r', newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            count = 0
-            
-            for row in reader:
-                product = Product(
-                    product_id=int(row['product_id']),
-                    category_id=int(row['category_id']),
-                    product_name=row['product_name'],
-                    unit_cost=float(row['unit_cost']),
-                    unit_price=float(row['unit_price']),
-                    is_active=row.get('is_active', 'true').lower() == 'true'
-                )
-                db.session.merge(product)
-                count += 1
-                
-                if count % 100 == 0:
-                    db.session.commit()
-            
-            db.session.commit()
-            logger.info(f"Loaded {count} products")
+            if count % 100 == 0:
+                db.session.commit()
+        
+        db.session.commit()
+        self._save_watermark("products")
+        logger.info(f"Loaded {count} products")
     
     def load_customers(self):
         """Load customers from CSV"""
@@ -100,92 +658,113 @@ class DataLoader:
         if not os.path.exists(filepath):
             logger.warning(f"Customers file not found: {filepath}")
             return
+        
+        count = 0
+        for row in self._read_csv("customers", filepath):
+            customer = Customer(
+                customer_id=row['customer_id'],
+                first_order_date=datetime.strptime(row['first_order_date'], '%Y-%m-%d').date() if row.get('first_order_date') else None,
+                last_order_date=datetime.strptime(row['last_order_date'], '%Y-%m-%d').date() if row.get('last_order_date') else None,
+                signup_date=datetime.strptime(row['signup_date'], '%Y-%m-%d').date() if row.get('signup_date') else None,
+                customer_city=row.get('customer_city'),
+                customer_state=row.get('customer_state'),
+                email=row['email']
+            )
+            db.session.merge(customer)
+            count += 1
             
-        with open(filepath, 'r', newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            count = 0
-            
-            for row in reader:
-                customer = Customer(
-                    customer_id=row['customer_id'],
-                    first_order_date=datetime.strptime(row['first_order_date'], '%Y-%m-%d').date() if row.get('first_order_date') else None,
-                    last_order_date=datetime.strptime(row['last_order_date'], '%Y-%m-%d').date() if row.get('last_order_date') else None,
-                    signup_date=datetime.strptime(row['signup_date'], '%Y-%m-%d').date() if row.get('signup_date') else None,
-                    customer_city=row.get('customer_city'),
-                    customer_state=row.get('customer_state'),
-                    email=row['email']
-                )
-                db.session.merge(customer)
-                count += 1
-                
-                if count % 100 == 0:
-                    db.session.commit()
-            
-            db.session.commit()
-            logger.info(f"Loaded {count} customers")
+            if count % 100 == 0:
+                db.session.commit()
+        
+        db.session.commit()
+        self._save_watermark("customers")
+        logger.info(f"Loaded {count} customers")
     
     def load_orders(self):
         """Load orders from CSV"""
         from app import db
-        from models import Order
+        from models import Order, PARTITIONED
+        from partitions import ensure_month_partitions
         
         filepath = os.path.join(self.data_dir, "orders.csv")
         if not os.path.exists(filepath):
             logger.warning(f"Orders file not found: {filepath}")
             return
+        
+        count = 0
+        for row in self._read_csv("orders", filepath):
+            order_date = datetime.strptime(row['order_date'], '%Y-%m-%d %H:%M:%S')
+            if PARTITIONED:
+                ensure_month_partitions(order_date, order_date)
+            order = Order(
+                order_id=row['order_id'],
+                customer_id=row['customer_id'],
+                order_date=order_date,
+                order_status=row['order_status'],
+                payment_amount=float(row['payment_amount']),
+                payment_status=row['payment_status']
+            )
+            db.session.merge(order)
+            count += 1
             
-        with open(filepath, 'r', newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            count = 0
-            
-            for row in reader:
-                order = Order(
-                    order_id=row['order_id'],
-                    customer_id=row['customer_id'],
-                    order_date=datetime.strptime(row['order_date'], '%Y-%m-%d %H:%M:%S'),
-                    order_status=row['order_status'],
-                    payment_amount=float(row['payment_amount']),
-                    payment_status=row['payment_status']
-                )
-                db.session.merge(order)
-                count += 1
-                
-                if count % 100 == 0:
-                    db.session.commit()
-            
-            db.session.commit()
-            logger.info(f"Loaded {count} orders")
+            if count % 100 == 0:
+                db.session.commit()
+        
+        db.session.commit()
+        self._save_watermark("orders")
+        logger.info(f"Loaded {count} orders")
     
     def load_order_items(self):
-        """Load order items from CSV"""
+        """Load order items from CSV, upserting on (order_id, line_number)"""
         from app import db
         from models import OrderItem
+        from db_utils import translate_sql, get_db_dialect
         
         filepath = os.path.join(self.data_dir, "order_items.csv")
         if not os.path.exists(filepath):
             logger.warning(f"Order items file not found: {filepath}")
             return
+        
+        order_date_query = db.text(translate_sql(
+            "SELECT order_date FROM orders WHERE order_id = :order_id", get_db_dialect()
+        )).columns(order_date=db.DateTime)
+        order_id = order_date = None
+        
+        count = 0
+        orphans = 0
+        for row in self._read_csv("order_items", filepath):
+            if row['order_id'] != order_id:
+                # Lines arrive grouped by order, so each order's date is looked up once
+                order_id = row['order_id']
+                order_date = db.session.execute(order_date_query, {"order_id": order_id}).scalar()
+            if order_date is None:
+                # The order was never loaded
+                orphans += 1
+                continue
             
-        with open(filepath, 'r', newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            count = 0
-            
-            for row in reader:
-                order_item = OrderItem(
-                    order_id=row['order_id'],
-                    product_id=int(row['product_id']),
-                    quantity=int(row['quantity']),
-                    unit_price=float(row['unit_price']),
-                    discount=float(row.get('discount', 0))
-                )
+            order_item = db.session.query(OrderItem).filter_by(
+                order_id=row['order_id'],
+                line_number=row['line_number']
+            ).first()
+            if order_item is None:
+                order_item = OrderItem(order_id=row['order_id'], line_number=row['line_number'])
                 db.session.add(order_item)
-                count += 1
-                
-                if count % 1000 == 0:
-                    db.session.commit()
             
-            db.session.commit()
-            logger.info(f"Loaded {count} order items")
+            order_item.order_date = order_date
+            order_item.product_id = int(row['product_id'])
+            order_item.quantity = int(row['quantity'])
+            order_item.unit_price = float(row['unit_price'])
+            order_item.discount = float(row.get('discount', 0))
+            count += 1
+            
+            if count % 1000 == 0:
+                db.session.commit()
+        
+        db.session.commit()
+        self._save_watermark("order_items")
+        if orphans:
+            logger.warning(f"Skipped {orphans} order_items rows whose order_id is not in orders")
+        logger.info(f"Loaded {count} order items")
     
     def load_inventory(self):
         """Load inventory from CSV"""
@@ -196,30 +775,79 @@ class DataLoader:
         if not os.path.exists(filepath):
             logger.warning(f"Inventory file not found: {filepath}")
             return
+        
+        count = 0
+        for row in self._read_csv("inventory", filepath):
+            inventory = Inventory(
+                product_id=int(row['product_id']),
+                on_hand_qty=int(row['on_hand_qty']),
+                reorder_point=int(row['reorder_point']),
+                reorder_qty=int(row['reorder_qty'])
+            )
+            db.session.merge(inventory)
+            count += 1
             
-        with open(filepath, 'r', newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
+            if count % 100 == 0:
+                db.session.commit()
+        
+        db.session.commit()
+        self._save_watermark("inventory")
+        logger.info(f"Loaded {count} inventory records")
+    
+    def export_snapshot(self, output_dir, source_format="parquet"):
+        """Write every loaded table to a Parquet or Arrow IPC file that the loader can read back"""
+        from app import db
+        
+        if pa is None:
+            raise ImportError("Exporting snapshots requires pyarrow")
+        arrow_types = {
+            _parse_int: pa.int64(),
+            _parse_float: pa.float64(),
+            _parse_discount: pa.float64(),
+            _parse_date: pa.date32(),
+            _parse_datetime: pa.timestamp("us"),
+            _parse_bool: pa.bool_(),
+            _parse_str: pa.string(),
+        }
+        os.makedirs(output_dir, exist_ok=True)
+        
+        for table, filename, key_columns, columns in BULK_TABLES:
+            target = db.metadata.tables[table]
+            schema = pa.schema([(name, arrow_types[parse]) for name, parse in columns])
+            filepath = os.path.join(output_dir, os.path.splitext(filename)[0] + SOURCE_EXTENSIONS[source_format])
+            statement = db.select(*[target.c[name] for name, _ in columns]).order_by(*[target.c[key] for key in key_columns])
+            result = db.session.execute(statement.execution_options(yield_per=self.chunk_size))
             count = 0
             
-            for row in reader:
-                inventory = Inventory(
-                    product_id=int(row['product_id']),
-                    on_hand_qty=int(row['on_hand_qty']),
-                    reorder_point=int(row['reorder_point']),
-                    reorder_qty=int(row['reorder_qty'])
-                )
-                db.session.merge(inventory)
-                count += 1
-                
-                if count % 100 == 0:
-                    db.session.commit()
-            
-            db.session.commit()
-            logger.info(f"Loaded {count} inventory records")
+            if source_format == "parquet":
+                writer = pa.parquet.ParquetWriter(filepath, schema, compression="zstd")
+            else:
+                writer = pa.ipc.new_file(filepath, schema)
+            try:
+                for partition in result.partitions():
+                    arrays = []
+                    for i, field in enumerate(schema):
+                        values = [row[i] for row in partition]
+                        if pa.types.is_floating(field.type):
+                            # Numeric columns come back as Decimal
+                            values = [None if value is None else float(value) for value in values]
+                        arrays.append(pa.array(values, type=field.type))
+                    writer.write_batch(pa.record_batch(arrays, schema=schema))
+                    count += len(partition)
+            finally:
+                writer.close()
+                result.close()
+            logger.info(f"Exported {count} {table} rows to {filepath}")
     
     def create_indexes(self):
         """Create database indexes for performance"""
         from app import db
+        from db_utils import get_db_dialect
+        
+        if get_db_dialect() == "duckdb":
+            # Scans prune row groups by their min/max zone maps; ART indexes would only slow the upserts
+            logger.info("Secondary indexes skipped on DuckDB")
+            return
         
         try:
             # Read and execute index creation SQL
@@ -242,7 +870,25 @@ class DataLoader:
             logger.error(f"Error creating indexes: {str(e)}")
 
 if __name__ == "__main__":
+    import argparse
     from app import app
+    
+    parser = argparse.ArgumentParser(description="Load CSV, Parquet or Arrow data into the analytics database")
+    parser.add_argument("--bulk", action="store_true", help="Use the staging-table bulk load path")
+    parser.add_argument("--chunk-size", type=int, default=10000, help="Rows per staged chunk in bulk mode")
+    parser.add_argument("--incremental", action="store_true", help="Load only rows past each table's watermark")
+    parser.add_argument("--format", choices=sorted(SOURCE_EXTENSIONS), default="csv",
+                        help="Source file format; parquet and arrow imply --bulk")
+    parser.add_argument("--data-dir", default="data", help="Directory holding the source files")
+    parser.add_argument("--export", metavar="DIR", help="Snapshot the database tables to DIR instead of loading")
+    args = parser.parse_args()
+    
     with app.app_context():
-        loader = DataLoader()
+        loader = DataLoader(bulk=args.bulk, chunk_size=args.chunk_size, incremental=args.incremental,
+                            source_format=args.format, data_dir=args.data_dir)
+        if args.export:
+            loader.export_snapshot(args.export, "arrow" if args.format == "arrow" else "parquet")
+            raise SystemExit(0)
         loader.load_all_data()
+        for table, table_stats in loader.stats.items():
+            print(f"{table}: {table_stats['rows']} rows, {table_stats['rows_per_sec']} rows/sec")
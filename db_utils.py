@@ -1,21 +1,31 @@
 import os
-import sqlite3
-import psycopg2
+import time
+import json
+import base64
+from decimal import Decimal
+from datetime import date, datetime
+from functools import lru_cache
 from app import db
+from sql_dialects import translate_sql
 import logging
 
 logger = logging.getLogger(__name__)
 
+@lru_cache(maxsize=None)
 def get_db_dialect():
-    """Determine if we're using SQLite or PostgreSQL"""
+    """Determine if we're using SQLite, PostgreSQL or DuckDB"""
     database_url = os.environ.get("DATABASE_URL", "sqlite:///analytics.db")
-    return "postgresql" if database_url.startswith("postgresql") else "sqlite"
+    if database_url.startswith("postgresql"):
+        return "postgresql"
+    if database_url.startswith("duckdb"):
+        return "duckdb"
+    return "sqlite"
 
 def get_date_trunc_function(period, column):
     """Return the appropriate date truncation function based on database dialect"""
     dialect = get_db_dialect()
     
-    if dialect == "postgresql":
+    if dialect in ("postgresql", "duckdb"):
         return f"date_trunc('{period}', {column})"
     else:  # SQLite
         if period == "month":
@@ -29,7 +39,7 @@ def get_extract_function(part, column):
     """Return the appropriate date extraction function"""
     dialect = get_db_dialect()
     
-    if dialect == "postgresql":
+    if dialect in ("postgresql", "duckdb"):
         return f"EXTRACT({part} FROM {column})"
     else:  # SQLite
         if part.lower() == "month":
@@ -41,13 +51,40 @@ def get_extract_function(part, column):
         else:
             return column
 
-def execute_query(query, params=None):
-    """Execute a query and return results"""
+def plain_value(value):
+    """A result value as SQLite returns it: numbers as floats, dates and timestamps as ISO strings.
+
+    PostgreSQL and DuckDB return Decimal and date objects, which would otherwise reach JSON responses
+    as strings and HTTP dates, so every engine serves the same bodies.
+    """
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, date):
+        return value.isoformat()
+    return value
+
+def _read_arguments(read_only):
+    """Session bind arguments routing a read to the read-only engine, when one is configured"""
+    from connections import read_bind
+    
+    bind = read_bind() if read_only else None
+    return {"bind": bind} if bind is not None else None
+
+def execute_query(query, params=None, read_only=False, name=None, bind=None):
+    """Execute a query (SQL string or precompiled text construct) and return results"""
+    from metrics import record_query, slow_query_threshold, log_slow_query
+    
     try:
         if params is None:
             params = {}
         
-        result = db.session.execute(db.text(query), params)
+        statement = db.text(query) if isinstance(query, str) else query
+        bind_arguments = {"bind": bind} if bind is not None else _read_arguments(read_only)
+        started = time.perf_counter()
+        result = db.session.execute(statement, params, bind_arguments=bind_arguments)
+        executed = time.perf_counter()
         
         # Get column names
         columns = result.keys()
@@ -58,16 +95,148 @@ def execute_query(query, params=None):
         for row in rows:
             row_dict = {}
             for i, col in enumerate(columns):
-                row_dict[col] = row[i]
+                row_dict[col] = plain_value(row[i])
             data.append(row_dict)
         
-        logger.info(f"Query executed successfully, returned {len(data)} rows")
+        fetched = time.perf_counter()
+        record_query(name, executed - started, fetched - executed, len(data))
+        threshold = slow_query_threshold()
+        if threshold is not None and fetched - started > threshold:
+            log_slow_query(name, statement, params, fetched - started, bind_arguments)
         return data
         
     except Exception as e:
         logger.error(f"Query execution failed: {str(e)}")
         raise
 
+def execute_named_query(name, params=None):
+    """Execute a precompiled query from the registry through the result cache"""
+    from flask import current_app
+    from analytics_mirror import analytics_source
+    from columnar_engine import SUPPORTED_QUERIES, execute_columnar
+    from query_cache import query_cache
+    
+    params = params or {}
+    if current_app.config.get("ANALYTICS_ENGINE") == "columnar" and name in SUPPORTED_QUERIES:
+        return query_cache.get_or_execute(
+            f"{name}:columnar", params, lambda: execute_columnar(name, params)
+        )
+    
+    def execute():
+        registry, bind = analytics_source(name)
+        return execute_query(registry.statement(name, params), params, read_only=True, name=name, bind=bind)
+    return query_cache.get_or_execute(name, params, execute)
+
+def encode_cursor(values):
+    """Encode the keyset values of the last row on a page as an opaque cursor"""
+    def plain(value):
+        if isinstance(value, Decimal):
+            return float(value)
+        if isinstance(value, (date, datetime)):
+            return value.isoformat()
+        return value
+    payload = json.dumps([plain(value) for value in values]).encode("utf-8")
+    return base64.urlsafe_b64encode(payload).decode("ascii")
+
+def decode_cursor(cursor):
+    """Decode a cursor produced by encode_cursor"""
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    if not isinstance(values, list):
+        raise ValueError("Invalid cursor")
+    return values
+
+def execute_page(name, params, cursor=None, page_size=100):
+    """Execute one keyset page of a query; returns (rows, next_cursor or None)"""
+    from analytics_mirror import analytics_source
+    from query_cache import query_cache
+    
+    page_params = dict(params or {}, page_size=page_size + 1)
+    registry, bind = analytics_source(name)
+    query, statement = registry.page_statement(name, page_params, after_cursor=cursor is not None)
+    if cursor is not None:
+        values = decode_cursor(cursor)
+        if len(values) != len(query.keyset):
+            raise ValueError("Invalid cursor")
+        page_params.update({f"cursor_{i}": value for i, value in enumerate(values)})
+    
+    rows = query_cache.get_or_execute(
+        f"{name}:page", page_params, lambda: execute_query(statement, page_params, read_only=True, name=f"{name}:page", bind=bind)
+    )
+    
+    # One extra row was fetched to tell whether another page exists
+    next_cursor = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_cursor = encode_cursor([rows[-1][column] for column, _ in query.keyset])
+    return rows, next_cursor
+
+def stream_query(name, params, batch_size=1000):
+    """Yield the column names, then batches of rows read from a server-side cursor"""
+    from analytics_mirror import analytics_source
+    from metrics import record_query
+    
+    params = params or {}
+    registry, bind = analytics_source(name)
+    started = time.perf_counter()
+    result = db.session.execute(
+        registry.statement(name, params),
+        params,
+        execution_options={"stream_results": True, "yield_per": batch_size},
+        bind_arguments={"bind": bind} if bind is not None else _read_arguments(True)
+    )
+    execute_seconds = time.perf_counter() - started
+    yield list(result.keys())
+    
+    # Fetch time excludes the time the consumer spends encoding and sending each batch
+    batches = result.partitions()
+    fetch_seconds = 0.0
+    rows = 0
+    while True:
+        fetch_started = time.perf_counter()
+        batch = next(batches, None)
+        fetch_seconds += time.perf_counter() - fetch_started
+        if batch is None:
+            break
+        rows += len(batch)
+        yield [tuple(plain_value(value) for value in row) for row in batch]
+    record_query(f"{name}:stream", execute_seconds, fetch_seconds, rows)
+
+def get_data_version():
+    """Return the current data version (0 before the first load)"""
+    return get_data_version_state()[0]
+
+def get_data_version_state():
+    """Return the current data version and when it was bumped (0 and None before the first load)"""
+    row = db.session.execute(db.text("SELECT version, updated_at FROM data_version WHERE id = 1")).first()
+    if row is None:
+        return 0, None
+    version, updated_at = row
+    if updated_at is not None and not isinstance(updated_at, datetime):
+        updated_at = datetime.fromisoformat(str(updated_at))
+    return version or 0, updated_at
+
+def bump_data_version():
+    """Increment the data version after a load so cached results are invalidated"""
+    from datetime import datetime
+    from models import DataVersion
+    from query_cache import query_cache
+    
+    data_version = db.session.get(DataVersion, 1)
+    if data_version is None:
+        data_version = DataVersion(id=1, version=0)
+        db.session.add(data_version)
+    data_version.version += 1
+    data_version.updated_at = datetime.utcnow()
+    db.session.commit()
+    
+    # Re-read rather than set: a background load's bump is only visible once its transaction commits
+    query_cache.invalidate()
+    logger.info(f"Data version bumped to {data_version.version}")
+    return data_version.version
+
 def load_sql_query(filename):
     """Load SQL query from file and replace dialect-specific functions"""
     query_path = os.path.join("queries", filename)
@@ -77,16 +246,7 @@ def load_sql_query(filename):
             query = f.read()
         
         # Replace date functions based on dialect
-        dialect = get_db_dialect()
-        
-        if dialect == "sqlite":
-            # Replace PostgreSQL date functions with SQLite equivalents
-            query = query.replace("date_trunc('month',", "strftime('%Y-%m-01',")
-            query = query.replace("date_trunc('day',", "strftime('%Y-%m-%d',")
-            query = query.replace("EXTRACT(epoch FROM", "strftime('%s',")
-            query = query.replace("INTERVAL '1 month'", "'+1 month'")
-            
-        return query
+        return translate_sql(query, get_db_dialect())
         
     except FileNotFoundError:
         logger.error(f"SQL file not found: {query_path}")
@@ -0,0 +1,234 @@
+import os
+import csv
+import random
+import logging
+from datetime import date, datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+CATEGORIES = [
+    "Electronics", "Home & Kitchen", "Sports & Outdoors", "Books", "Clothing",
+    "Beauty", "Toys & Games", "Grocery", "Automotive", "Garden",
+    "Health", "Office Supplies",
+]
+
+CITIES = [
+    ("New York", "NY"), ("Los Angeles", "CA"), ("Chicago", "IL"), ("Houston", "TX"),
+    ("Phoenix", "AZ"), ("Philadelphia", "PA"), ("San Antonio", "TX"), ("San Diego", "CA"),
+    ("Dallas", "TX"), ("Seattle", "WA"), ("Denver", "CO"), ("Boston", "MA"),
+    ("Miami", "FL"), ("Atlanta", "GA"), ("Portland", "OR"), ("Minneapolis", "MN"),
+]
+
+# Relative order volume by month (January = index 0): Q4 holiday peak, summer lull
+MONTH_WEIGHTS = [0.85, 0.80, 0.90, 0.90, 0.95, 0.85, 0.85, 0.90, 0.95, 1.05, 1.45, 1.65]
+
+# Relative order volume by weekday (Monday = index 0)
+WEEKDAY_WEIGHTS = [1.0, 0.95, 0.95, 1.0, 1.1, 1.25, 1.2]
+
+# (order_status, payment_status, weight)
+STATUS_MIX = [
+    ("delivered", "paid", 70),
+    ("shipped", "paid", 10),
+    ("paid", "paid", 5),
+    ("created", "pending", 3),
+    ("canceled", "failed", 7),
+    ("refunded", "refunded", 5),
+]
+
+# (discount rate, weight): most lines sell at list price
+DISCOUNT_MIX = [(0.0, 75), (0.05, 8), (0.10, 9), (0.15, 4), (0.20, 3), (0.30, 1)]
+
+# Chance a buyer places another order after each one, so order counts per customer are geometric
+REPEAT_PROBABILITY = 0.55
+
+# Cap on orders per customer, keeping heavy repeat buyers plausible
+MAX_ORDERS_PER_CUSTOMER = 40
+
+class DataGenerator:
+    """Deterministic synthetic e-commerce data at configurable scale, written as the loader's CSVs"""
+
+    def __init__(self, customers=10000, products=500, seed=42,
+                 start_date=date(2023, 1, 1), end_date=date(2024, 12, 31)):
+        self.customers = customers
+        self.products = products
+        self.seed = seed
+        self.start_date = start_date
+        self.end_date = end_date
+        self.rng = random.Random(seed)
+        self.counts = {}
+        self._days = [start_date + timedelta(days=i) for i in range((end_date - start_date).days + 1)]
+        self._day_weights = self._cumulative([
+            MONTH_WEIGHTS[day.month - 1] * WEEKDAY_WEIGHTS[day.weekday()] for day in self._days
+        ])
+        self._statuses = self._cumulative([weight for _, _, weight in STATUS_MIX])
+        self._discounts = self._cumulative([weight for _, weight in DISCOUNT_MIX])
+        self._catalog = []
+        self._product_weights = []
+
+    def _cumulative(self, weights):
+        total = 0.0
+        cumulative = []
+        for weight in weights:
+            total += weight
+            cumulative.append(total)
+        return cumulative
+
+    def _pick(self, population, cumulative):
+        return self.rng.choices(population, cum_weights=cumulative)[0]
+
+    def generate(self, output_dir):
+        """Write all six CSV files to output_dir"""
+        os.makedirs(output_dir, exist_ok=True)
+        self.write_categories(output_dir)
+        self.write_products(output_dir)
+        self.write_inventory(output_dir)
+        self.write_customers_and_orders(output_dir)
+        logger.info(f"Generated {self.counts} in {output_dir}")
+        return self.counts
+
+    def _writer(self, output_dir, filename, header):
+        handle = open(os.path.join(output_dir, filename), "w", newline="")
+        writer = csv.writer(handle)
+        writer.writerow(header)
+        return handle, writer
+
+    def write_categories(self, output_dir):
+        handle, writer = self._writer(output_dir, "categories.csv", ["category_id", "category_name"])
+        with handle:
+            for category_id, name in enumerate(CATEGORIES, start=1):
+                writer.writerow([category_id, name])
+        self.counts["categories"] = len(CATEGORIES)
+
+    def write_products(self, output_dir):
+        """Products with log-normal prices and a long-tailed popularity used when picking order lines"""
+        handle, writer = self._writer(
+            output_dir, "products.csv",
+            ["product_id", "category_id", "product_name", "unit_cost", "unit_price", "is_active"]
+        )
+        with handle:
+            for product_id in range(1, self.products + 1):
+                category_id = self.rng.randint(1, len(CATEGORIES))
+                price = round(min(self.rng.lognormvariate(3.8, 0.9), 4999.0) + 0.99, 2)
+                cost = round(price * self.rng.uniform(0.35, 0.75), 2)
+                active = self.rng.random() > 0.05
+                writer.writerow([
+                    product_id, category_id, f"{CATEGORIES[category_id - 1]} Item {product_id}",
+                    f"{cost:.2f}", f"{price:.2f}", "true" if active else "false"
+                ])
+                self._catalog.append((product_id, price))
+                # Zipf-like popularity: a few best sellers, many slow movers
+                self._product_weights.append(1.0 / (1 + self.rng.random() * product_id) ** 0.8)
+        self._product_weights = self._cumulative(self._product_weights)
+        self.counts["products"] = self.products
+
+    def write_inventory(self, output_dir):
+        handle, writer = self._writer(
+            output_dir, "inventory.csv", ["product_id", "on_hand_qty", "reorder_point", "reorder_qty"]
+        )
+        with handle:
+            for product_id, _ in self._catalog:
+                reorder_point = self.rng.randint(5, 50)
+                roll = self.rng.random()
+                if roll < 0.03:
+                    on_hand = 0
+                elif roll < 0.15:
+                    on_hand = self.rng.randint(1, reorder_point)
+                else:
+                    on_hand = self.rng.randint(reorder_point + 1, reorder_point * 10)
+                writer.writerow([product_id, on_hand, reorder_point, reorder_point * self.rng.randint(2, 10)])
+        self.counts["inventory"] = self.products
+
+    def write_customers_and_orders(self, output_dir):
+        """Stream customers with their orders and order lines, so memory stays flat at any scale"""
+        customers, customer_writer = self._writer(
+            output_dir, "customers.csv",
+            ["customer_id", "first_order_date", "last_order_date", "signup_date",
+             "customer_city", "customer_state", "email"]
+        )
+        orders, order_writer = self._writer(
+            output_dir, "orders.csv",
+            ["order_id", "customer_id", "order_date", "order_status", "payment_amount", "payment_status"]
+        )
+        items, item_writer = self._writer(
+            output_dir, "order_items.csv", ["order_id", "product_id", "quantity", "unit_price", "discount"]
+        )
+        order_count = 0
+        item_count = 0
+
+        with customers, orders, items:
+            for number in range(1, self.customers + 1):
+                customer_id = f"CUST{number:08d}"
+                order_days = self._order_days()
+                for order_day in order_days:
+                    order_count += 1
+                    order_id = f"ORD{order_count:010d}"
+                    ordered_at = datetime.combine(order_day, datetime.min.time()) + timedelta(
+                        seconds=self.rng.randint(6 * 3600, 23 * 3600)
+                    )
+                    order_status, payment_status, _ = self._pick(STATUS_MIX, self._statuses)
+                    total = 0.0
+                    for _ in range(self._line_count()):
+                        product_id, price = self._pick(self._catalog, self._product_weights)
+                        quantity = 1 if self.rng.random() < 0.8 else self.rng.randint(2, 5)
+                        discount = self._pick(DISCOUNT_MIX, self._discounts)[0]
+                        discount_amount = round(price * quantity * discount, 2)
+                        total += price * quantity - discount_amount
+                        item_writer.writerow([order_id, product_id, quantity, f"{price:.2f}", f"{discount_amount:.2f}"])
+                        item_count += 1
+                    order_writer.writerow([
+                        order_id, customer_id, ordered_at.strftime("%Y-%m-%d %H:%M:%S"),
+                        order_status, f"{total:.2f}", payment_status
+                    ])
+
+                signup = order_days[0] - timedelta(days=self.rng.randint(0, 60))
+                city, state = CITIES[self.rng.randrange(len(CITIES))]
+                customer_writer.writerow([
+                    customer_id, order_days[0].isoformat(), order_days[-1].isoformat(), signup.isoformat(),
+                    city, state, f"customer{number:08d}@example.com"
+                ])
+
+        self.counts["customers"] = self.customers
+        self.counts["orders"] = order_count
+        self.counts["order_items"] = item_count
+
+    def _order_days(self):
+        """Sorted order days for one customer: a seasonal first purchase, then geometric repeats"""
+        first = self._pick(self._days, self._day_weights)
+        days = [first]
+        while len(days) < MAX_ORDERS_PER_CUSTOMER and self.rng.random() < REPEAT_PROBABILITY:
+            gap = int(self.rng.expovariate(1 / 45)) + 1
+            following = days[-1] + timedelta(days=gap)
+            if following > self.end_date:
+                break
+            days.append(following)
+        return days
+
+    def _line_count(self):
+        roll = self.rng.random()
+        if roll < 0.55:
+            return 1
+        if roll < 0.85:
+            return 2
+        return self.rng.randint(3, 6)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Generate synthetic e-commerce CSVs for the data loader")
+    parser.add_argument("--customers", type=int, default=10000, help="Number of customers")
+    parser.add_argument("--products", type=int, default=500, help="Number of products")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed; the same seed gives identical files")
+    parser.add_argument("--start", default="2023-01-01", help="First order day (YYYY-MM-DD)")
+    parser.add_argument("--end", default="2024-12-31", help="Last order day (YYYY-MM-DD)")
+    parser.add_argument("--output", default="data", help="Directory to write the CSVs to")
+    args = parser.parse_args()
+
+    generator = DataGenerator(
+        customers=args.customers,
+        products=args.products,
+        seed=args.seed,
+        start_date=datetime.strptime(args.start, "%Y-%m-%d").date(),
+        end_date=datetime.strptime(args.end, "%Y-%m-%d").date(),
+    )
+    for table, count in generator.generate(args.output).items():
+        print(f"{table}: {count} rows")
@@ -0,0 +1,255 @@
+import re
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Indexes worth trying: name -> (table, definition, PostgreSQL definition when it differs)
+CANDIDATE_INDEXES = {
+    # Paid-order date ranges (KPIs, kpi-series) read only the paid rows, without touching the table
+    "idx_orders_paid_date": (
+        "orders", "orders(order_date, customer_id, order_id, payment_amount) WHERE payment_status = 'paid'", None
+    ),
+    # Per-customer paid history for repeat rate, cohorts and RFM
+    "idx_orders_paid_customer": (
+        "orders", "orders(customer_id, order_date, order_id) WHERE payment_status = 'paid'", None
+    ),
+    # Line revenue without a table lookup per order line
+    "idx_order_items_order_covering": (
+        "order_items", "order_items(order_id, quantity, unit_price, discount)",
+        "order_items(order_id) INCLUDE (quantity, unit_price, discount)"
+    ),
+    "idx_first_purchases_cohort_customer": (
+        "customer_first_purchases", "customer_first_purchases(cohort_month, customer_id)", None
+    ),
+}
+
+# A candidate is suggested when it removes plan issues from a query or speeds it up by this fraction, and
+# slows none down by as much. Only queries whose plan the index changed are judged on timings, which also
+# have to move by MIN_IMPROVEMENT_MS, so timer noise on unchanged or sub-millisecond queries decides nothing
+MIN_IMPROVEMENT = 0.10
+MIN_IMPROVEMENT_MS = 1.0
+
+# Timed runs per query; the fastest of this many is stable enough to repeat a verdict from run to run
+DEFAULT_REPEAT = 15
+
+SQLITE_SCAN = re.compile(r"^SCAN (\w+)(.*)$")
+SQLITE_TEMP_BTREE = re.compile(r"^USE TEMP B-TREE FOR (.+)$")
+SQLITE_AUTOMATIC_INDEX = re.compile(r"^SEARCH (\w+) USING AUTOMATIC")
+POSTGRESQL_SEQ_SCAN = re.compile(r"Seq Scan on (\w+)")
+POSTGRESQL_SORT = re.compile(r"^\s*(->\s+)?(Incremental )?Sort\b")
+
+TABLE_REFERENCE = re.compile(r"\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+NOT_ALIASES = {"on", "where", "join", "left", "right", "inner", "cross", "group", "order", "limit", "using"}
+
+def _base_table(name):
+    """orders_all, orders_archive_2023 and orders_p202401 all read the orders table"""
+    return re.sub(r"_(all|archive_\d{4}|p\d{6}|default)$", "", name)
+
+def table_aliases(sql):
+    """Map every name a query uses for a real table (its own name or an alias) to the table"""
+    from app import db
+
+    aliases = {}
+    for name, alias in TABLE_REFERENCE.findall(sql):
+        table = _base_table(name)
+        if table not in db.metadata.tables:
+            continue
+        aliases[name] = table
+        if alias and alias.lower() not in NOT_ALIASES:
+            aliases[alias] = table
+    return aliases
+
+def explain(name, params):
+    """The plan of one registry query, one line per step"""
+    from app import db
+    from db_utils import get_db_dialect
+    from query_registry import query_registry
+
+    sql = query_registry.get(name).sql
+    if get_db_dialect() == "postgresql":
+        return [row[0] for row in db.session.execute(db.text("EXPLAIN " + sql), params)]
+    if get_db_dialect() == "duckdb":
+        # One (kind, rendered plan tree) row
+        return [line for row in db.session.execute(db.text("EXPLAIN " + sql), params) for line in row[1].splitlines()]
+    return [row[3] for row in db.session.execute(db.text("EXPLAIN QUERY PLAN " + sql), params)]
+
+def plan_issues(name, plan):
+    """Full table scans, temporary B-trees or sorts, and automatic indexes in a query's plan"""
+    from db_utils import get_db_dialect
+    from query_registry import query_registry
+
+    issues = []
+    if get_db_dialect() == "duckdb":
+        # Every DuckDB read is a columnar scan pruned by zone maps; there is no index choice to flag
+        return issues
+    if get_db_dialect() == "postgresql":
+        for line in plan:
+            scan = POSTGRESQL_SEQ_SCAN.search(line)
+            if scan:
+                issues.append({"kind": "full scan", "table": _base_table(scan.group(1)), "step": line.strip()})
+            elif POSTGRESQL_SORT.match(line):
+                issues.append({"kind": "sort", "table": None, "step": line.strip()})
+        return issues
+
+    # SQLite names tables by alias; scans of CTEs and subqueries are not table scans
+    aliases = table_aliases(query_registry.get(name).sql)
+    for line in plan:
+        scan = SQLITE_SCAN.match(line)
+        automatic = SQLITE_AUTOMATIC_INDEX.match(line)
+        if scan and scan.group(1) in aliases and " INDEX " not in scan.group(2):
+            issues.append({"kind": "full scan", "table": aliases[scan.group(1)], "step": line})
+        elif SQLITE_TEMP_BTREE.match(line):
+            issues.append({"kind": "temp b-tree", "table": None, "step": line})
+        elif automatic:
+            issues.append({"kind": "automatic index", "table": aliases.get(automatic.group(1)), "step": line})
+    return issues
+
+def time_query(name, params, repeat):
+    """Fastest of repeat runs of a registry query in milliseconds, after one warm-up run.
+
+    Other work on the machine only ever adds time, so the fastest run moves least from one run to the next.
+    """
+    from app import db
+    from query_registry import query_registry
+
+    statement = query_registry.statement(name, params)
+    timings = []
+    for i in range(repeat + 1):
+        started = time.perf_counter()
+        db.session.execute(statement, params).fetchall()
+        if i:
+            timings.append((time.perf_counter() - started) * 1000)
+        db.session.rollback()
+    return min(timings)
+
+def _beyond_noise(before_ms, after_ms):
+    """Whether a timing changed by both MIN_IMPROVEMENT of its old value and MIN_IMPROVEMENT_MS"""
+    return abs(after_ms - before_ms) >= max(MIN_IMPROVEMENT * before_ms, MIN_IMPROVEMENT_MS)
+
+def existing_indexes():
+    from app import db
+
+    inspector = db.inspect(db.engine)
+    return {index["name"] for table in db.metadata.tables for index in inspector.get_indexes(table)}
+
+def advise(repeat=DEFAULT_REPEAT, apply=False):
+    """Explain every registry query, then measure each candidate index on the queries that read its table.
+
+    Each candidate is created, timed and dropped again, so its before/after numbers are against the
+    current indexes. With apply, suggested indexes are kept and later candidates measured on top of them.
+    """
+    from app import db
+    from db_utils import get_db_dialect
+    from query_registry import query_registry
+    from query_benchmark import loaded_default_params
+
+    dialect = get_db_dialect()
+    defaults = loaded_default_params()
+    names = [name for name in query_registry.names() if name in defaults]
+
+    queries = {}
+    for name in names:
+        plan = explain(name, defaults[name])
+        queries[name] = {"plan": plan, "issues": plan_issues(name, plan), "ms": time_query(name, defaults[name], repeat)}
+
+    # Applied indexes become part of the plans the next candidates are compared with
+    baseline = {name: {"plan": query["plan"], "issues": len(query["issues"])} for name, query in queries.items()}
+    existing = existing_indexes()
+    candidates = []
+    # DuckDB has no partial or covering indexes, and its ART indexes do not serve range scans
+    candidate_indexes = CANDIDATE_INDEXES if dialect != "duckdb" else {}
+    for index_name, (table, definition, postgresql_definition) in candidate_indexes.items():
+        if dialect == "postgresql" and postgresql_definition:
+            definition = postgresql_definition
+        ddl = f"CREATE INDEX {index_name} ON {definition}"
+        if index_name in existing:
+            candidates.append({"index": index_name, "ddl": ddl, "status": "exists"})
+            continue
+        affected = [
+            name for name in names
+            if table in table_aliases(query_registry.get(name).sql).values()
+        ]
+        if not affected:
+            continue
+
+        # Timed again just before the index exists, so drift over the whole run does not count as its effect
+        before = {name: time_query(name, defaults[name], repeat) for name in affected}
+        started = time.perf_counter()
+        db.session.execute(db.text(ddl))
+        db.session.commit()
+        build_ms = (time.perf_counter() - started) * 1000
+
+        effects, after = {}, {}
+        better = worse = False
+        for name in affected:
+            after_ms = time_query(name, defaults[name], repeat)
+            before_ms = before[name]
+            plan = explain(name, defaults[name])
+            issues_after = len(plan_issues(name, plan))
+            if plan != baseline[name]["plan"]:
+                better = better or issues_after < baseline[name]["issues"]
+                if _beyond_noise(before_ms, after_ms):
+                    better, worse = better or after_ms < before_ms, worse or after_ms > before_ms
+            effects[name] = {
+                "before_ms": round(before_ms, 2),
+                "after_ms": round(after_ms, 2),
+                "change": round((after_ms - before_ms) / before_ms, 3) if before_ms else 0.0,
+                "issues_before": baseline[name]["issues"],
+                "issues_after": issues_after,
+                "plan_changed": plan != baseline[name]["plan"],
+            }
+            after[name] = {"plan": plan, "issues": issues_after}
+        suggested = better and not worse
+        if suggested and apply:
+            baseline.update(after)
+        else:
+            db.session.execute(db.text(f"DROP INDEX {index_name}"))
+            db.session.commit()
+        candidates.append({
+            "index": index_name,
+            "ddl": ddl,
+            "status": ("applied" if apply else "suggested") if suggested else "rejected",
+            "build_ms": round(build_ms, 1),
+            "queries": effects,
+        })
+        logger.info(f"{index_name}: {candidates[-1]['status']}")
+
+    return {
+        "dialect": dialect,
+        "queries": {name: dict(query, ms=round(query["ms"], 2)) for name, query in queries.items()},
+        "candidates": candidates,
+    }
+
+if __name__ == "__main__":
+    import json
+    import argparse
+    from app import app
+
+    parser = argparse.ArgumentParser(description="Explain every analytics query and measure candidate indexes")
+    parser.add_argument("--data-dir", help="Load this directory into a fresh schema first (e.g. benchmark_data/...)")
+    parser.add_argument("--repeat", type=int, default=DEFAULT_REPEAT, help="Timed runs per query, before and after each index")
+    parser.add_argument("--apply", action="store_true", help="Keep the indexes that are suggested")
+    parser.add_argument("--output", help="Also write the report as JSON to this path")
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.data_dir:
+            from query_benchmark import load_fresh
+            load_fresh(args.data_dir)
+        report = advise(repeat=args.repeat, apply=args.apply)
+
+    for name, query in report["queries"].items():
+        print(f"{name}: {query['ms']} ms")
+        for issue in query["issues"]:
+            print(f"  {issue['kind']}: {issue['step']}")
+    print()
+    for candidate in report["candidates"]:
+        print(f"[{candidate['status']}] {candidate['ddl']}")
+        for name, effect in candidate.get("queries", {}).items():
+            print(f"  {name}: {effect['before_ms']} -> {effect['after_ms']} ms ({effect['change']:+.0%}), "
+                  f"plan issues {effect['issues_before']} -> {effect['issues_after']}"
+                  f"{'' if effect['plan_changed'] else ', plan unchanged'}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
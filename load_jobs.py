@@ -0,0 +1,187 @@
+import os
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Finished jobs kept for the status endpoint, oldest dropped first
+MAX_FINISHED_JOBS = int(os.environ.get("LOAD_JOB_HISTORY", 20))
+
+# Key of the PostgreSQL advisory lock a load holds, so loads from other processes wait their turn
+LOAD_LOCK_KEY = 73011
+
+# Loader options for each mode accepted by the load endpoints
+LOAD_MODES = {
+    "rows": {},
+    "bulk": {"bulk": True},
+    "incremental": {"bulk": True, "incremental": True},
+}
+
+# One worker thread: jobs never run side by side, even if single-flight were bypassed
+load_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="load")
+
+class LoadInProgress(Exception):
+    """Raised when a load is started while another is still running"""
+
+    def __init__(self, job=None):
+        super().__init__("A data load is already running")
+        self.job = job
+
+class LoadCanceled(Exception):
+    """Raised inside a load whose job was canceled"""
+
+class LoadJob:
+    """One background load: its status, per-table progress and cancel flag"""
+
+    def __init__(self, mode, options):
+        self.id = uuid.uuid4().hex
+        self.mode = mode
+        self.options = options
+        self.status = "queued"  # queued, running, succeeded, failed, canceled
+        self.error = None
+        self.created_at = datetime.utcnow()
+        self.started_at = None
+        self.finished_at = None
+        self.tables = OrderedDict()
+        self._cancel = threading.Event()
+        self._lock = threading.Lock()
+
+    @property
+    def active(self):
+        return self.status in ("queued", "running")
+
+    def cancel(self):
+        """Ask the load to stop at its next check; it rolls back everything it wrote"""
+        if self.active:
+            self._cancel.set()
+        return self.active
+
+    def check_canceled(self):
+        """DataLoader callback between stages and staged chunks, where a cancel request takes effect"""
+        if self._cancel.is_set():
+            raise LoadCanceled(f"Load {self.id} canceled")
+
+    def progress(self, table, rows_done, rows_total):
+        """DataLoader progress callback; every report is also a cancel check"""
+        self.check_canceled()
+        now = time.perf_counter()
+        with self._lock:
+            entry = self.tables.get(table)
+            if entry is None:
+                entry = self.tables[table] = {"started": now, "rows_done": 0, "rows_total": None}
+            entry["rows_done"] = rows_done
+            entry["rows_total"] = rows_total
+            entry["seconds"] = now - entry["started"]
+
+    def to_dict(self):
+        # A list rather than a mapping, so tables stay in load order through sorted-key JSON encoding
+        with self._lock:
+            tables = [
+                {
+                    "table": table,
+                    "rows_done": entry["rows_done"],
+                    "rows_total": entry["rows_total"],
+                    "rows_per_sec": round(entry["rows_done"] / entry["seconds"], 1) if entry.get("seconds") else 0.0,
+                    "seconds": round(entry.get("seconds", 0.0), 3),
+                }
+                for table, entry in self.tables.items()
+            ]
+        return {
+            "id": self.id,
+            "mode": self.mode,
+            "status": "canceling" if self.active and self._cancel.is_set() else self.status,
+            "error": self.error,
+            "created_at": self.created_at.isoformat(),
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "tables": tables,
+        }
+
+_jobs = OrderedDict()
+_jobs_lock = threading.Lock()
+
+def get_job(job_id):
+    with _jobs_lock:
+        return _jobs.get(job_id)
+
+def list_jobs():
+    """Jobs of this process, newest first"""
+    with _jobs_lock:
+        return list(reversed(_jobs.values()))
+
+def current_job():
+    with _jobs_lock:
+        return next((job for job in _jobs.values() if job.active), None)
+
+def start_load(app, mode="rows", data_dir="data"):
+    """Queue a background load and return its job, or raise LoadInProgress if one is running"""
+    if mode not in LOAD_MODES:
+        raise ValueError(f"Unknown load mode: {mode}")
+    job = LoadJob(mode, dict(LOAD_MODES[mode], data_dir=data_dir))
+    with _jobs_lock:
+        running = next((existing for existing in _jobs.values() if existing.active), None)
+        if running is not None:
+            raise LoadInProgress(running)
+        _jobs[job.id] = job
+        finished = [key for key, existing in _jobs.items() if not existing.active]
+        for key in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del _jobs[key]
+    load_executor.submit(_run_job, app, job)
+    logger.info(f"Queued {mode} load job {job.id}")
+    return job
+
+def _lock_database(connection, dialect):
+    """Take the database-wide load lock inside the load's transaction"""
+    from sqlalchemy import text
+
+    if dialect == "postgresql":
+        if not connection.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {"key": LOAD_LOCK_KEY}).scalar():
+            raise LoadInProgress()
+    elif dialect == "sqlite":
+        # Takes SQLite's write lock now rather than at the first write; readers carry on under WAL
+        connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+def _run_job(app, job):
+    """Run a load in one database transaction, so readers see the previous data until it commits"""
+    from sqlalchemy.orm import Session
+    from app import db
+    from db_utils import get_db_dialect
+    from data_loader import DataLoader
+    from query_cache import query_cache
+
+    with app.app_context():
+        job.status = "running"
+        job.started_at = datetime.utcnow()
+        connection = db.engine.connect()
+        transaction = connection.begin()
+        try:
+            _lock_database(connection, get_db_dialect())
+            # The loader's own commits only release savepoints of the outer transaction;
+            # DuckDB has no savepoints, so there they leave the outer transaction open instead
+            join_mode = "rollback_only" if get_db_dialect() == "duckdb" else "create_savepoint"
+            db.session.registry.set(Session(bind=connection, join_transaction_mode=join_mode))
+            job.check_canceled()
+            DataLoader(progress=job.progress, check_canceled=job.check_canceled, **job.options).load_all_data()
+            db.session.commit()
+            transaction.commit()
+            job.status = "succeeded"
+            # Results cached while the load ran were read from the old data
+            query_cache.invalidate()
+        except LoadCanceled:
+            transaction.rollback()
+            job.status = "canceled"
+            logger.info(f"Load job {job.id} canceled")
+        except Exception as e:
+            transaction.rollback()
+            job.status = "failed"
+            job.error = str(e)
+            logger.error(f"Load job {job.id} failed: {str(e)}")
+        finally:
+            db.session.remove()
+            connection.close()
+            job.finished_at = datetime.utcnow()
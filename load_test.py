@@ -0,0 +1,225 @@
+import json
+import time
+import random
+import threading
+import http.client
+from datetime import date, timedelta
+from urllib.parse import urlencode, urlsplit
+
+def _day(rng, start, end):
+    return start + timedelta(days=rng.randint(0, (end - start).days))
+
+def _month_range(rng, start, end):
+    first = _day(rng, start, end)
+    last = min(end, first + timedelta(days=rng.randint(30, 365)))
+    return {"start": first.strftime("%Y-%m"), "end": last.strftime("%Y-%m")}
+
+def _day_range(rng, start, end, max_days=366):
+    first = _day(rng, start, end)
+    last = min(end, first + timedelta(days=rng.randint(0, max_days - 1)))
+    return {"start": first.isoformat(), "end": last.isoformat()}
+
+# Dashboard endpoints the harness drives: name -> (default weight, path, params(rng, start, end))
+ENDPOINTS = {
+    "kpi": (20, "/analytics/kpi", lambda rng, start, end: {"date": _day(rng, start, end).isoformat()}),
+    "kpi_series": (5, "/analytics/kpi-series", lambda rng, start, end: _day_range(rng, start, end, 90)),
+    "revenue_by_month_category": (10, "/analytics/revenue-by-month-category", _month_range),
+    "repeat_rate": (8, "/analytics/repeat-rate", _month_range),
+    "cohort_retention": (8, "/analytics/cohort-retention",
+                         lambda rng, start, end: dict(_month_range(rng, start, end), horizon=rng.choice([6, 12]))),
+    "rfm": (10, "/analytics/rfm",
+            lambda rng, start, end: {"as_of": _day(rng, start, end).isoformat(), "page_size": 100}),
+    "rfm_segments": (3, "/analytics/rfm/segments",
+                     lambda rng, start, end: {"as_of": _day(rng, start, end).isoformat()}),
+    "top_products": (15, "/analytics/top-products",
+                     lambda rng, start, end: dict(_day_range(rng, start, end), n=rng.choice([5, 10, 25]))),
+    "low_stock": (10, "/analytics/low-stock", lambda rng, start, end: {"n": rng.choice([10, 20, 50])}),
+    "order_funnel": (10, "/analytics/order-funnel", _day_range),
+}
+
+def parse_mix(mix):
+    """'kpi=5,rfm=1' -> {name: weight}; an empty mix uses every endpoint's default weight"""
+    if not mix:
+        return {name: weight for name, (weight, _, _) in ENDPOINTS.items()}
+    weights = {}
+    for part in mix.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise ValueError(f"Unknown endpoint in mix: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+def percentile(values, fraction):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+class HTTPClient:
+    """One keep-alive connection to a running server"""
+
+    def __init__(self, base_url):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or 80
+        self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+
+    def get(self, path):
+        try:
+            self.connection.request("GET", path)
+            response = self.connection.getresponse()
+        except (http.client.HTTPException, OSError):
+            # Reconnect once if the server closed the idle connection
+            self.connection.close()
+            self.connection = http.client.HTTPConnection(self.host, self.port, timeout=60)
+            self.connection.request("GET", path)
+            response = self.connection.getresponse()
+        body = response.read()
+        return response.status, len(body)
+
+    def close(self):
+        self.connection.close()
+
+class TestClient:
+    """The Flask test client, for measuring the app without a network hop"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def get(self, path):
+        response = self.client.get(path)
+        return response.status_code, len(response.get_data())
+
+    def close(self):
+        pass
+
+def run_load(make_client, weights, clients=10, duration=10.0, start=date(2024, 1, 1), end=date(2024, 12, 31), seed=1):
+    """Drive the endpoint mix from concurrent clients and return per-endpoint latency and throughput"""
+    names = list(weights)
+    cumulative = []
+    total = 0.0
+    for name in names:
+        total += weights[name]
+        cumulative.append(total)
+
+    lock = threading.Lock()
+    samples = {name: [] for name in names}
+    errors = {name: 0 for name in names}
+    sizes = {name: 0 for name in names}
+    deadline = time.perf_counter() + duration
+
+    def worker(index):
+        # Each client gets its own generator so a seed reproduces the same request sequence
+        rng = random.Random(seed * 1000 + index)
+        client = make_client()
+        try:
+            while time.perf_counter() < deadline:
+                name = rng.choices(names, cum_weights=cumulative)[0]
+                _, path, make_params = ENDPOINTS[name]
+                url = f"{path}?{urlencode(make_params(rng, start, end))}"
+                started = time.perf_counter()
+                try:
+                    status, size = client.get(url)
+                except Exception:
+                    status, size = None, 0
+                elapsed = time.perf_counter() - started
+                with lock:
+                    samples[name].append(elapsed)
+                    sizes[name] += size
+                    # 404 is the KPI route's answer for a day without orders, not a failure
+                    if status is None or status >= 500 or (status >= 400 and status != 404):
+                        errors[name] += 1
+        finally:
+            client.close()
+
+    began = time.perf_counter()
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+
+    endpoints = {}
+    for name in names:
+        latencies = samples[name]
+        endpoints[name] = {
+            "requests": len(latencies),
+            "errors": errors[name],
+            "rps": round(len(latencies) / elapsed, 1),
+            "p50_ms": round(percentile(latencies, 0.50) * 1000, 2),
+            "p90_ms": round(percentile(latencies, 0.90) * 1000, 2),
+            "p99_ms": round(percentile(latencies, 0.99) * 1000, 2),
+            "max_ms": round(max(latencies, default=0.0) * 1000, 2),
+            "bytes": sizes[name],
+        }
+    every = [latency for latencies in samples.values() for latency in latencies]
+    return {
+        "clients": clients,
+        "seconds": round(elapsed, 2),
+        "requests": len(every),
+        "errors": sum(errors.values()),
+        "rps": round(len(every) / elapsed, 1),
+        "p50_ms": round(percentile(every, 0.50) * 1000, 2),
+        "p99_ms": round(percentile(every, 0.99) * 1000, 2),
+        "endpoints": endpoints,
+    }
+
+def serve_in_background(app, port=0):
+    """Start a threaded development server on a local port; returns (server, base_url)"""
+    import logging
+    from werkzeug.serving import make_server
+
+    # Per-request access lines would dominate the output and slow the server under test
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", port, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.port}"
+
+if __name__ == "__main__":
+    import argparse
+    from datetime import datetime
+
+    parser = argparse.ArgumentParser(description="Load-test the /analytics endpoints")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", help="Base URL of a running server, e.g. one started with gunicorn")
+    target.add_argument("--in-process", action="store_true", help="Use the Flask test client instead of HTTP")
+    parser.add_argument("--port", type=int, default=0, help="Port for the built-in server when --url is not given")
+    parser.add_argument("--clients", type=int, default=10, help="Concurrent clients")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    parser.add_argument("--mix", default="", help="Endpoint weights, e.g. kpi=5,rfm=1 (default: all endpoints)")
+    parser.add_argument("--start", default="2024-01-01", help="Earliest date used in request params")
+    parser.add_argument("--end", default="2024-12-31", help="Latest date used in request params")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the request sequence")
+    parser.add_argument("--output", help="Also write the report as JSON to this path")
+    args = parser.parse_args()
+
+    server = None
+    if args.url:
+        base_url = args.url
+        make_client = lambda: HTTPClient(base_url)
+    else:
+        from app import app
+        if args.in_process:
+            make_client = lambda: TestClient(app)
+        else:
+            server, base_url = serve_in_background(app, args.port)
+            make_client = lambda: HTTPClient(base_url)
+
+    report = run_load(
+        make_client, parse_mix(args.mix), clients=args.clients, duration=args.duration,
+        start=datetime.strptime(args.start, "%Y-%m-%d").date(),
+        end=datetime.strptime(args.end, "%Y-%m-%d").date(),
+        seed=args.seed,
+    )
+    if server is not None:
+        server.shutdown()
+
+    print(f"{report['requests']} requests in {report['seconds']}s from {report['clients']} clients: "
+          f"{report['rps']} req/s, p50 {report['p50_ms']} ms, p99 {report['p99_ms']} ms, {report['errors']} errors")
+    for name, stats in sorted(report["endpoints"].items()):
+        print(f"  {name:28} {stats['requests']:7} req {stats['rps']:8} req/s  p50 {stats['p50_ms']:8} ms  "
+              f"p99 {stats['p99_ms']:8} ms  errors {stats['errors']}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
@@ -0,0 +1,182 @@
+import os
+import time
+import logging
+import threading
+from flask import g, request, has_app_context
+from flask.json.provider import DefaultJSONProvider
+
+logger = logging.getLogger(__name__)
+slow_query_logger = logging.getLogger("slow_query")
+
+# Latency buckets in seconds, from sub-millisecond cache-warm queries to multi-second scans
+LATENCY_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+def _label_text(labelnames, values):
+    if not labelnames:
+        return ""
+    pairs = []
+    for name, value in zip(labelnames, values):
+        escaped = str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+        pairs.append(f'{name}="{escaped}"')
+    return "{" + ",".join(pairs) + "}"
+
+class Counter:
+    """Monotonic per-label-set totals"""
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_label_text(self.labelnames, labels)} {value}")
+        return lines
+
+class Histogram:
+    """Cumulative bucket counts, sum and count per label set"""
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, labels, value):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * len(self.buckets), 0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        labelnames = self.labelnames + ("le",)
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                for bound, bucket_count in zip(self.buckets, counts):
+                    lines.append(f"{self.name}_bucket{_label_text(labelnames, labels + (repr(bound),))} {bucket_count}")
+                lines.append(f"{self.name}_bucket{_label_text(labelnames, labels + ('+Inf',))} {count}")
+                lines.append(f"{self.name}_sum{_label_text(self.labelnames, labels)} {total}")
+                lines.append(f"{self.name}_count{_label_text(self.labelnames, labels)} {count}")
+        return lines
+
+QUERY_EXECUTE_SECONDS = Histogram(
+    "analytics_query_execute_seconds", "Time for the database to execute a query", ["query"]
+)
+QUERY_FETCH_SECONDS = Histogram(
+    "analytics_query_fetch_seconds", "Time to fetch and convert a query's rows", ["query"]
+)
+QUERY_ROWS = Counter("analytics_query_rows_total", "Rows returned by queries", ["query"])
+SLOW_QUERIES = Counter("analytics_slow_queries_total", "Queries over SLOW_QUERY_MS", ["query"])
+REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to handle a request", ["endpoint", "method", "status"]
+)
+SERIALIZE_SECONDS = Histogram(
+    "http_response_serialize_seconds", "Time spent encoding JSON responses", ["endpoint"]
+)
+RESPONSE_BYTES = Counter("http_response_bytes_total", "Bytes in non-streamed response bodies", ["endpoint"])
+
+METRICS = [
+    QUERY_EXECUTE_SECONDS, QUERY_FETCH_SECONDS, QUERY_ROWS, SLOW_QUERIES,
+    REQUEST_SECONDS, SERIALIZE_SECONDS, RESPONSE_BYTES,
+]
+
+def slow_query_threshold():
+    """Seconds above which a query's plan is logged, or None when the slow-query log is off"""
+    value = float(os.environ.get("SLOW_QUERY_MS", 0))
+    return value / 1000 if value > 0 else None
+
+def record_query(name, execute_seconds, fetch_seconds, rows):
+    """Record one query execution and emit its structured log line"""
+    name = name or "adhoc"
+    QUERY_EXECUTE_SECONDS.observe((name,), execute_seconds)
+    QUERY_FETCH_SECONDS.observe((name,), fetch_seconds)
+    QUERY_ROWS.inc((name,), rows)
+    logger.debug(
+        f"query={name} execute_ms={execute_seconds * 1000:.2f} fetch_ms={fetch_seconds * 1000:.2f} rows={rows}"
+    )
+
+def log_slow_query(name, statement, params, elapsed, bind_arguments=None):
+    """Log the plan of a query that ran longer than SLOW_QUERY_MS"""
+    from app import db
+
+    name = name or "adhoc"
+    SLOW_QUERIES.inc((name,))
+    # The query may have run on the DuckDB analytics mirror rather than the primary database
+    engine = bind_arguments["bind"] if bind_arguments else db.engine
+    prefix = "EXPLAIN QUERY PLAN " if engine.dialect.name == "sqlite" else "EXPLAIN "
+    try:
+        rows = db.session.execute(db.text(prefix + str(statement)), params, bind_arguments=bind_arguments).fetchall()
+        plan = "\n".join(" | ".join(str(value) for value in row) for row in rows)
+    except Exception as e:
+        plan = f"(plan unavailable: {str(e)})"
+    slow_query_logger.warning(f"query={name} elapsed_ms={elapsed * 1000:.1f} params={params}\n{plan}")
+
+def record_serialize(seconds):
+    """Add JSON encoding time to the current request's total"""
+    if has_app_context():
+        g.serialize_seconds = g.get("serialize_seconds", 0.0) + seconds
+
+class TimedJSONProvider(DefaultJSONProvider):
+    """Default JSON provider that records its encoding time"""
+
+    def dumps(self, obj, **kwargs):
+        started = time.perf_counter()
+        result = super().dumps(obj, **kwargs)
+        record_serialize(time.perf_counter() - started)
+        return result
+
+def init_metrics(app):
+    """Time every request and count response bytes per endpoint"""
+    app.json = TimedJSONProvider(app)
+
+    @app.before_request
+    def start_timer():
+        g.request_started = time.perf_counter()
+        g.serialize_seconds = 0.0
+
+    @app.after_request
+    def record_request(response):
+        started = g.get("request_started")
+        if started is None:
+            return response
+        elapsed = time.perf_counter() - started
+        endpoint = request.endpoint or "unmatched"
+        REQUEST_SECONDS.observe((endpoint, request.method, str(response.status_code)), elapsed)
+        SERIALIZE_SECONDS.observe((endpoint,), g.serialize_seconds)
+        size = None if response.is_streamed else response.calculate_content_length()
+        if size is not None:
+            RESPONSE_BYTES.inc((endpoint,), size)
+        logger.debug(
+            f"route={endpoint} status={response.status_code} total_ms={elapsed * 1000:.2f} "
+            f"serialize_ms={g.serialize_seconds * 1000:.2f} bytes={size if size is not None else 'streamed'}"
+        )
+        return response
+
+def render_metrics():
+    """Every metric, plus the query cache counters, in Prometheus text exposition format"""
+    from query_cache import query_cache
+
+    lines = []
+    for metric in METRICS:
+        lines.extend(metric.render())
+    cache = query_cache.stats()
+    for key, kind in (("hits", "counter"), ("misses", "counter"), ("evictions", "counter"), ("entries", "gauge"), ("bytes", "gauge")):
+        name = f"analytics_query_cache_{key}" + ("_total" if kind == "counter" else "")
+        lines.extend([f"# TYPE {name} {kind}", f"{name} {cache[key]}"])
+    return "\n".join(lines) + "\n"
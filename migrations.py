@@ -0,0 +1,107 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+# db.create_all() adds missing tables but never changes existing ones; each step below upgrades a table
+# created by an earlier version in place, and does nothing on a database that already has the change
+
+def _columns(table):
+    """Column names of a table, from an empty result; DuckDB does not support schema reflection"""
+    from app import db
+
+    return set(db.session.execute(db.text(f"SELECT * FROM {table} WHERE 1 = 0")).keys())
+
+def add_order_item_line_numbers():
+    """Give order items loaded before the (order_id, line_number) key their line numbers.
+
+    Every existing row is kept and numbered 1..n within its order by insertion order, which is the
+    order the lines appear in the file. Earlier loads inserted every line again on each reload, but
+    such a copy cannot be told apart from a line the order really repeats, so nothing is deleted;
+    repeated lines are reported instead, and a reload into a new database removes any reload copies.
+    """
+    from app import db
+    from db_utils import get_db_dialect
+
+    if "line_number" in _columns("order_items"):
+        return False
+
+    # DuckDB cannot add a column with a constraint
+    not_null = "" if get_db_dialect() == "duckdb" else " NOT NULL"
+    db.session.execute(db.text(f"ALTER TABLE order_items ADD COLUMN line_number INTEGER{not_null} DEFAULT 1"))
+    repeated = db.session.execute(db.text(
+        "SELECT COUNT(*) FROM (SELECT ROW_NUMBER() OVER ("
+        "PARTITION BY order_id, product_id, quantity, unit_price, discount ORDER BY order_item_id"
+        ") AS copy FROM order_items) copies WHERE copy > 1"
+    )).scalar()
+    db.session.execute(db.text(
+        "UPDATE order_items SET line_number = numbered.line_number FROM ("
+        "SELECT order_item_id, ROW_NUMBER() OVER (PARTITION BY order_id ORDER BY order_item_id) AS line_number "
+        "FROM order_items) numbered WHERE order_items.order_item_id = numbered.order_item_id"
+    ))
+    # DuckDB cannot index a table with uncommitted updates
+    db.session.commit()
+    db.session.execute(db.text(
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_order_items_order_line ON order_items (order_id, line_number)"
+    ))
+    db.session.commit()
+    logger.info("Added order_items.line_number")
+    if repeated:
+        logger.warning(
+            f"{repeated} order items repeat an earlier line of the same order; if the source files have no such "
+            "repeats they are copies from reloads before line numbers, and a new database loaded from the files "
+            "drops them"
+        )
+    return True
+
+def add_order_item_order_dates():
+    """Copy each order's date onto its items, which SQLite archives and date-bounded queries read.
+
+    On PostgreSQL the two tables must also be partitioned by month, which cannot be done in place;
+    an unpartitioned database is reported rather than upgraded.
+    """
+    from app import db
+    from db_utils import get_db_dialect
+
+    if "order_date" in _columns("order_items"):
+        return False
+    if get_db_dialect() == "postgresql":
+        raise RuntimeError(
+            "orders and order_items were created before monthly partitioning; "
+            "create a new database and load the source files into it"
+        )
+
+    column_type = db.metadata.tables["order_items"].c.order_date.type.compile(dialect=db.engine.dialect)
+    db.session.execute(db.text(f"ALTER TABLE order_items ADD COLUMN order_date {column_type}"))
+    db.session.execute(db.text(
+        "UPDATE order_items SET order_date = "
+        "(SELECT o.order_date FROM orders o WHERE o.order_id = order_items.order_id)"
+    ))
+    db.session.commit()
+    logger.info("Added order_items.order_date")
+    return True
+
+# Applied in order at startup
+MIGRATIONS = [
+    add_order_item_line_numbers,
+    add_order_item_order_dates,
+]
+
+def migrate():
+    """Apply every pending migration, returning the names of those that changed the schema"""
+    from app import db
+
+    applied = []
+    for migration in MIGRATIONS:
+        try:
+            if migration():
+                applied.append(migration.__name__)
+        except Exception as e:
+            db.session.rollback()
+            raise RuntimeError(f"Schema migration {migration.__name__} failed: {str(e)}") from e
+    return applied
+
+def init_migrations(app):
+    """Upgrade tables created by earlier versions before anything reads them"""
+    applied = migrate()
+    if applied:
+        logger.info(f"Applied schema migrations: {', '.join(applied)}")
@@ -1,12 +1,22 @@
 from app import db
-from sqlalchemy import CheckConstraint
+from sqlalchemy import CheckConstraint, UniqueConstraint
 from datetime import datetime
+from db_utils import get_db_dialect
+
+# On PostgreSQL orders and order_items are range-partitioned by month on order_date (see partitions.py),
+# so order_date joins their keys; SQLite keeps single-column keys and archives old years instead
+PARTITIONED = get_db_dialect() == "postgresql"
+ARCHIVED = get_db_dialect() == "sqlite"
+
+# DuckDB has no SERIAL type; surrogate keys draw from an explicit sequence there
+DUCKDB = get_db_dialect() == "duckdb"
+ORDER_ITEM_ID_SEQUENCE = db.Sequence("order_items_order_item_id_seq")
 
 class Customer(db.Model):
     __tablename__ = 'customers'
     
     customer_id = db.Column(db.String(50), primary_key=True)
-    first_order_date = db.Column(db.Date)
+    first_order_date = db.Column(db.Date)  # as supplied by the CSV; analytics use CustomerFirstPurchase
     last_order_date = db.Column(db.Date)
     signup_date = db.Column(db.Date, nullable=True)
     customer_city = db.Column(db.String(100))
@@ -19,7 +29,7 @@ class Customer(db.Model):
 class Category(db.Model):
     __tablename__ = 'categories'
     
-    category_id = db.Column(db.Integer, primary_key=True)
+    category_id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # ids come from the source data
     category_name = db.Column(db.String(100), nullable=False)
     
     # Relationships
@@ -28,7 +38,7 @@ class Category(db.Model):
 class Product(db.Model):
     __tablename__ = 'products'
     
-    product_id = db.Column(db.Integer, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
     category_id = db.Column(db.Integer, db.ForeignKey('categories.category_id'), nullable=False)
     product_name = db.Column(db.String(255), nullable=False)
     unit_cost = db.Column(db.Numeric(10, 2), nullable=False)
@@ -44,23 +54,31 @@ class Order(db.Model):
     
     order_id = db.Column(db.String(50), primary_key=True)
     customer_id = db.Column(db.String(50), db.ForeignKey('customers.customer_id'), nullable=False)
-    order_date = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    order_date = db.Column(db.DateTime, primary_key=PARTITIONED, nullable=False, default=datetime.utcnow)
     order_status = db.Column(db.String(20), nullable=False)  # created, paid, shipped, delivered, canceled, refunded
     payment_amount = db.Column(db.Numeric(10, 2), nullable=False)
     payment_status = db.Column(db.String(20), nullable=False)  # paid, pending, failed, refunded
     
     __table_args__ = (
         CheckConstraint('payment_amount >= 0', name='check_payment_amount_positive'),
-    )
+    ) + (({"postgresql_partition_by": "RANGE (order_date)"},) if PARTITIONED else ())
     
-    # Relationships
-    order_items = db.relationship('OrderItem', backref='order', lazy=True)
+    # Relationships; joined on order_id alone, since a partitioned table has no single-column key to reference
+    order_items = db.relationship(
+        'OrderItem', backref='order', lazy=True,
+        primaryjoin="Order.order_id == foreign(OrderItem.order_id)"
+    )
 
 class OrderItem(db.Model):
     __tablename__ = 'order_items'
     
-    order_item_id = db.Column(db.Integer, primary_key=True, autoincrement=True)
-    order_id = db.Column(db.String(50), db.ForeignKey('orders.order_id'), nullable=False)
+    order_item_id = db.Column(
+        db.Integer, *([ORDER_ITEM_ID_SEQUENCE] if DUCKDB else []), primary_key=True, autoincrement=True,
+        server_default=ORDER_ITEM_ID_SEQUENCE.next_value() if DUCKDB else None
+    )
+    order_id = db.Column(db.String(50), *([] if PARTITIONED else [db.ForeignKey('orders.order_id')]), nullable=False)
+    order_date = db.Column(db.DateTime, primary_key=PARTITIONED)  # copied from the order, for partitioning and archiving
+    line_number = db.Column(db.Integer, nullable=False, default=1)  # position within the order; natural key with order_id
     product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False)
     unit_price = db.Column(db.Numeric(10, 2), nullable=False)  # captured at time of sale
@@ -70,7 +88,10 @@ class OrderItem(db.Model):
         CheckConstraint('quantity > 0', name='check_quantity_positive'),
         CheckConstraint('unit_price >= 0', name='check_unit_price_positive'),
         CheckConstraint('discount >= 0', name='check_discount_positive'),
-    )
+        UniqueConstraint(
+            'order_id', 'line_number', *(['order_date'] if PARTITIONED else []), name='uq_order_items_order_line'
+        ),
+    ) + (({"postgresql_partition_by": "RANGE (order_date)"},) if PARTITIONED else ())
 
 class Inventory(db.Model):
     __tablename__ = 'inventory'
@@ -79,3 +100,113 @@ class Inventory(db.Model):
     on_hand_qty = db.Column(db.Integer, nullable=False, default=0)
     reorder_point = db.Column(db.Integer, nullable=False, default=0)
     reorder_qty = db.Column(db.Integer, nullable=False, default=0)
+
+class LoadWatermark(db.Model):
+    __tablename__ = 'load_watermarks'
+    
+    table_name = db.Column(db.String(50), primary_key=True)
+    file_offset = db.Column(db.BigInteger, nullable=False, default=0)  # bytes of the CSV already loaded
+    tail_hash = db.Column(db.String(64))  # sha256 of the bytes just before file_offset
+    high_water_mark = db.Column(db.String(50))  # max order_date loaded, for tables that have one
+    rows_loaded = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class DataVersion(db.Model):
+    __tablename__ = 'data_version'
+    
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)  # single row, id = 1
+    version = db.Column(db.Integer, nullable=False, default=0)  # bumped after every completed load
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class DailyProductSales(db.Model):
+    __tablename__ = 'daily_product_sales'
+    
+    sale_date = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), primary_key=True)
+    fulfilled = db.Column(db.Boolean, primary_key=True)  # order_status in paid, shipped, delivered
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    margin = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+
+class DailyCategorySales(db.Model):
+    __tablename__ = 'daily_category_sales'
+    
+    sale_date = db.Column(db.Date, primary_key=True)
+    category_id = db.Column(db.Integer, db.ForeignKey('categories.category_id'), primary_key=True)
+    fulfilled = db.Column(db.Boolean, primary_key=True)  # order_status in paid, shipped, delivered
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    margin = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+
+class CustomerFirstPurchase(db.Model):
+    __tablename__ = 'customer_first_purchases'
+    
+    customer_id = db.Column(db.String(50), db.ForeignKey('customers.customer_id'), primary_key=True)
+    first_order_date = db.Column(db.DateTime, nullable=False)  # first paid order
+    cohort_month = db.Column(db.Date, nullable=False)
+    paid_order_count = db.Column(db.Integer, nullable=False, default=0)
+
+class CustomerSketch(db.Model):
+    __tablename__ = 'customer_sketches'
+    
+    grain = db.Column(db.String(5), primary_key=True)  # day or month
+    period_start = db.Column(db.Date, primary_key=True)
+    cohort_month = db.Column(db.Date, primary_key=True)
+    registers = db.Column(db.LargeBinary, nullable=False)  # HyperLogLog of the cohort's paid customers in the period
+
+class RfmSnapshotRun(db.Model):
+    __tablename__ = 'rfm_snapshot_runs'
+    
+    as_of_date = db.Column(db.Date, primary_key=True)
+    base_as_of_date = db.Column(db.Date)  # earlier snapshot this one was derived from; NULL for a full build
+    customers = db.Column(db.Integer, nullable=False, default=0)  # scored customers
+    breakpoints = db.Column(db.Text, nullable=False)  # JSON: lowest value of each quintile per metric
+    built_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+class RfmSnapshot(db.Model):
+    __tablename__ = 'rfm_snapshots'
+    
+    as_of_date = db.Column(db.Date, primary_key=True)
+    customer_id = db.Column(db.String(50), primary_key=True)
+    last_order_date = db.Column(db.Date, nullable=False)  # last paid order day up to as_of_date
+    recency_days = db.Column(db.Integer, nullable=False)
+    frequency = db.Column(db.Integer, nullable=False)
+    monetary = db.Column(db.Numeric(14, 2), nullable=False)
+    r_score = db.Column(db.Integer)  # scores and segment are NULL for customers without positive revenue
+    f_score = db.Column(db.Integer)
+    m_score = db.Column(db.Integer)
+    rfm_total = db.Column(db.Integer)
+    segment = db.Column(db.String(20))
+
+class CohortRetention(db.Model):
+    __tablename__ = 'cohort_retention'
+    
+    cohort_month = db.Column(db.Date, primary_key=True)
+    months_since = db.Column(db.Integer, primary_key=True)
+    activity_month = db.Column(db.Date, nullable=False)
+    active_customers = db.Column(db.Integer, nullable=False, default=0)  # paid customers of the cohort active that month
+
+class ProductSalesVelocity(db.Model):
+    __tablename__ = 'product_sales_velocity'
+    
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), primary_key=True)
+    window_start = db.Column(db.Date, nullable=False)
+    window_end = db.Column(db.Date, nullable=False)  # last sale day loaded
+    units = db.Column(db.Integer, nullable=False, default=0)  # fulfilled units sold in the window
+    daily_rate = db.Column(db.Numeric(12, 4), nullable=False, default=0)
+
+class LowStockAlert(db.Model):
+    __tablename__ = 'low_stock_alerts'
+    
+    product_id = db.Column(db.Integer, db.ForeignKey('products.product_id'), primary_key=True)
+    product_name = db.Column(db.String(255), nullable=False)
+    category_name = db.Column(db.String(100), nullable=False)
+    on_hand_qty = db.Column(db.Integer, nullable=False)
+    reorder_point = db.Column(db.Integer, nullable=False)
+    recommended_order_qty = db.Column(db.Integer, nullable=False)
+    daily_sales_rate = db.Column(db.Numeric(12, 4), nullable=False, default=0)
+    days_of_cover = db.Column(db.Numeric(12, 1))  # NULL without sales in the velocity window
+    urgency = db.Column(db.String(20), nullable=False)  # Out of Stock, Critical or Low
+    urgency_rank = db.Column(db.Integer, nullable=False)
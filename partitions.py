@@ -0,0 +1,209 @@
+import re
+import logging
+import threading
+from datetime import date, datetime
+
+logger = logging.getLogger(__name__)
+
+# Tables split by order_date: monthly partitions on PostgreSQL, per-year archives on SQLite;
+# DuckDB keeps each in one table, whose per-row-group zone maps already skip old months
+PARTITIONED_TABLES = ("orders", "order_items")
+PARTITION_COLUMN = "order_date"
+
+ARCHIVE_PATTERN = re.compile(r"^orders_archive_(\d{4})$")
+
+# PostgreSQL partitions known to exist in this process, so loads only issue DDL for new months
+_created_partitions = set()
+_partition_lock = threading.Lock()
+
+def _month_start(value):
+    if isinstance(value, datetime):
+        value = value.date()
+    if not isinstance(value, date):
+        value = datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+    return value.replace(day=1)
+
+def _next_month(month):
+    return date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+def partition_name(table, month):
+    return f"{table}_p{month:%Y%m}"
+
+def archive_name(table, year):
+    return f"{table}_archive_{year}"
+
+def ensure_month_partitions(start, end):
+    """Create the PostgreSQL monthly partitions covering start..end for both tables"""
+    from app import db
+
+    if start is None or end is None:
+        return
+    month = _month_start(start)
+    last = _month_start(end)
+    while month <= last:
+        with _partition_lock:
+            if month not in _created_partitions:
+                for table in PARTITIONED_TABLES:
+                    db.session.execute(db.text(
+                        f"CREATE TABLE IF NOT EXISTS {partition_name(table, month)} PARTITION OF {table} "
+                        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_next_month(month).isoformat()}')"
+                    ))
+                _created_partitions.add(month)
+        month = _next_month(month)
+
+def archived_years():
+    """Years moved out of the live SQLite tables, oldest first"""
+    from app import db
+
+    names = db.session.execute(db.text("SELECT name FROM sqlite_master WHERE type = 'table'")).scalars()
+    return sorted(int(match.group(1)) for match in map(ARCHIVE_PATTERN.match, names) if match)
+
+def refresh_archive_views():
+    """(Re)create orders_all and order_items_all over the live table and every yearly archive"""
+    from app import db
+
+    years = archived_years()
+    for table in PARTITIONED_TABLES:
+        sources = [f"SELECT * FROM {table}"] + [f"SELECT * FROM {archive_name(table, year)}" for year in years]
+        db.session.execute(db.text(f"DROP VIEW IF EXISTS {table}_all"))
+        db.session.execute(db.text(f"CREATE VIEW {table}_all AS " + " UNION ALL ".join(sources)))
+    db.session.commit()
+
+def _create_archive_tables(year):
+    """Copy the live tables' DDL (keys and constraints included) to the year's archive tables"""
+    from app import db
+
+    for table in PARTITIONED_TABLES:
+        ddl = db.session.execute(
+            db.text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"), {"name": table}
+        ).scalar()
+        archive = archive_name(table, year)
+        db.session.execute(db.text(
+            re.sub(rf'^CREATE TABLE "?{table}"?', f"CREATE TABLE IF NOT EXISTS {archive}", ddl)
+        ))
+        db.session.execute(db.text(
+            f"CREATE INDEX IF NOT EXISTS idx_{archive}_date ON {archive}({PARTITION_COLUMN})"
+        ))
+    db.session.execute(db.text(
+        f"CREATE INDEX IF NOT EXISTS idx_{archive_name('orders', year)}_customer "
+        f"ON {archive_name('orders', year)}(customer_id, order_date)"
+    ))
+    db.session.execute(db.text(
+        f"CREATE INDEX IF NOT EXISTS idx_{archive_name('order_items', year)}_order "
+        f"ON {archive_name('order_items', year)}(order_id)"
+    ))
+
+def _move_year(year):
+    """Move the live rows of one year into its archive tables, replacing rows already there"""
+    from app import db
+
+    params = {"start": f"{year}-01-01", "end": f"{year + 1}-01-01"}
+    moved = 0
+    for table in PARTITIONED_TABLES:
+        # Surrogate ids are reassigned by the archive; natural keys decide which rows get replaced
+        columns = ", ".join(
+            column.name for column in db.metadata.tables[table].columns if column.autoincrement is not True
+        )
+        db.session.execute(db.text(
+            f"INSERT OR REPLACE INTO {archive_name(table, year)} ({columns}) SELECT {columns} FROM {table} "
+            f"WHERE {PARTITION_COLUMN} >= :start AND {PARTITION_COLUMN} < :end"
+        ), params)
+        moved += db.session.execute(db.text(
+            f"DELETE FROM {table} WHERE {PARTITION_COLUMN} >= :start AND {PARTITION_COLUMN} < :end"
+        ), params).rowcount
+    return moved
+
+def reset_partitions():
+    """Start over after drop_all/create_all: drop SQLite archives, recreate PostgreSQL default partitions"""
+    from app import db
+    from db_utils import get_db_dialect
+
+    with _partition_lock:
+        _created_partitions.clear()
+    if get_db_dialect() == "sqlite":
+        for year in archived_years():
+            for table in PARTITIONED_TABLES:
+                db.session.execute(db.text(f"DROP TABLE IF EXISTS {archive_name(table, year)}"))
+        db.session.commit()
+    init_partitions(None)
+
+def settle_archives():
+    """Move rows a load wrote to the live SQLite tables into the archive of their year"""
+    from app import db
+
+    moved = sum(_move_year(year) for year in archived_years())
+    db.session.commit()
+    if moved:
+        logger.info(f"Moved {moved} late rows into yearly archives")
+
+def archive_before(cutoff):
+    """Split off old orders: per-year SQLite archives, or detached PostgreSQL month partitions.
+
+    On SQLite every full year before the cutoff year moves to orders_archive_<year> and
+    order_items_archive_<year>, which stay queryable through the *_all views. On PostgreSQL
+    month partitions ending on or before the cutoff are detached into standalone tables.
+    """
+    from app import db
+    from db_utils import get_db_dialect
+
+    cutoff = _month_start(cutoff)
+    if get_db_dialect() == "duckdb":
+        logger.info("DuckDB keeps orders in single tables; nothing to archive")
+        return []
+    if get_db_dialect() == "postgresql":
+        detached = []
+        rows = db.session.execute(db.text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = 'orders'"
+        )).scalars()
+        for name in sorted(rows):
+            match = re.match(r"^orders_p(\d{4})(\d{2})$", name)
+            if not match or date(int(match.group(1)), int(match.group(2)), 1) >= cutoff:
+                continue
+            month = date(int(match.group(1)), int(match.group(2)), 1)
+            for table in PARTITIONED_TABLES:
+                db.session.execute(db.text(f"ALTER TABLE {table} DETACH PARTITION {partition_name(table, month)}"))
+            with _partition_lock:
+                _created_partitions.discard(month)
+            detached.append(month.strftime("%Y-%m"))
+        db.session.commit()
+        logger.info(f"Detached {len(detached)} monthly partitions before {cutoff}")
+        return detached
+
+    years = db.session.execute(db.text(
+        "SELECT DISTINCT CAST(strftime('%Y', order_date) AS INTEGER) FROM orders WHERE order_date < :cutoff"
+    ), {"cutoff": date(cutoff.year, 1, 1).isoformat()}).scalars().all()
+    for year in sorted(years):
+        _create_archive_tables(year)
+        moved = _move_year(year)
+        logger.info(f"Archived {moved} rows from {year}")
+    db.session.commit()
+    refresh_archive_views()
+    return sorted(years)
+
+def init_partitions(app):
+    """Create the default PostgreSQL partitions, or the SQLite archive views"""
+    from app import db
+    from db_utils import get_db_dialect
+
+    dialect = get_db_dialect()
+    if dialect == "postgresql":
+        for table in PARTITIONED_TABLES:
+            # Catches rows no monthly partition covers, so an insert never fails on a missing month
+            db.session.execute(db.text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+        db.session.commit()
+    elif dialect == "sqlite":
+        refresh_archive_views()
+
+if __name__ == "__main__":
+    import argparse
+    from app import app
+
+    parser = argparse.ArgumentParser(description="Archive or detach old order partitions")
+    parser.add_argument("--archive-before", required=True, metavar="YYYY-MM-DD",
+                        help="SQLite: archive full years before this date's year. PostgreSQL: detach months before it")
+    args = parser.parse_args()
+
+    with app.app_context():
+        print(archive_before(datetime.strptime(args.archive_before, '%Y-%m-%d').date()))
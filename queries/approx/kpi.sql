@@ -0,0 +1,68 @@
+-- Daily KPI snapshot without the distinct-customer count
+-- Used by approx=true, which estimates unique customers from the loader's sketches
+-- Every other column must match kpi.sql, tie-breakers included; tests/test_approx.py compares the two
+WITH day_orders AS (
+    -- Paid orders in a date range: an equality then a range, served by idx_orders_status_date
+    SELECT 
+        order_id,
+        customer_id,
+        payment_amount
+    FROM orders
+    WHERE 
+        order_date >= :target_date
+        AND order_date < :next_date
+        AND payment_status = 'paid'
+),
+daily_orders AS (
+    SELECT 
+        COUNT(*) AS total_orders,
+        SUM(payment_amount) AS total_revenue
+    FROM day_orders
+),
+new_customers AS (
+    -- Customers whose first paid order falls on the target date
+    SELECT 
+        COUNT(*) AS new_customers_count
+    FROM customer_first_purchases fp
+    WHERE 
+        fp.first_order_date >= :target_date
+        AND fp.first_order_date < :next_date
+),
+top_category AS (
+    SELECT 
+        c.category_name AS top_category_name,
+        SUM(d.revenue) AS category_revenue
+    FROM daily_category_sales d
+    JOIN categories c ON c.category_id = d.category_id
+    WHERE d.sale_date = :target_date
+    GROUP BY c.category_name
+    ORDER BY category_revenue DESC, top_category_name
+    LIMIT 1
+),
+top_product AS (
+    SELECT 
+        p.product_name AS top_product_name,
+        SUM(d.units) AS units_sold
+    FROM daily_product_sales d
+    JOIN products p ON p.product_id = d.product_id
+    WHERE d.sale_date = :target_date
+    GROUP BY p.product_name
+    ORDER BY units_sold DESC, top_product_name
+    LIMIT 1
+)
+SELECT 
+    :target_date AS date,
+    COALESCE(dorders.total_orders, 0) AS orders,
+    COALESCE(ROUND(dorders.total_revenue, 2), 0) AS revenue,
+    CASE 
+        WHEN dorders.total_orders > 0 
+        THEN ROUND(dorders.total_revenue / dorders.total_orders, 2)
+        ELSE 0 
+    END AS aov,
+    COALESCE(nc.new_customers_count, 0) AS new_customers,
+    COALESCE(tc.top_category_name, 'N/A') AS top_category,
+    COALESCE(tp.top_product_name, 'N/A') AS top_product
+FROM daily_orders dorders
+CROSS JOIN new_customers nc
+LEFT JOIN top_category tc ON true
+LEFT JOIN top_product tp ON true;
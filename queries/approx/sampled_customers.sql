@@ -0,0 +1,17 @@
+-- Sampled distinct customers by activity month and cohort
+-- Reads only customers whose hashtext() bucket (of 1024) is below the sample size, so the
+-- same customers are sampled on every run; callers scale the counts by the sample rate
+SELECT 
+    date_trunc('month', o.order_date) AS month,
+    fp.cohort_month,
+    COUNT(DISTINCT o.customer_id) AS customers
+FROM customer_first_purchases fp
+JOIN orders o ON o.customer_id = fp.customer_id
+WHERE 
+    (hashtext(fp.customer_id) & 1023) < :sample_buckets
+    AND fp.cohort_month >= :cohort_start
+    AND fp.cohort_month < :cohort_end
+    AND o.order_date >= :start_date
+    AND o.order_date < :end_date
+    AND o.payment_status = 'paid'
+GROUP BY date_trunc('month', o.order_date), fp.cohort_month
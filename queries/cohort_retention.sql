@@ -1,13 +1,15 @@
 -- Cohort retention analysis
 -- Tracks customer retention by their first order month
+-- keyset: cohort_month ASC, months_since ASC
 WITH customer_cohorts AS (
-    -- Determine each customer's cohort (first order month)
+    -- Each customer's cohort (first paid order month), maintained by the loader
     SELECT 
         customer_id,
-        date_trunc('month', MIN(order_date)) AS cohort_month
-    FROM orders
-    WHERE payment_status = 'paid'
-    GROUP BY customer_id
+        cohort_month
+    FROM customer_first_purchases
+    WHERE 
+        cohort_month >= :start_date
+        AND cohort_month <= :end_date
 ),
 customer_activities AS (
     -- Get all activity months for each customer
@@ -17,20 +19,14 @@ customer_activities AS (
         date_trunc('month', o.order_date) AS activity_month
     FROM orders o
     JOIN customer_cohorts cc ON cc.customer_id = o.customer_id
-    WHERE 
-        o.payment_status = 'paid'
-        AND cc.cohort_month >= :start_date
-        AND cc.cohort_month <= :end_date
+    WHERE o.payment_status = 'paid'
 ),
 cohort_sizes AS (
     -- Count of customers in each cohort
     SELECT 
         cohort_month,
-        COUNT(DISTINCT customer_id) AS cohort_size
+        COUNT(*) AS cohort_size
     FROM customer_cohorts
-    WHERE 
-        cohort_month >= :start_date
-        AND cohort_month <= :end_date
     GROUP BY cohort_month
 ),
 cohort_activities AS (
@@ -0,0 +1,17 @@
+-- Cohort retention from the maintained matrix (see rollups.refresh_cohort_retention)
+-- Same rows and order as cohort_retention.sql, reading only the requested cells
+-- Every customer is active in their cohort month, so the months_since = 0 cell is the cohort size
+-- keyset: cohort_month ASC, months_since ASC
+SELECT 
+    cr.cohort_month,
+    cr.months_since,
+    cr.active_customers,
+    cs.active_customers AS cohort_size,
+    ROUND(cr.active_customers * 100.0 / cs.active_customers, 2) AS retention_rate
+FROM cohort_retention cr
+JOIN cohort_retention cs ON cs.cohort_month = cr.cohort_month AND cs.months_since = 0
+WHERE 
+    cr.cohort_month >= :start_date
+    AND cr.cohort_month <= :end_date
+    AND cr.months_since <= :horizon
+ORDER BY cr.cohort_month, cr.months_since;
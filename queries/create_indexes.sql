@@ -10,6 +10,7 @@ CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(order_status);
 -- Order items table indexes
 CREATE INDEX IF NOT EXISTS idx_order_items_order ON order_items(order_id);
 CREATE INDEX IF NOT EXISTS idx_order_items_product ON order_items(product_id);
+CREATE INDEX IF NOT EXISTS idx_order_items_order_date ON order_items(order_date);
 
 -- Products table indexes
 CREATE INDEX IF NOT EXISTS idx_products_category ON products(category_id);
@@ -20,9 +21,24 @@ CREATE INDEX IF NOT EXISTS idx_customers_first_order ON customers(first_order_da
 CREATE INDEX IF NOT EXISTS idx_customers_last_order ON customers(last_order_date);
 CREATE INDEX IF NOT EXISTS idx_customers_email ON customers(email);
 
+-- Customer first purchases indexes (cohort joins, and new customers per day in the KPIs)
+CREATE INDEX IF NOT EXISTS idx_first_purchases_cohort ON customer_first_purchases(cohort_month);
+CREATE INDEX IF NOT EXISTS idx_first_purchases_first_order ON customer_first_purchases(first_order_date);
+
+-- Cohort retention indexes (month refreshes delete by activity month)
+CREATE INDEX IF NOT EXISTS idx_cohort_retention_activity ON cohort_retention(activity_month);
+
+-- RFM snapshot indexes (the snapshot's rows in rfm.sql order, for keyset pages)
+CREATE INDEX IF NOT EXISTS idx_rfm_snapshots_rank ON rfm_snapshots(as_of_date, rfm_total DESC, monetary DESC, customer_id);
+
+-- Low stock alert indexes (the alert set in endpoint order)
+CREATE INDEX IF NOT EXISTS idx_low_stock_alerts_rank ON low_stock_alerts(urgency_rank, on_hand_qty, product_id);
+
 -- Inventory table indexes
 CREATE INDEX IF NOT EXISTS idx_inventory_reorder ON inventory(on_hand_qty, reorder_point);
 
 -- Composite indexes for common query patterns
 CREATE INDEX IF NOT EXISTS idx_orders_date_status ON orders(order_date, payment_status);
+-- Paid orders in a date range (KPIs): status equality first, so only that status's date range is read
+CREATE INDEX IF NOT EXISTS idx_orders_status_date ON orders(payment_status, order_date);
 CREATE INDEX IF NOT EXISTS idx_orders_customer_date ON orders(customer_id, order_date);
@@ -44,14 +44,27 @@ CREATE TABLE IF NOT EXISTS orders (
 CREATE TABLE IF NOT EXISTS order_items (
     order_item_id INTEGER PRIMARY KEY AUTOINCREMENT,
     order_id VARCHAR(50) NOT NULL,
+    order_date TIMESTAMP,
+    line_number INTEGER NOT NULL DEFAULT 1,
     product_id INTEGER NOT NULL,
     quantity INTEGER NOT NULL CHECK (quantity > 0),
     unit_price DECIMAL(10,2) NOT NULL CHECK (unit_price >= 0),
     discount DECIMAL(10,2) DEFAULT 0 CHECK (discount >= 0),
+    UNIQUE (order_id, line_number),
     FOREIGN KEY (order_id) REFERENCES orders(order_id),
     FOREIGN KEY (product_id) REFERENCES products(product_id)
 );
 
+-- PostgreSQL partitions orders and order_items by month instead (see partitions.py):
+--   CREATE TABLE orders (..., PRIMARY KEY (order_id, order_date)) PARTITION BY RANGE (order_date)
+--   CREATE TABLE order_items (..., PRIMARY KEY (order_item_id, order_date),
+--       UNIQUE (order_id, line_number, order_date)) PARTITION BY RANGE (order_date)
+--   CREATE TABLE orders_p202401 PARTITION OF orders FOR VALUES FROM ('2024-01-01') TO ('2024-02-01')
+--   CREATE TABLE orders_default PARTITION OF orders DEFAULT
+-- order_items has no foreign key to orders there, since a partitioned key includes order_date
+-- SQLite moves old years to orders_archive_YYYY and order_items_archive_YYYY tables,
+-- read together with the live tables through the orders_all and order_items_all views
+
 -- Inventory table
 CREATE TABLE IF NOT EXISTS inventory (
     product_id INTEGER PRIMARY KEY,
@@ -60,3 +73,123 @@ CREATE TABLE IF NOT EXISTS inventory (
     reorder_qty INTEGER NOT NULL DEFAULT 0,
     FOREIGN KEY (product_id) REFERENCES products(product_id)
 );
+
+-- Load watermarks table (incremental ingest state per table)
+CREATE TABLE IF NOT EXISTS load_watermarks (
+    table_name VARCHAR(50) PRIMARY KEY,
+    file_offset BIGINT NOT NULL DEFAULT 0,
+    tail_hash VARCHAR(64),
+    high_water_mark VARCHAR(50),
+    rows_loaded INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL
+);
+
+-- Data version table (single row, bumped after every load for cache invalidation)
+CREATE TABLE IF NOT EXISTS data_version (
+    id INTEGER PRIMARY KEY,
+    version INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL
+);
+
+-- Daily product sales rollup (paid orders, maintained by the loader)
+CREATE TABLE IF NOT EXISTS daily_product_sales (
+    sale_date DATE NOT NULL,
+    product_id INTEGER NOT NULL,
+    fulfilled BOOLEAN NOT NULL,
+    units INTEGER NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    margin DECIMAL(14,2) NOT NULL DEFAULT 0,
+    order_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (sale_date, product_id, fulfilled),
+    FOREIGN KEY (product_id) REFERENCES products(product_id)
+);
+
+-- Daily category sales rollup (paid orders, maintained by the loader)
+CREATE TABLE IF NOT EXISTS daily_category_sales (
+    sale_date DATE NOT NULL,
+    category_id INTEGER NOT NULL,
+    fulfilled BOOLEAN NOT NULL,
+    units INTEGER NOT NULL DEFAULT 0,
+    revenue DECIMAL(14,2) NOT NULL DEFAULT 0,
+    margin DECIMAL(14,2) NOT NULL DEFAULT 0,
+    order_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (sale_date, category_id, fulfilled),
+    FOREIGN KEY (category_id) REFERENCES categories(category_id)
+);
+
+-- Customer first purchases (first paid order per customer, maintained by the loader)
+CREATE TABLE IF NOT EXISTS customer_first_purchases (
+    customer_id VARCHAR(50) PRIMARY KEY,
+    first_order_date TIMESTAMP NOT NULL,
+    cohort_month DATE NOT NULL,
+    paid_order_count INTEGER NOT NULL DEFAULT 0,
+    FOREIGN KEY (customer_id) REFERENCES customers(customer_id)
+);
+
+-- Customer sketches (HyperLogLog of paid customers per day or month and cohort, maintained by the loader)
+CREATE TABLE IF NOT EXISTS customer_sketches (
+    grain VARCHAR(5) NOT NULL,
+    period_start DATE NOT NULL,
+    cohort_month DATE NOT NULL,
+    registers BYTEA NOT NULL,
+    PRIMARY KEY (grain, period_start, cohort_month)
+);
+
+-- RFM snapshot runs (one per persisted as_of date: month ends built by each load, others by rfm_snapshots.py)
+CREATE TABLE IF NOT EXISTS rfm_snapshot_runs (
+    as_of_date DATE PRIMARY KEY,
+    base_as_of_date DATE,
+    customers INTEGER NOT NULL DEFAULT 0,
+    breakpoints TEXT NOT NULL,
+    built_at TIMESTAMP NOT NULL
+);
+
+-- RFM snapshots (per-customer metrics and scores as of a date; scores NULL without positive revenue)
+CREATE TABLE IF NOT EXISTS rfm_snapshots (
+    as_of_date DATE NOT NULL,
+    customer_id VARCHAR(50) NOT NULL,
+    last_order_date DATE NOT NULL,
+    recency_days INTEGER NOT NULL,
+    frequency INTEGER NOT NULL,
+    monetary DECIMAL(14,2) NOT NULL,
+    r_score INTEGER,
+    f_score INTEGER,
+    m_score INTEGER,
+    rfm_total INTEGER,
+    segment VARCHAR(20),
+    PRIMARY KEY (as_of_date, customer_id)
+);
+
+-- Cohort retention matrix (paid customers active per cohort and month, maintained by the loader)
+CREATE TABLE IF NOT EXISTS cohort_retention (
+    cohort_month DATE NOT NULL,
+    months_since INTEGER NOT NULL,
+    activity_month DATE NOT NULL,
+    active_customers INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (cohort_month, months_since)
+);
+
+-- Product sales velocity (fulfilled units per day over a rolling window, maintained by the loader)
+CREATE TABLE IF NOT EXISTS product_sales_velocity (
+    product_id INTEGER PRIMARY KEY,
+    window_start DATE NOT NULL,
+    window_end DATE NOT NULL,
+    units INTEGER NOT NULL DEFAULT 0,
+    daily_rate DECIMAL(12,4) NOT NULL DEFAULT 0,
+    FOREIGN KEY (product_id) REFERENCES products(product_id)
+);
+
+-- Low stock alerts (products to reorder, maintained by the loader)
+CREATE TABLE IF NOT EXISTS low_stock_alerts (
+    product_id INTEGER PRIMARY KEY,
+    product_name VARCHAR(255) NOT NULL,
+    category_name VARCHAR(100) NOT NULL,
+    on_hand_qty INTEGER NOT NULL,
+    reorder_point INTEGER NOT NULL,
+    recommended_order_qty INTEGER NOT NULL,
+    daily_sales_rate DECIMAL(12,4) NOT NULL DEFAULT 0,
+    days_of_cover DECIMAL(12,1),
+    urgency VARCHAR(20) NOT NULL,
+    urgency_rank INTEGER NOT NULL,
+    FOREIGN KEY (product_id) REFERENCES products(product_id)
+);
@@ -1,56 +1,53 @@
 -- Daily KPI snapshot
 -- Key performance indicators for a specific date
-WITH daily_orders AS (
+WITH day_orders AS (
+    -- Paid orders in a date range: an equality then a range, served by idx_orders_status_date
     SELECT 
-        COUNT(DISTINCT order_id) AS total_orders,
-        COUNT(DISTINCT customer_id) AS unique_customers,
-        SUM(payment_amount) AS total_revenue
+        order_id,
+        customer_id,
+        payment_amount
     FROM orders
     WHERE 
-        DATE(order_date) = :target_date
+        order_date >= :target_date
+        AND order_date < :next_date
         AND payment_status = 'paid'
 ),
+daily_orders AS (
+    SELECT 
+        COUNT(DISTINCT order_id) AS total_orders,
+        COUNT(DISTINCT customer_id) AS unique_customers,
+        SUM(payment_amount) AS total_revenue
+    FROM day_orders
+),
 new_customers AS (
+    -- Customers whose first paid order falls on the target date
     SELECT 
-        COUNT(DISTINCT customer_id) AS new_customers_count
-    FROM orders
+        COUNT(*) AS new_customers_count
+    FROM customer_first_purchases fp
     WHERE 
-        DATE(order_date) = :target_date
-        AND payment_status = 'paid'
-        AND customer_id NOT IN (
-            SELECT DISTINCT customer_id 
-            FROM orders 
-            WHERE DATE(order_date) < :target_date
-            AND payment_status = 'paid'
-        )
+        fp.first_order_date >= :target_date
+        AND fp.first_order_date < :next_date
 ),
 top_category AS (
     SELECT 
         c.category_name AS top_category_name,
-        SUM((oi.unit_price * oi.quantity) - oi.discount) AS category_revenue
-    FROM orders o
-    JOIN order_items oi ON oi.order_id = o.order_id
-    JOIN products p ON p.product_id = oi.product_id
-    JOIN categories c ON c.category_id = p.category_id
-    WHERE 
-        DATE(o.order_date) = :target_date
-        AND o.payment_status = 'paid'
+        SUM(d.revenue) AS category_revenue
+    FROM daily_category_sales d
+    JOIN categories c ON c.category_id = d.category_id
+    WHERE d.sale_date = :target_date
     GROUP BY c.category_name
-    ORDER BY category_revenue DESC
+    ORDER BY category_revenue DESC, top_category_name
     LIMIT 1
 ),
 top_product AS (
     SELECT 
         p.product_name AS top_product_name,
-        SUM(oi.quantity) AS units_sold
-    FROM orders o
-    JOIN order_items oi ON oi.order_id = o.order_id
-    JOIN products p ON p.product_id = oi.product_id
-    WHERE 
-        DATE(o.order_date) = :target_date
-        AND o.payment_status = 'paid'
+        SUM(d.units) AS units_sold
+    FROM daily_product_sales d
+    JOIN products p ON p.product_id = d.product_id
+    WHERE d.sale_date = :target_date
     GROUP BY p.product_name
-    ORDER BY units_sold DESC
+    ORDER BY units_sold DESC, top_product_name
     LIMIT 1
 )
 SELECT 
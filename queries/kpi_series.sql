@@ -0,0 +1,74 @@
+-- Daily KPI series
+-- The kpi.sql fields for every day with paid orders in a date range,
+-- computed from a single range scan of orders
+WITH range_orders AS (
+    SELECT 
+        order_id,
+        customer_id,
+        DATE(order_date) AS day,
+        payment_amount
+    FROM orders
+    WHERE 
+        order_date >= :start_date
+        AND order_date < :end_date
+        AND payment_status = 'paid'
+),
+daily_orders AS (
+    SELECT 
+        day,
+        COUNT(DISTINCT order_id) AS total_orders,
+        COUNT(DISTINCT customer_id) AS unique_customers,
+        SUM(payment_amount) AS total_revenue
+    FROM range_orders
+    GROUP BY day
+),
+new_customers AS (
+    -- Customers whose first paid order falls on each day
+    SELECT 
+        DATE(fp.first_order_date) AS day,
+        COUNT(*) AS new_customers_count
+    FROM customer_first_purchases fp
+    WHERE 
+        fp.first_order_date >= :start_date
+        AND fp.first_order_date < :end_date
+    GROUP BY DATE(fp.first_order_date)
+),
+category_ranks AS (
+    SELECT 
+        d.sale_date AS day,
+        c.category_name,
+        ROW_NUMBER() OVER (PARTITION BY d.sale_date ORDER BY SUM(d.revenue) DESC, c.category_name) AS category_rank
+    FROM daily_category_sales d
+    JOIN categories c ON c.category_id = d.category_id
+    WHERE 
+        d.sale_date >= :start_date
+        AND d.sale_date < :end_date
+    GROUP BY d.sale_date, c.category_name
+),
+product_ranks AS (
+    SELECT 
+        d.sale_date AS day,
+        p.product_name,
+        ROW_NUMBER() OVER (PARTITION BY d.sale_date ORDER BY SUM(d.units) DESC, p.product_name) AS product_rank
+    FROM daily_product_sales d
+    JOIN products p ON p.product_id = d.product_id
+    WHERE 
+        d.sale_date >= :start_date
+        AND d.sale_date < :end_date
+    GROUP BY d.sale_date, p.product_name
+)
+SELECT 
+    dorders.day AS date,
+    dorders.total_orders AS orders,
+    ROUND(dorders.total_revenue, 2) AS revenue,
+    ROUND(dorders.total_revenue / dorders.total_orders, 2) AS aov,
+    dorders.unique_customers,
+    COALESCE(nc.new_customers_count, 0) AS new_customers,
+    ROUND((dorders.unique_customers - COALESCE(nc.new_customers_count, 0)) * 100.0 / dorders.unique_customers, 2) AS repeat_rate,
+    COALESCE(tc.category_name, 'N/A') AS top_category,
+    COALESCE(tp.product_name, 'N/A') AS top_product
+FROM daily_orders dorders
+LEFT JOIN new_customers nc ON nc.day = dorders.day
+LEFT JOIN category_ranks tc ON tc.day = dorders.day AND tc.category_rank = 1
+LEFT JOIN product_ranks tp ON tp.day = dorders.day AND tp.product_rank = 1
+ORDER BY dorders.day;
@@ -0,0 +1,20 @@
+-- Low stock alerts from the maintained alert set (see rollups.refresh_low_stock_alerts)
+-- Products at or below their reorder point or with too few days of cover at their recent sales rate
+-- keyset: urgency_rank ASC, on_hand_qty ASC, product_id ASC
+SELECT 
+    product_id,
+    product_name,
+    category_name,
+    on_hand_qty,
+    reorder_point,
+    recommended_order_qty,
+    daily_sales_rate,
+    days_of_cover,
+    urgency,
+    urgency_rank
+FROM low_stock_alerts
+ORDER BY 
+    urgency_rank,
+    on_hand_qty ASC,
+    product_id
+LIMIT :limit_n;
@@ -0,0 +1,13 @@
+-- Customer first purchases (full rebuild)
+-- First paid order, cohort month and lifetime paid order count per customer
+DELETE FROM customer_first_purchases;
+
+INSERT INTO customer_first_purchases (customer_id, first_order_date, cohort_month, paid_order_count)
+SELECT 
+    customer_id,
+    MIN(order_date) AS first_order_date,
+    date_trunc('month', MIN(order_date)) AS cohort_month,
+    COUNT(*) AS paid_order_count
+FROM orders
+WHERE payment_status = 'paid'
+GROUP BY customer_id;
@@ -0,0 +1,25 @@
+-- Cohort retention matrix
+-- Rebuilds the cohort x activity month cells for paid orders placed in
+-- the months from start_date (inclusive) to end_date (exclusive)
+-- A cell only depends on its month's orders and its customers' cohorts
+DELETE FROM cohort_retention
+WHERE 
+    activity_month >= :start_date
+    AND activity_month < :end_date;
+
+INSERT INTO cohort_retention (cohort_month, months_since, activity_month, active_customers)
+SELECT 
+    fp.cohort_month,
+    EXTRACT(year FROM date_trunc('month', o.order_date)) * 12 + EXTRACT(month FROM date_trunc('month', o.order_date)) - 
+    (EXTRACT(year FROM fp.cohort_month) * 12 + EXTRACT(month FROM fp.cohort_month)) AS months_since,
+    date_trunc('month', o.order_date) AS activity_month,
+    COUNT(DISTINCT o.customer_id) AS active_customers
+FROM orders o
+JOIN customer_first_purchases fp ON fp.customer_id = o.customer_id
+WHERE 
+    o.order_date >= :start_date
+    AND o.order_date < :end_date
+    AND o.payment_status = 'paid'
+GROUP BY 
+    fp.cohort_month,
+    date_trunc('month', o.order_date);
@@ -0,0 +1,16 @@
+-- Customer first purchases (incremental)
+-- Recomputes the rows of the customers whose orders were just loaded
+DELETE FROM customer_first_purchases
+WHERE customer_id IN :customer_ids;
+
+INSERT INTO customer_first_purchases (customer_id, first_order_date, cohort_month, paid_order_count)
+SELECT 
+    customer_id,
+    MIN(order_date) AS first_order_date,
+    date_trunc('month', MIN(order_date)) AS cohort_month,
+    COUNT(*) AS paid_order_count
+FROM orders
+WHERE 
+    payment_status = 'paid'
+    AND customer_id IN :customer_ids
+GROUP BY customer_id;
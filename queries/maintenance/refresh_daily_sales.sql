@@ -0,0 +1,59 @@
+-- Daily sales rollups
+-- Rebuilds the day x product and day x category rollups for paid orders
+-- placed between start_date (inclusive) and end_date (exclusive)
+-- The order_items date bounds let PostgreSQL prune its monthly partitions too
+DELETE FROM daily_product_sales
+WHERE 
+    sale_date >= :start_date
+    AND sale_date < :end_date;
+
+INSERT INTO daily_product_sales (sale_date, product_id, fulfilled, units, revenue, margin, order_count)
+SELECT 
+    DATE(o.order_date) AS sale_date,
+    oi.product_id,
+    o.order_status IN ('paid', 'shipped', 'delivered') AS fulfilled,
+    SUM(oi.quantity) AS units,
+    SUM((oi.unit_price * oi.quantity) - oi.discount) AS revenue,
+    SUM((oi.unit_price - p.unit_cost) * oi.quantity - oi.discount) AS margin,
+    COUNT(DISTINCT o.order_id) AS order_count
+FROM orders o
+JOIN order_items oi ON oi.order_id = o.order_id
+JOIN products p ON p.product_id = oi.product_id
+WHERE 
+    o.order_date >= :start_date
+    AND o.order_date < :end_date
+    AND oi.order_date >= :start_date
+    AND oi.order_date < :end_date
+    AND o.payment_status = 'paid'
+GROUP BY 
+    DATE(o.order_date),
+    oi.product_id,
+    o.order_status IN ('paid', 'shipped', 'delivered');
+
+DELETE FROM daily_category_sales
+WHERE 
+    sale_date >= :start_date
+    AND sale_date < :end_date;
+
+INSERT INTO daily_category_sales (sale_date, category_id, fulfilled, units, revenue, margin, order_count)
+SELECT 
+    DATE(o.order_date) AS sale_date,
+    p.category_id,
+    o.order_status IN ('paid', 'shipped', 'delivered') AS fulfilled,
+    SUM(oi.quantity) AS units,
+    SUM((oi.unit_price * oi.quantity) - oi.discount) AS revenue,
+    SUM((oi.unit_price - p.unit_cost) * oi.quantity - oi.discount) AS margin,
+    COUNT(DISTINCT o.order_id) AS order_count
+FROM orders o
+JOIN order_items oi ON oi.order_id = o.order_id
+JOIN products p ON p.product_id = oi.product_id
+WHERE 
+    o.order_date >= :start_date
+    AND o.order_date < :end_date
+    AND oi.order_date >= :start_date
+    AND oi.order_date < :end_date
+    AND o.payment_status = 'paid'
+GROUP BY 
+    DATE(o.order_date),
+    p.category_id,
+    o.order_status IN ('paid', 'shipped', 'delivered');
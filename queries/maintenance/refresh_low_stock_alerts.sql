@@ -0,0 +1,60 @@
+-- Low stock alerts
+-- Recomputes each product's daily sales rate over the window_days days ending at
+-- window_end from the daily rollup, then rebuilds the alert set from inventory.
+-- A product is alerted at or below its reorder point, or when its stock covers
+-- fewer than low_cover_days days of sales, and Critical under critical_cover_days
+DELETE FROM product_sales_velocity;
+
+INSERT INTO product_sales_velocity (product_id, window_start, window_end, units, daily_rate)
+SELECT 
+    product_id,
+    CAST(:window_start AS date),
+    CAST(:window_end AS date),
+    SUM(units) AS units,
+    ROUND(SUM(units) * 1.0 / :window_days, 4) AS daily_rate
+FROM daily_product_sales
+WHERE 
+    fulfilled = true
+    AND sale_date >= :window_start
+    AND sale_date <= :window_end
+GROUP BY product_id;
+
+DELETE FROM low_stock_alerts;
+
+INSERT INTO low_stock_alerts (
+    product_id, product_name, category_name, on_hand_qty, reorder_point, recommended_order_qty,
+    daily_sales_rate, days_of_cover, urgency, urgency_rank
+)
+SELECT 
+    p.product_id,
+    p.product_name,
+    c.category_name,
+    i.on_hand_qty,
+    i.reorder_point,
+    i.reorder_qty AS recommended_order_qty,
+    COALESCE(v.daily_rate, 0) AS daily_sales_rate,
+    CASE 
+        WHEN v.daily_rate > 0 THEN ROUND(i.on_hand_qty / v.daily_rate, 1)
+    END AS days_of_cover,
+    CASE 
+        WHEN i.on_hand_qty = 0 THEN 'Out of Stock'
+        WHEN i.on_hand_qty <= i.reorder_point * 0.5 THEN 'Critical'
+        WHEN i.on_hand_qty < v.daily_rate * :critical_cover_days THEN 'Critical'
+        ELSE 'Low'
+    END AS urgency,
+    CASE 
+        WHEN i.on_hand_qty = 0 THEN 1
+        WHEN i.on_hand_qty <= i.reorder_point * 0.5 THEN 2
+        WHEN i.on_hand_qty < v.daily_rate * :critical_cover_days THEN 2
+        ELSE 3
+    END AS urgency_rank
+FROM inventory i
+JOIN products p ON p.product_id = i.product_id
+JOIN categories c ON c.category_id = p.category_id
+LEFT JOIN product_sales_velocity v ON v.product_id = i.product_id
+WHERE 
+    p.is_active = true
+    AND (
+        i.on_hand_qty <= i.reorder_point
+        OR i.on_hand_qty < v.daily_rate * :low_cover_days
+    );
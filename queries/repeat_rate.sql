@@ -4,8 +4,9 @@ WITH monthly_customers AS (
     SELECT 
         date_trunc('month', o.order_date) AS month,
         o.customer_id,
-        MIN(o.order_date) OVER (PARTITION BY o.customer_id) AS first_order_date
+        fp.cohort_month
     FROM orders o
+    JOIN customer_first_purchases fp ON fp.customer_id = o.customer_id
     WHERE 
         o.order_date >= :start_date
         AND o.order_date <= :end_date
@@ -16,14 +17,14 @@ monthly_stats AS (
         month,
         COUNT(DISTINCT customer_id) AS total_customers,
         COUNT(DISTINCT CASE 
-            WHEN date_trunc('month', first_order_date) < month 
+            WHEN cohort_month < month 
             THEN customer_id 
         END) AS repeat_customers
     FROM monthly_customers
     GROUP BY month
 )
 SELECT 
-    month,
+    CAST(month AS date) AS month,
     total_customers,
     repeat_customers,
     CASE 
@@ -1,32 +1,23 @@
 -- Revenue by month and category analysis
 -- Groups revenue by month and category for paid orders
-WITH order_lines AS (
+-- Reads the daily category rollup maintained by the loader
+WITH monthly_revenue AS (
     SELECT 
-        oi.order_id,
-        oi.product_id,
-        (oi.unit_price * oi.quantity - oi.discount) AS net_line_revenue
-    FROM order_items oi
-),
-monthly_revenue AS (
-    SELECT 
-        date_trunc('month', o.order_date) AS month,
+        date_trunc('month', d.sale_date) AS month,
         c.category_name,
-        SUM(ol.net_line_revenue) AS revenue
-    FROM orders o
-    JOIN order_lines ol ON ol.order_id = o.order_id
-    JOIN products p ON p.product_id = ol.product_id
-    JOIN categories c ON c.category_id = p.category_id
+        SUM(d.revenue) AS revenue
+    FROM daily_category_sales d
+    JOIN categories c ON c.category_id = d.category_id
     WHERE 
-        o.order_date >= :start_date
-        AND o.order_date <= :end_date
-        AND o.payment_status = 'paid'
-        AND o.order_status IN ('paid', 'shipped', 'delivered')
+        d.sale_date >= :start_date
+        AND d.sale_date <= :end_date
+        AND d.fulfilled = true
     GROUP BY 
-        date_trunc('month', o.order_date),
+        date_trunc('month', d.sale_date),
         c.category_name
 )
 SELECT 
-    month,
+    CAST(month AS date) AS month,
     category_name,
     ROUND(revenue, 2) AS revenue
 FROM monthly_revenue
@@ -1,10 +1,11 @@
 -- RFM Analysis (Recency, Frequency, Monetary)
 -- Scores customers on a 5-5-5 scale for segmentation
+-- keyset: rfm_total DESC, monetary DESC, customer_id ASC
 WITH customer_metrics AS (
     SELECT 
         o.customer_id,
         -- Recency: days since last order
-        EXTRACT(epoch FROM (:as_of_date::date - MAX(o.order_date::date))) / 86400 AS recency_days,
+        EXTRACT(epoch FROM (CAST(:as_of_date AS timestamp) - MAX(date_trunc('day', o.order_date)))) / 86400 AS recency_days,
         -- Frequency: number of orders
         COUNT(DISTINCT o.order_id) AS frequency,
         -- Monetary: total revenue
@@ -24,17 +25,17 @@ rfm_scores AS (
         monetary,
         -- RFM Scoring (1-5 scale)
         -- Recency: lower days = higher score (more recent is better)
-        6 - NTILE(5) OVER (ORDER BY recency_days ASC) AS r_score,
+        6 - NTILE(5) OVER (ORDER BY recency_days ASC, customer_id) AS r_score,
         -- Frequency: higher count = higher score
-        NTILE(5) OVER (ORDER BY frequency ASC) AS f_score,
+        NTILE(5) OVER (ORDER BY frequency ASC, customer_id) AS f_score,
         -- Monetary: higher value = higher score
-        NTILE(5) OVER (ORDER BY monetary ASC) AS m_score
+        NTILE(5) OVER (ORDER BY monetary ASC, customer_id) AS m_score
     FROM customer_metrics
     WHERE monetary > 0
 )
 SELECT 
     customer_id,
-    ROUND(recency_days, 0) AS recency_days,
+    CAST(ROUND(recency_days, 0) AS INTEGER) AS recency_days,
     frequency,
     ROUND(monetary, 2) AS monetary,
     r_score,
@@ -51,4 +52,4 @@ SELECT
         ELSE 'Others'
     END AS segment
 FROM rfm_scores
-ORDER BY rfm_total DESC, monetary DESC;
+ORDER BY rfm_total DESC, monetary DESC, customer_id;
@@ -0,0 +1,18 @@
+-- RFM customer metrics
+-- Last order day, order count and revenue per customer for paid orders placed
+-- after after_date and up to as_of_date, the same bounds rfm.sql applies
+-- Snapshots add these to the metrics of the previous snapshot (see rfm_snapshots.py)
+SELECT 
+    o.customer_id,
+    MAX(DATE(o.order_date)) AS last_order_date,
+    COUNT(DISTINCT o.order_id) AS frequency,
+    SUM((oi.unit_price * oi.quantity) - oi.discount) AS monetary
+FROM orders o
+JOIN order_items oi ON oi.order_id = o.order_id
+WHERE 
+    o.payment_status = 'paid'
+    AND o.order_date > :after_date
+    AND o.order_date <= :as_of_date
+    AND oi.order_date > :after_date
+    AND oi.order_date <= :as_of_date
+GROUP BY o.customer_id;
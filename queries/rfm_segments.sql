@@ -0,0 +1,16 @@
+-- RFM segment summary from the persisted snapshot
+-- Customers, revenue and average metrics per segment
+SELECT 
+    segment,
+    COUNT(*) AS customers,
+    ROUND(SUM(monetary), 2) AS revenue,
+    ROUND(AVG(recency_days), 1) AS avg_recency_days,
+    ROUND(AVG(frequency), 2) AS avg_frequency,
+    ROUND(AVG(monetary), 2) AS avg_monetary,
+    ROUND(AVG(rfm_total), 2) AS avg_rfm_total
+FROM rfm_snapshots
+WHERE 
+    as_of_date = :as_of_date
+    AND segment IS NOT NULL
+GROUP BY segment
+ORDER BY revenue DESC, segment;
@@ -0,0 +1,18 @@
+-- RFM Analysis from the persisted snapshot (see rfm_snapshots.py)
+-- Same rows, scores and order as rfm.sql for a stored as_of date
+-- keyset: rfm_total DESC, monetary DESC, customer_id ASC
+SELECT 
+    customer_id,
+    recency_days,
+    frequency,
+    monetary,
+    r_score,
+    f_score,
+    m_score,
+    rfm_total,
+    segment
+FROM rfm_snapshots
+WHERE 
+    as_of_date = :as_of_date
+    AND rfm_total IS NOT NULL
+ORDER BY rfm_total DESC, monetary DESC, customer_id;
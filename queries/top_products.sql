@@ -1,22 +1,22 @@
 -- Top products by margin analysis
 -- Shows products with highest profit margins
+-- Reads the daily product rollup maintained by the loader
+-- keyset: margin DESC, product_id ASC
 WITH product_performance AS (
     SELECT 
         p.product_id,
         p.product_name,
         c.category_name,
-        SUM(oi.quantity) AS units_sold,
-        SUM((oi.unit_price * oi.quantity) - oi.discount) AS revenue,
-        SUM((oi.unit_price - p.unit_cost) * oi.quantity - oi.discount) AS margin
-    FROM order_items oi
-    JOIN orders o ON o.order_id = oi.order_id
-    JOIN products p ON p.product_id = oi.product_id
+        SUM(d.units) AS units_sold,
+        SUM(d.revenue) AS revenue,
+        SUM(d.margin) AS margin
+    FROM daily_product_sales d
+    JOIN products p ON p.product_id = d.product_id
     JOIN categories c ON c.category_id = p.category_id
     WHERE 
-        o.order_date >= :start_date
-        AND o.order_date <= :end_date
-        AND o.payment_status = 'paid'
-        AND o.order_status IN ('paid', 'shipped', 'delivered')
+        d.sale_date >= :start_date
+        AND d.sale_date <= :end_date
+        AND d.fulfilled = true
     GROUP BY 
         p.product_id, 
         p.product_name, 
@@ -36,5 +36,5 @@ SELECT
     END AS margin_percent
 FROM product_performance
 WHERE margin > 0
-ORDER BY margin DESC
+ORDER BY margin DESC, product_id
 LIMIT :limit_n;
@@ -0,0 +1,226 @@
+import os
+import sys
+import json
+import time
+import platform
+import subprocess
+from datetime import datetime, timedelta
+
+def route_default_params(last_day):
+    """Each registry query's params as its route builds them from default arguments.
+
+    Routes that default to today use the last order day instead, so timings do not depend on the clock.
+    """
+    day = last_day.strftime("%Y-%m-%d")
+    return {
+        "kpi": {"target_date": day, "next_date": (last_day + timedelta(days=1)).strftime("%Y-%m-%d")},
+        "kpi_series": {
+            "start_date": (last_day - timedelta(days=29)).strftime("%Y-%m-%d"),
+            "end_date": (last_day + timedelta(days=1)).strftime("%Y-%m-%d"),
+        },
+        "revenue_by_month_category": {"start_date": "2024-01-01", "end_date": "2024-12-31"},
+        "repeat_rate": {"start_date": "2024-01-01", "end_date": "2024-12-31"},
+        "cohort_retention": {"start_date": "2024-01-01", "end_date": "2024-12-31", "horizon": 12},
+        "cohort_retention_matrix": {"start_date": "2024-01-01", "end_date": "2024-12-31", "horizon": 12},
+        "rfm": {"as_of_date": day},
+        "rfm_snapshot": {"as_of_date": day},
+        "rfm_segments": {"as_of_date": day},
+        "top_products": {"start_date": "2024-01-01", "end_date": "2024-12-31", "limit_n": 10},
+        "low_stock_alerts": {"limit_n": 20},
+        "order_funnel": {"start_date": "2024-01-01", "end_date": "2024-12-31"},
+    }
+
+def load_fresh(data_dir):
+    """Drop and recreate the schema, then bulk load data_dir into it; returns the loader"""
+    from app import db
+    from data_loader import DataLoader
+    from partitions import reset_partitions
+
+    db.drop_all()
+    db.create_all()
+    reset_partitions()
+    loader = DataLoader(bulk=True, data_dir=data_dir)
+    loader.load_all_data()
+    return loader
+
+def loaded_default_params():
+    """route_default_params for the last order day in the database"""
+    from app import db
+    from db_utils import translate_sql, get_db_dialect
+
+    last_order = db.session.execute(db.text(
+        translate_sql("SELECT MAX(order_date) FROM orders", get_db_dialect())
+    )).scalar()
+    if last_order is None:
+        raise ValueError("No orders loaded")
+    return route_default_params(datetime.strptime(str(last_order)[:10], "%Y-%m-%d"))
+
+def run_queries(data_dir, repeat):
+    """Load data_dir into a fresh schema and time every registry query; runs inside the app.
+
+    With an analytics mirror configured, queries it can serve are timed on the mirror.
+    """
+    from flask import current_app
+    from app import db
+    from db_utils import execute_query
+    from query_registry import query_registry
+
+    started = time.perf_counter()
+    loader = load_fresh(data_dir)
+    load_seconds = time.perf_counter() - started
+
+    defaults = loaded_default_params()
+
+    # rfm_snapshot and rfm_segments read a snapshot, which loads only build for month ends
+    from rfm_snapshots import ensure_rfm_snapshot
+    started = time.perf_counter()
+    ensure_rfm_snapshot(defaults["rfm"]["as_of_date"])
+    snapshot_seconds = time.perf_counter() - started
+
+    mirror = current_app.extensions.get("analytics_mirror")
+    queries = {}
+    for name in query_registry.names():
+        params = defaults.get(name)
+        if params is None:
+            queries[name] = {"skipped": "no default params"}
+            continue
+        if mirror is not None and name in mirror.queries:
+            registry, bind, source = mirror.registry, mirror.engine, "mirror"
+        else:
+            registry, bind, source = query_registry, None, "primary"
+        statement = registry.statement(name, params)
+        timings = []
+        for _ in range(repeat):
+            query_started = time.perf_counter()
+            rows = execute_query(statement, params, name=name, bind=bind)
+            timings.append((time.perf_counter() - query_started) * 1000)
+            db.session.rollback()
+        ordered = sorted(timings)
+        queries[name] = {
+            "source": source,
+            "rows": len(rows),
+            "cold_ms": round(timings[0], 2),
+            "min_ms": round(ordered[0], 2),
+            "median_ms": round(ordered[len(ordered) // 2], 2),
+            "max_ms": round(ordered[-1], 2),
+        }
+
+    return {
+        "rows": {table: stats["rows"] for table, stats in loader.stats.items()},
+        "load_seconds": round(load_seconds, 3),
+        "load": loader.stats,
+        "rfm_snapshot_seconds": round(snapshot_seconds, 3),
+        "queries": queries,
+    }
+
+def run_isolated(database_url, data_dir, repeat, mirror_path=None):
+    """Run one engine/scale in a child process, since the app binds its database at import time"""
+    env = dict(os.environ, DATABASE_URL=database_url, LOG_LEVEL="WARNING")
+    env.pop("ANALYTICS_MIRROR_PATH", None)
+    if mirror_path:
+        env["ANALYTICS_MIRROR_PATH"] = mirror_path
+    completed = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--child", data_dir, "--repeat", str(repeat)],
+        env=env, capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+    if completed.returncode != 0:
+        raise RuntimeError(f"Benchmark run failed for {database_url}:\n{completed.stderr[-4000:]}")
+    return json.loads(completed.stdout.strip().splitlines()[-1])
+
+def remove_database_files(path, suffixes):
+    """Delete a database file left by an earlier run, with its journal files"""
+    for suffix in ("",) + suffixes:
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+def benchmark(scales, seed=42, repeat=5, work_dir="benchmark_data", postgres_url=None, duckdb=True, mirror=False):
+    """Generate each scale once, load it into SQLite, DuckDB (and PostgreSQL) and time every query.
+
+    With mirror set, SQLite is also timed with registry queries served from a DuckDB analytics mirror.
+    """
+    from generate_data import DataGenerator
+    from analytics_mirror import duckdb_engine
+
+    if (duckdb or mirror) and duckdb_engine is None:
+        raise ImportError("DuckDB benchmarks require duckdb and duckdb-engine")
+
+    os.makedirs(work_dir, exist_ok=True)
+    results = []
+    for scale in scales:
+        data_dir = os.path.abspath(os.path.join(work_dir, f"customers_{scale}_seed_{seed}"))
+        counts_path = os.path.join(data_dir, "counts.json")
+        if not os.path.exists(counts_path):
+            counts = DataGenerator(customers=scale, products=max(100, scale // 100), seed=seed).generate(data_dir)
+            with open(counts_path, "w") as f:
+                json.dump(counts, f)
+
+        sqlite_path = os.path.abspath(os.path.join(work_dir, f"customers_{scale}.db"))
+        duckdb_path = os.path.abspath(os.path.join(work_dir, f"customers_{scale}.duckdb"))
+        mirror_path = os.path.abspath(os.path.join(work_dir, f"customers_{scale}_mirror.duckdb"))
+        engines = [("sqlite", "sqlite:///" + sqlite_path, None)]
+        if mirror:
+            engines.append(("sqlite+duckdb_mirror", "sqlite:///" + sqlite_path, mirror_path))
+        if duckdb:
+            engines.append(("duckdb", "duckdb:///" + duckdb_path, None))
+        if postgres_url:
+            engines.append(("postgresql", postgres_url, None))
+        for engine, database_url, engine_mirror in engines:
+            if database_url.startswith("sqlite:///"):
+                remove_database_files(sqlite_path, ("-wal", "-shm"))
+            elif database_url.startswith("duckdb:///"):
+                remove_database_files(duckdb_path, (".wal",))
+            if engine_mirror:
+                remove_database_files(engine_mirror, (".wal",))
+            print(f"Benchmarking {scale} customers on {engine}", file=sys.stderr)
+            result = run_isolated(database_url, data_dir, repeat, mirror_path=engine_mirror)
+            results.append(dict(engine=engine, customers=scale, **result))
+
+    return {
+        "created_at": datetime.utcnow().isoformat(),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "seed": seed,
+        "repeat": repeat,
+        "results": results,
+    }
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Time every queries/*.sql file on generated data at several scales")
+    parser.add_argument("--scales", default="1000,10000", help="Comma-separated customer counts")
+    parser.add_argument("--seed", type=int, default=42, help="Generator seed")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per query")
+    parser.add_argument("--work-dir", default="benchmark_data", help="Where generated CSVs and database files go")
+    parser.add_argument("--postgres-url", help="Also benchmark this PostgreSQL database (its tables are dropped)")
+    parser.add_argument("--no-duckdb", action="store_true", help="Skip the DuckDB primary database run")
+    parser.add_argument("--mirror", action="store_true", help="Also time SQLite with a DuckDB analytics mirror")
+    parser.add_argument("--output", default="benchmark_report.json", help="JSON report path")
+    parser.add_argument("--child", metavar="DATA_DIR", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        from app import app
+        with app.app_context():
+            print(json.dumps(run_queries(args.child, args.repeat)))
+        sys.exit(0)
+
+    report = benchmark(
+        [int(scale) for scale in args.scales.split(",")],
+        seed=args.seed, repeat=args.repeat, work_dir=args.work_dir, postgres_url=args.postgres_url,
+        duckdb=not args.no_duckdb, mirror=args.mirror
+    )
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    for result in report["results"]:
+        print(f"{result['engine']} {result['customers']} customers: load {result['load_seconds']}s")
+        for name, timing in result["queries"].items():
+            print(f"  {name}: {timing.get('median_ms', timing.get('skipped'))}")
@@ -0,0 +1,129 @@
+import os
+import time
+import pickle
+import logging
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+class QueryCache:
+    """LRU cache of query results, bounded by bytes and invalidated by the data version"""
+
+    def __init__(self, max_bytes=64 * 1024 * 1024, ttl=None, version_check_interval=1.0):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.version_check_interval = version_check_interval
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._version = None
+        self._version_updated_at = None
+        self._version_checked_at = 0.0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get_or_execute(self, name, params, execute):
+        """Return the cached result for (name, params), running execute() on a miss"""
+        self._check_version()
+        key = (name, tuple(sorted((params or {}).items())))
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                result, size, expires_at = entry
+                if expires_at is None or expires_at > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return result
+                self._remove(key)
+            self.misses += 1
+
+        version = self._version
+        result = execute()
+        self._store(key, result, version)
+        return result
+
+    def invalidate(self, version=None):
+        """Drop every entry, recording the data version they are now stale against or re-reading it"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+            if version is not None:
+                self._version = version
+                self._version_checked_at = time.monotonic()
+            else:
+                self._version_checked_at = 0.0
+
+    def data_version(self):
+        """The current data version and when it was bumped, re-read at most every version_check_interval"""
+        self._check_version()
+        with self._lock:
+            return self._version, self._version_updated_at
+
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "data_version": self._version,
+            }
+
+    def _store(self, key, result, version):
+        try:
+            size = len(pickle.dumps(result, pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            logger.warning(f"Query result for {key[0]} is not cacheable: {str(e)}")
+            return
+        if size > self.max_bytes:
+            return
+
+        expires_at = time.monotonic() + self.ttl if self.ttl else None
+        with self._lock:
+            if version != self._version:
+                # A load finished while the query ran; the result may be stale
+                return
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (result, size, expires_at)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def _remove(self, key):
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+    def _check_version(self):
+        """Clear the cache when another process has bumped the data version"""
+        now = time.monotonic()
+        if self._version is not None and now - self._version_checked_at < self.version_check_interval:
+            return
+
+        from db_utils import get_data_version_state
+        version, updated_at = get_data_version_state()
+        with self._lock:
+            self._version_checked_at = now
+            self._version_updated_at = updated_at
+            if version != self._version:
+                if self._version is not None:
+                    logger.info(f"Data version changed to {version}, clearing query cache")
+                self._entries.clear()
+                self._bytes = 0
+                self._version = version
+
+query_cache = QueryCache(
+    max_bytes=int(os.environ.get("QUERY_CACHE_MAX_BYTES", 64 * 1024 * 1024)),
+    ttl=float(os.environ.get("QUERY_CACHE_TTL", 0)) or None,
+    version_check_interval=float(os.environ.get("QUERY_CACHE_VERSION_CHECK", 1.0)),
+)
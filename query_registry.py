@@ -0,0 +1,157 @@
+import os
+import re
+import logging
+import threading
+from collections import namedtuple
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+# Multi-statement DDL scripts run by the loader, not by routes
+DDL_SCRIPTS = {"create_schema.sql", "create_indexes.sql"}
+
+# Subdirectories of read queries compiled with the top level, named "<directory>/<file>";
+# maintenance/ holds the loader's write scripts and is not compiled
+QUERY_SUBDIRS = ("approx",)
+
+# Header comment declaring a query's unique sort order, e.g. "-- keyset: margin DESC, product_id ASC"
+KEYSET_PATTERN = re.compile(r"^--\s*keyset:\s*(.+)$", re.MULTILINE | re.IGNORECASE)
+
+CompiledQuery = namedtuple(
+    "CompiledQuery",
+    ["name", "path", "sql", "statement", "params", "mtime", "keyset", "first_page", "next_page"]
+)
+
+def _parse_keyset(sql):
+    """Return [(column, descending), ...] from the keyset header, or None"""
+    match = KEYSET_PATTERN.search(sql)
+    if not match:
+        return None
+    keyset = []
+    for part in match.group(1).split(","):
+        column, _, direction = part.strip().partition(" ")
+        keyset.append((column, direction.strip().upper() == "DESC"))
+    return keyset
+
+def _paged_sql(sql, keyset, after_cursor):
+    """Wrap a query so it returns one page ordered by its keyset, optionally after a cursor row"""
+    conditions = []
+    for i, (column, descending) in enumerate(keyset):
+        terms = [f"page.{prev} = :cursor_{j}" for j, (prev, _) in enumerate(keyset[:i])]
+        terms.append(f"page.{column} {'<' if descending else '>'} :cursor_{i}")
+        conditions.append("(" + " AND ".join(terms) + ")")
+
+    order_by = ", ".join(f"page.{column} {'DESC' if descending else 'ASC'}" for column, descending in keyset)
+    where = "WHERE " + " OR ".join(conditions) + "\n" if after_cursor else ""
+    return f"SELECT * FROM (\n{sql.strip().rstrip(';')}\n) page\n{where}ORDER BY {order_by}\nLIMIT :page_size"
+
+class QueryRegistry:
+    """Every analytics query under queries/, translated and compiled once for the active dialect"""
+
+    def __init__(self, query_dir="queries"):
+        self.query_dir = query_dir
+        self.dialect = None
+        self.hot_reload = False
+        self._queries = {}
+        self._lock = threading.Lock()
+
+    def configure(self, dialect, hot_reload=False):
+        self.dialect = dialect
+        self.hot_reload = hot_reload
+
+    def load_all(self):
+        """Compile every query file, failing if any of them does not translate"""
+        from sql_dialects import QueryTranslationError
+        
+        queries = {}
+        errors = []
+        for filename in self._query_files():
+            try:
+                query = self._compile(filename)
+                queries[query.name] = query
+            except QueryTranslationError as e:
+                errors.append(f"{filename}: {str(e)}")
+
+        if errors:
+            raise QueryTranslationError(
+                f"Queries do not translate for {self.dialect}: " + "; ".join(errors)
+            )
+
+        with self._lock:
+            self._queries = queries
+        logger.info(f"Compiled {len(queries)} queries for {self.dialect}")
+
+    def _query_files(self):
+        """Every query file, relative to the query directory"""
+        filenames = [
+            filename for filename in sorted(os.listdir(self.query_dir))
+            if filename.endswith(".sql") and filename not in DDL_SCRIPTS
+        ]
+        for subdir in QUERY_SUBDIRS:
+            filenames.extend(
+                f"{subdir}/{filename}" for filename in sorted(os.listdir(os.path.join(self.query_dir, subdir)))
+                if filename.endswith(".sql")
+            )
+        return filenames
+
+    def get(self, name):
+        """Return the compiled query, recompiling it first if the file changed in hot-reload mode"""
+        query = self._queries.get(name)
+        if query is None:
+            raise KeyError(f"Unknown query: {name}")
+
+        if self.hot_reload and os.path.getmtime(query.path) != query.mtime:
+            logger.info(f"Reloading changed query file {query.path}")
+            query = self._compile(f"{name}.sql")
+            with self._lock:
+                self._queries[name] = query
+        return query
+
+    def statement(self, name, params):
+        """Return the compiled statement after checking every declared bind parameter is supplied"""
+        query = self.get(name)
+        missing = [param for param in query.params if param not in params]
+        if missing:
+            raise ValueError(f"Query {name} is missing parameters: {', '.join(missing)}")
+        return query.statement
+
+    def page_statement(self, name, params, after_cursor):
+        """Return the keyset-paged variant of a query"""
+        self.statement(name, params)
+        query = self.get(name)
+        if not query.keyset:
+            raise ValueError(f"Query {name} does not declare a keyset and cannot be paged")
+        return query, query.next_page if after_cursor else query.first_page
+
+    def names(self):
+        return sorted(self._queries)
+
+    def _compile(self, filename):
+        from db_utils import translate_sql
+        
+        path = os.path.join(self.query_dir, filename)
+        mtime = os.path.getmtime(path)
+        with open(path, 'r') as f:
+            sql = translate_sql(f.read(), self.dialect)
+
+        statement = text(sql)
+        params = tuple(statement.compile().params)
+        keyset = _parse_keyset(sql)
+        first_page = next_page = None
+        if keyset:
+            first_page = text(_paged_sql(sql, keyset, after_cursor=False))
+            next_page = text(_paged_sql(sql, keyset, after_cursor=True))
+        return CompiledQuery(
+            filename[:-len(".sql")], path, sql, statement, params, mtime, keyset, first_page, next_page
+        )
+
+query_registry = QueryRegistry()
+
+def init_query_registry(app):
+    """Compile the query registry at startup for the app's database dialect"""
+    from db_utils import get_db_dialect
+
+    hot_reload = os.environ.get("QUERY_HOT_RELOAD", "").lower() in ("1", "true", "yes")
+    query_registry.configure(get_db_dialect(), hot_reload=hot_reload)
+    query_registry.load_all()
+    app.extensions["query_registry"] = query_registry
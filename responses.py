@@ -0,0 +1,149 @@
+import os
+import gzip
+import time
+import hashlib
+from decimal import Decimal
+from datetime import datetime, timezone
+from flask import request, current_app, jsonify, Response, g
+
+try:
+    import orjson
+except ImportError:  # optional dependency; the app's JSON provider is used instead
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional dependency; large bodies are gzipped instead
+    brotli = None
+
+# Bodies smaller than this are sent uncompressed; compression costs more than it saves on them
+GZIP_MIN_BYTES = int(os.environ.get("RESPONSE_GZIP_MIN_BYTES", 1024))
+GZIP_LEVEL = int(os.environ.get("RESPONSE_GZIP_LEVEL", 6))
+BROTLI_QUALITY = int(os.environ.get("RESPONSE_BROTLI_QUALITY", 5))
+
+# GET responses under this prefix carry validators and are answered with 304 when unchanged
+CACHEABLE_PREFIX = "/analytics/"
+# Seconds browsers and proxies may reuse a response without revalidating it
+CACHE_MAX_AGE = int(os.environ.get("ANALYTICS_CACHE_MAX_AGE", 0))
+
+def _encode_default(value):
+    if isinstance(value, Decimal):
+        return float(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+def dumps(payload):
+    """Encode a payload to JSON bytes, with orjson when it is installed"""
+    if orjson is not None:
+        return orjson.dumps(payload, default=_encode_default, option=orjson.OPT_NON_STR_KEYS)
+    return current_app.json.dumps(payload).encode("utf-8")
+
+def wants_columnar():
+    return request.args.get("format") == "columnar"
+
+def to_columnar(rows):
+    """Split row dicts into a column list and one value array per row"""
+    columns = list(rows[0].keys()) if rows else []
+    # Looked up by name: filled-in rows (e.g. empty KPI days) may order their keys differently
+    return {"columns": columns, "data": [[row[column] for column in columns] for row in rows]}
+
+def json_response(payload, status=200):
+    """A JSON response encoded with the fast encoder; compressed like every JSON response"""
+    from metrics import record_serialize
+
+    started = time.perf_counter()
+    body = dumps(payload)
+    record_serialize(time.perf_counter() - started)
+
+    return Response(body, status=status, mimetype="application/json")
+
+def rows_response(rows, **extra):
+    """Rows in the default shape, or {"columns": [...], "data": [[...], ...]} with format=columnar.
+
+    Extra keys (such as next_cursor) are added beside the rows, which then move under "data".
+    """
+    if wants_columnar():
+        return json_response(dict(to_columnar(rows), **extra))
+    if extra:
+        return jsonify(dict(extra, data=rows))
+    return jsonify(rows)
+
+def response_encoding():
+    """brotli or gzip, whichever the client prefers among those available, or None"""
+    accepted = request.accept_encodings
+    if brotli is not None and accepted.quality("br") and accepted.quality("br") >= accepted.quality("gzip"):
+        return "br"
+    if accepted.quality("gzip"):
+        return "gzip"
+    return None
+
+def compress_response(response):
+    """Compress a large JSON body with brotli or gzip, as the request accepts"""
+    if response.mimetype != "application/json" or response.is_streamed or response.direct_passthrough:
+        return response
+    if response.status_code != 200 or "Content-Encoding" in response.headers:
+        return response
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    if len(body) < GZIP_MIN_BYTES:
+        return response
+    encoding = response_encoding()
+    if encoding == "br":
+        response.set_data(brotli.compress(body, quality=BROTLI_QUALITY))
+    elif encoding == "gzip":
+        response.set_data(gzip.compress(body, compresslevel=GZIP_LEVEL))
+    else:
+        return response
+    response.headers["Content-Encoding"] = encoding
+    return response
+
+def analytics_etag(version):
+    """Tag of a response: the data version plus a digest of the route and its query parameters"""
+    # Routes default missing dates to today, so the day is part of what a URL means
+    key = f"{request.path}?{sorted(request.args.items(multi=True))}@{datetime.now().date().isoformat()}"
+    return f"v{version}-{hashlib.sha1(key.encode('utf-8')).hexdigest()[:16]}"
+
+def analytics_last_modified(updated_at):
+    """Last-Modified of a response: when the data version was bumped, or the start of today if later"""
+    if updated_at is None:
+        return None
+    # Like the ETag, a response whose dates default to today may change at midnight without a new version
+    midnight = datetime.combine(datetime.now().date(), datetime.min.time()).astimezone(timezone.utc)
+    return max(updated_at.replace(tzinfo=timezone.utc), midnight)
+
+def _not_modified(etag, last_modified):
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if request.if_modified_since and last_modified is not None:
+        # HTTP dates have whole seconds
+        return last_modified.replace(microsecond=0) <= request.if_modified_since
+    return False
+
+def _set_validators(response, etag, last_modified):
+    response.set_etag(etag, weak=True)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.headers["Cache-Control"] = f"public, max-age={CACHE_MAX_AGE}, must-revalidate"
+
+def init_responses(app):
+    """Validators and 304s for analytics GETs, and compression of large JSON bodies"""
+    from query_cache import query_cache
+
+    @app.before_request
+    def answer_not_modified():
+        if request.method != "GET" or not request.path.startswith(CACHEABLE_PREFIX):
+            return None
+        # Read at most once per version check interval, so a 304 usually costs no SQL at all
+        version, updated_at = query_cache.data_version()
+        g.analytics_validators = (analytics_etag(version), analytics_last_modified(updated_at))
+        if _not_modified(*g.analytics_validators):
+            response = Response(status=304)
+            _set_validators(response, *g.analytics_validators)
+            return response
+        return None
+
+    @app.after_request
+    def add_validators(response):
+        validators = g.get("analytics_validators")
+        if validators is not None and response.status_code == 200:
+            _set_validators(response, *validators)
+        return compress_response(response)
@@ -0,0 +1,334 @@
+import os
+import json
+import logging
+import threading
+from decimal import Decimal, ROUND_HALF_UP
+from datetime import date, datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Snapshots kept at once; building one more drops the least recently built
+RFM_MAX_SNAPSHOTS = int(os.environ.get("RFM_MAX_SNAPSHOTS", 30))
+
+# Month ends, up to the last paid order day, that every load keeps a snapshot for; other dates are scored live
+RFM_SNAPSHOT_MONTHS = min(int(os.environ.get("RFM_SNAPSHOT_MONTHS", 12)), RFM_MAX_SNAPSHOTS)
+
+# Exclusive lower bound on order_date for a snapshot built from the full order history
+HISTORY_START = "1900-01-01"
+
+# Score dimensions: (metric column, score column), each ranked ascending with customer_id as tie-breaker
+SCORED_METRICS = [("recency_days", "r_score"), ("frequency", "f_score"), ("monetary", "m_score")]
+
+CENT = Decimal("0.01")
+
+# One build at a time per process; another worker building the same date loses on the primary key
+_build_lock = threading.Lock()
+
+def _to_date(value):
+    from rollups import _to_date as to_date
+    return to_date(value)
+
+def _cents(value):
+    """Exact money from a SUM: numeric on PostgreSQL, a float of whole cents on SQLite"""
+    return Decimal(str(value)).quantize(CENT)
+
+def rfm_segment(r_score, f_score, m_score):
+    """Segment of a customer's scores, as the CASE in rfm.sql assigns it"""
+    if r_score >= 4 and f_score >= 4 and m_score >= 4:
+        return 'Champions'
+    if r_score >= 3 and f_score >= 3 and m_score >= 3:
+        return 'Loyal Customers'
+    if r_score >= 4 and f_score <= 2:
+        return 'New Customers'
+    if r_score <= 2 and f_score >= 3 and m_score >= 3:
+        return 'At Risk'
+    if r_score <= 2 and f_score <= 2 and m_score >= 3:
+        return 'Cannot Lose Them'
+    if r_score <= 2 and f_score <= 2 and m_score <= 2:
+        return 'Lost'
+    return 'Others'
+
+def _round(value, digits):
+    """ROUND(value, digits) of an exact Decimal: half away from zero"""
+    return float(Decimal(value).quantize(Decimal(1).scaleb(-digits), rounding=ROUND_HALF_UP))
+
+def _ntile(values, buckets=5):
+    """NTILE(buckets) OVER (ORDER BY value, customer_id) for {customer_id: value}.
+
+    Returns each customer's tile and the breakpoints: the lowest value in each non-empty tile.
+    """
+    ordered = sorted((value, customer_id) for customer_id, value in values.items())
+    size, remainder = divmod(len(ordered), buckets)
+    tiles = {}
+    breakpoints = []
+    position = 0
+    for tile in range(1, buckets + 1):
+        count = size + (tile <= remainder)
+        if not count:
+            break
+        breakpoints.append(ordered[position][0])
+        for _, customer_id in ordered[position:position + count]:
+            tiles[customer_id] = tile
+        position += count
+    return tiles, breakpoints
+
+def _order_metrics(after_date, as_of_date):
+    """Last order day, order count and revenue per customer for paid orders in (after_date, as_of_date]"""
+    from app import db
+    from query_registry import query_registry
+
+    params = {"after_date": after_date, "as_of_date": as_of_date}
+    rows = db.session.execute(query_registry.statement("rfm_customer_metrics", params), params)
+    for customer_id, last_order_date, frequency, monetary in rows:
+        yield customer_id, _to_date(last_order_date), int(frequency), _cents(monetary)
+
+def _snapshot_metrics(as_of):
+    """Stored metrics of every customer in the snapshot as of a date, scored or not"""
+    from app import db
+    from models import RfmSnapshot
+
+    rows = db.session.query(
+        RfmSnapshot.customer_id, RfmSnapshot.last_order_date, RfmSnapshot.frequency, RfmSnapshot.monetary
+    ).filter(RfmSnapshot.as_of_date == as_of)
+    return {
+        customer_id: (_to_date(last_order_date), frequency, _cents(monetary))
+        for customer_id, last_order_date, frequency, monetary in rows
+    }
+
+def _score(metrics, as_of):
+    """Snapshot rows for {customer_id: (last_order_date, frequency, monetary)}, scored as rfm.sql does.
+
+    Customers without positive revenue are kept, unscored, so later snapshots can build on them.
+    """
+    rows = {
+        customer_id: {
+            "as_of_date": as_of,
+            "customer_id": customer_id,
+            "last_order_date": last_order_date,
+            "recency_days": (as_of - last_order_date).days,
+            "frequency": frequency,
+            "monetary": monetary,
+            "r_score": None,
+            "f_score": None,
+            "m_score": None,
+            "rfm_total": None,
+            "segment": None,
+        }
+        for customer_id, (last_order_date, frequency, monetary) in metrics.items()
+    }
+    scored = [row for row in rows.values() if row["monetary"] > 0]
+
+    breakpoints = {}
+    for metric, score in SCORED_METRICS:
+        tiles, breakpoints[metric] = _ntile({row["customer_id"]: row[metric] for row in scored})
+        for row in scored:
+            row[score] = tiles[row["customer_id"]]
+    for row in scored:
+        # Recency: fewer days since the last order is the better score
+        row["r_score"] = 6 - row["r_score"]
+        row["rfm_total"] = row["r_score"] + row["f_score"] + row["m_score"]
+        row["segment"] = rfm_segment(row["r_score"], row["f_score"], row["m_score"])
+    return list(rows.values()), len(scored), breakpoints
+
+def _plain_breakpoints(breakpoints):
+    return {
+        metric: [float(value) if isinstance(value, Decimal) else value for value in values]
+        for metric, values in breakpoints.items()
+    }
+
+def _latest_snapshot_before(as_of):
+    from app import db
+    from models import RfmSnapshotRun
+
+    return db.session.query(db.func.max(RfmSnapshotRun.as_of_date)).filter(
+        RfmSnapshotRun.as_of_date < as_of
+    ).scalar()
+
+def snapshot_exists(as_of_date):
+    from app import db
+    from models import RfmSnapshotRun
+
+    return db.session.get(RfmSnapshotRun, _to_date(as_of_date)) is not None
+
+def build_rfm_snapshot(as_of_date):
+    """Persist the RFM scores of every customer as of a date.
+
+    Starts from the latest earlier snapshot and adds the paid orders placed since,
+    or reads the full order history when there is none; the quintiles are then
+    re-ranked in memory over the per-customer metrics.
+    """
+    from app import db
+    from models import RfmSnapshot, RfmSnapshotRun
+
+    as_of = _to_date(as_of_date)
+    base = _latest_snapshot_before(as_of)
+    base = _to_date(base) if base is not None else None
+    metrics = _snapshot_metrics(base) if base is not None else {}
+
+    for customer_id, last_order_date, frequency, monetary in _order_metrics(
+        base.isoformat() if base is not None else HISTORY_START, as_of.isoformat()
+    ):
+        previous = metrics.get(customer_id)
+        if previous is not None:
+            # Orders since the base snapshot are later than every order it counted
+            frequency += previous[1]
+            monetary += previous[2]
+        metrics[customer_id] = (last_order_date, frequency, monetary)
+
+    rows, scored, breakpoints = _score(metrics, as_of)
+    try:
+        db.session.add(RfmSnapshotRun(
+            as_of_date=as_of,
+            base_as_of_date=base,
+            customers=scored,
+            breakpoints=json.dumps(_plain_breakpoints(breakpoints)),
+            built_at=datetime.utcnow()
+        ))
+        db.session.flush()
+        db.session.bulk_insert_mappings(RfmSnapshot, rows)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    logger.info(
+        f"RFM snapshot as of {as_of} built from {base or 'full history'}: {scored} scored of {len(rows)} customers"
+    )
+    _prune_snapshots()
+
+def _prune_snapshots():
+    """Drop the least recently built snapshots beyond RFM_MAX_SNAPSHOTS"""
+    from app import db
+    from models import RfmSnapshotRun
+
+    stale = [
+        as_of for (as_of,) in db.session.query(RfmSnapshotRun.as_of_date)
+        .order_by(RfmSnapshotRun.built_at.desc()).offset(RFM_MAX_SNAPSHOTS)
+    ]
+    if stale:
+        _delete_snapshots(as_of_dates=stale)
+        db.session.commit()
+
+def _delete_snapshots(as_of_dates=None, since=None):
+    """Delete snapshots by date, or those as of since onwards, or every snapshot"""
+    from app import db
+    from models import RfmSnapshot, RfmSnapshotRun
+
+    for model in (RfmSnapshot, RfmSnapshotRun):
+        query = db.session.query(model)
+        if as_of_dates is not None:
+            query = query.filter(model.as_of_date.in_(as_of_dates))
+        if since is not None:
+            query = query.filter(model.as_of_date >= since)
+        query.delete(synchronize_session=False)
+
+def ensure_rfm_snapshot(as_of_date):
+    """Build the snapshot as of a date unless it is already stored"""
+    from sqlalchemy.exc import IntegrityError
+
+    if snapshot_exists(as_of_date):
+        return
+    with _build_lock:
+        if snapshot_exists(as_of_date):
+            return
+        try:
+            build_rfm_snapshot(as_of_date)
+        except IntegrityError:
+            # Another worker stored the same snapshot first
+            logger.info(f"RFM snapshot as of {as_of_date} was built concurrently")
+
+def snapshot_month_ends():
+    """The RFM_SNAPSHOT_MONTHS most recent month ends up to the last paid order day, oldest first"""
+    from app import db
+    from db_utils import translate_sql, get_db_dialect
+
+    last_order = db.session.execute(db.text(translate_sql(
+        "SELECT MAX(order_date) FROM orders WHERE payment_status = 'paid'", get_db_dialect()
+    ))).scalar()
+    if last_order is None or RFM_SNAPSHOT_MONTHS <= 0:
+        return []
+    last_day = _to_date(last_order)
+    month_end = date(last_day.year + (last_day.month == 12), last_day.month % 12 + 1, 1) - timedelta(days=1)
+    if month_end > last_day:
+        # The last month is not over: its month end is not a known date yet
+        month_end = last_day.replace(day=1) - timedelta(days=1)
+    month_ends = []
+    while len(month_ends) < RFM_SNAPSHOT_MONTHS:
+        month_ends.append(month_end)
+        month_end = month_end.replace(day=1) - timedelta(days=1)
+    return sorted(month_ends)
+
+def refresh_rfm_snapshots():
+    """Build the month-end snapshots a load dropped or has not built yet, so requests only read them"""
+    for as_of in snapshot_month_ends():
+        ensure_rfm_snapshot(as_of.isoformat())
+
+def invalidate_rfm_snapshots(days=None):
+    """Drop the snapshots a load made stale: those as of the earliest changed day onwards, or all"""
+    from app import db
+
+    try:
+        if days is None:
+            _delete_snapshots()
+        elif days:
+            since = min(_to_date(day) for day in days)
+            _delete_snapshots(since=since)
+        else:
+            return
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error invalidating RFM snapshots: {str(e)}")
+        raise
+
+def live_segments(as_of_date):
+    """The rows of rfm_segments.sql and the breakpoints for a date without a snapshot, scored in memory.
+
+    Nothing is stored: metrics come from the full order history, as in rfm.sql, and are summed
+    exactly before rounding, as the database does over a snapshot.
+    """
+    as_of = _to_date(as_of_date)
+    metrics = {
+        customer_id: (last_order_date, frequency, monetary)
+        for customer_id, last_order_date, frequency, monetary in _order_metrics(HISTORY_START, as_of.isoformat())
+    }
+    rows, _, breakpoints = _score(metrics, as_of)
+
+    segments = {}
+    for row in rows:
+        if row["segment"] is not None:
+            segments.setdefault(row["segment"], []).append(row)
+    summary = []
+    for segment, members in segments.items():
+        count = len(members)
+        revenue = sum(row["monetary"] for row in members)
+        summary.append({
+            "segment": segment,
+            "customers": count,
+            "revenue": _round(revenue, 2),
+            "avg_recency_days": _round(Decimal(sum(row["recency_days"] for row in members)) / count, 1),
+            "avg_frequency": _round(Decimal(sum(row["frequency"] for row in members)) / count, 2),
+            "avg_monetary": _round(revenue / count, 2),
+            "avg_rfm_total": _round(Decimal(sum(row["rfm_total"] for row in members)) / count, 2),
+        })
+    summary.sort(key=lambda row: (-row["revenue"], row["segment"]))
+    return summary, _plain_breakpoints(breakpoints)
+
+def snapshot_breakpoints(as_of_date):
+    """Lowest recency_days, frequency and monetary value of each quintile in a stored snapshot"""
+    from app import db
+    from models import RfmSnapshotRun
+
+    run = db.session.get(RfmSnapshotRun, _to_date(as_of_date))
+    return json.loads(run.breakpoints) if run is not None else None
+
+if __name__ == "__main__":
+    import argparse
+    from app import app
+
+    parser = argparse.ArgumentParser(description="Build persisted RFM snapshots")
+    parser.add_argument("as_of", nargs="+", help="Snapshot dates (YYYY-MM-DD), built in ascending order")
+    args = parser.parse_args()
+
+    with app.app_context():
+        for as_of in sorted(args.as_of):
+            ensure_rfm_snapshot(as_of)
@@ -0,0 +1,168 @@
+import os
+import logging
+from datetime import date, datetime, timedelta
+
+logger = logging.getLogger(__name__)
+
+# Days of fulfilled sales, up to the last sale day loaded, that a product's daily sales rate averages over
+VELOCITY_WINDOW_DAYS = int(os.environ.get("LOW_STOCK_VELOCITY_DAYS", 28))
+
+# Stock covering fewer days of sales than these is alerted as Low, or as Critical
+LOW_COVER_DAYS = float(os.environ.get("LOW_STOCK_COVER_DAYS", 14))
+CRITICAL_COVER_DAYS = float(os.environ.get("LOW_STOCK_CRITICAL_COVER_DAYS", 7))
+
+# Day range covering every order, for full rebuilds
+FULL_HISTORY = (date(1900, 1, 1), date(9999, 12, 31))
+
+def _day_ranges(days):
+    """Collapse a set of days into sorted (start, end_exclusive) ranges of consecutive days"""
+    ranges = []
+    for day in sorted(days):
+        if ranges and ranges[-1][1] == day:
+            ranges[-1][1] = day + timedelta(days=1)
+        else:
+            ranges.append([day, day + timedelta(days=1)])
+    return [(start, end) for start, end in ranges]
+
+def _month_ranges(days):
+    """Collapse the months of a set of days into sorted (start, end_exclusive) ranges of consecutive months"""
+    ranges = []
+    for month in sorted({day.replace(day=1) for day in days}):
+        following = date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+        if ranges and ranges[-1][1] == month:
+            ranges[-1][1] = following
+        else:
+            ranges.append([month, following])
+    return [(start, end) for start, end in ranges]
+
+def _to_date(value):
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    return datetime.strptime(str(value)[:10], '%Y-%m-%d').date()
+
+def run_sql_script(filename, params, expanding=()):
+    """Execute each statement of a maintenance script under queries/ with the same params"""
+    from app import db
+    from db_utils import load_sql_query
+
+    script = load_sql_query(filename)
+    for statement in [stmt.strip() for stmt in script.split(';') if stmt.strip()]:
+        text = db.text(statement)
+        lists = [name for name in expanding if f":{name}" in statement]
+        if lists:
+            text = text.bindparams(*[db.bindparam(name, expanding=True) for name in lists])
+        db.session.execute(text, params)
+
+def order_days(order_ids, batch_size=500):
+    """Return the set of days on which the given orders were placed"""
+    from app import db
+    from db_utils import translate_sql, get_db_dialect
+
+    order_ids = list(order_ids)
+    days = set()
+    statement = translate_sql("SELECT DISTINCT DATE(order_date) FROM orders WHERE order_id IN :order_ids", get_db_dialect())
+    for i in range(0, len(order_ids), batch_size):
+        batch = order_ids[i:i + batch_size]
+        rows = db.session.execute(
+            db.text(statement)
+            .bindparams(db.bindparam("order_ids", expanding=True)),
+            {"order_ids": batch}
+        ).fetchall()
+        days.update(_to_date(row[0]) for row in rows)
+    return days
+
+def refresh_daily_rollups(days=None):
+    """Rebuild daily_product_sales and daily_category_sales for the given days, or all history"""
+    from app import db
+
+    if days is None:
+        ranges = [FULL_HISTORY]
+    else:
+        ranges = _day_ranges({_to_date(day) for day in days})
+
+    try:
+        for start, end in ranges:
+            run_sql_script("maintenance/refresh_daily_sales.sql", {
+                "start_date": start.isoformat(),
+                "end_date": end.isoformat()
+            })
+        db.session.commit()
+        logger.info(f"Daily sales rollups refreshed for {len(ranges)} day range(s)")
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error refreshing daily rollups: {str(e)}")
+        raise
+
+def refresh_customer_first_purchases(customer_ids=None, batch_size=500):
+    """Recompute customer_first_purchases for the given customers, or for everyone"""
+    from app import db
+
+    try:
+        if customer_ids is None:
+            run_sql_script("maintenance/rebuild_customer_first_purchases.sql", {})
+        else:
+            customer_ids = sorted(customer_ids)
+            for i in range(0, len(customer_ids), batch_size):
+                run_sql_script(
+                    "maintenance/refresh_customer_first_purchases.sql",
+                    {"customer_ids": customer_ids[i:i + batch_size]},
+                    expanding=("customer_ids",)
+                )
+        db.session.commit()
+        logger.info("Customer first purchases refreshed")
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error refreshing customer first purchases: {str(e)}")
+        raise
+
+def refresh_cohort_retention(days=None):
+    """Rebuild the cohort_retention cells of the months containing the given days, or of all history"""
+    from app import db
+
+    if days is None:
+        ranges = [FULL_HISTORY]
+    else:
+        ranges = _month_ranges({_to_date(day) for day in days})
+
+    try:
+        for start, end in ranges:
+            run_sql_script("maintenance/refresh_cohort_retention.sql", {
+                "start_date": start.isoformat(),
+                "end_date": end.isoformat()
+            })
+        db.session.commit()
+        logger.info(f"Cohort retention refreshed for {len(ranges)} month range(s)")
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error refreshing cohort retention: {str(e)}")
+        raise
+
+def refresh_low_stock_alerts():
+    """Recompute product sales rates from the daily rollup and rebuild low_stock_alerts from inventory.
+
+    The rate window ends at the last sale day loaded, so it moves with every load of new orders;
+    recomputing it reads only the window's days of daily_product_sales.
+    """
+    from app import db
+
+    try:
+        last_sale = db.session.execute(db.text(
+            "SELECT MAX(sale_date) FROM daily_product_sales WHERE fulfilled = true"
+        )).scalar()
+        window_end = _to_date(last_sale) if last_sale is not None else date.today()
+        window_start = window_end - timedelta(days=VELOCITY_WINDOW_DAYS - 1)
+        run_sql_script("maintenance/refresh_low_stock_alerts.sql", {
+            "window_start": window_start.isoformat(),
+            "window_end": window_end.isoformat(),
+            "window_days": VELOCITY_WINDOW_DAYS,
+            "low_cover_days": LOW_COVER_DAYS,
+            "critical_cover_days": CRITICAL_COVER_DAYS
+        })
+        db.session.commit()
+        logger.info(f"Low stock alerts refreshed for sales from {window_start} to {window_end}")
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error refreshing low stock alerts: {str(e)}")
+        raise
@@ -1,12 +1,132 @@
+import io
+import os
+import csv
+import calendar
+import time
 import logging
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
-from flask import request, render_template, jsonify, redirect, url_for, flash
-from db_utils import execute_query, load_sql_query
-from data_loader import DataLoader
+from flask import request, render_template, jsonify, redirect, url_for, flash, Response, stream_with_context, current_app
+from db_utils import execute_named_query, execute_page, stream_query
+from query_cache import query_cache
+from metrics import render_metrics
+from responses import rows_response
+from load_jobs import start_load, get_job, list_jobs, LoadInProgress
+from sketches import approximate_kpi, approximate_repeat_rate, approximate_cohort_retention
+from rfm_snapshots import snapshot_exists, snapshot_breakpoints, live_segments
 import traceback
 
 logger = logging.getLogger(__name__)
 
+# Longest date range served by /analytics/kpi-series
+MAX_KPI_SERIES_DAYS = 366
+
+# Keyset page size bounds for row-level endpoints
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 5000
+
+# Dashboard queries /analytics/batch can run, by name, and the route serving each
+BATCH_ROUTES = {
+    "kpi": "/analytics/kpi",
+    "kpi_series": "/analytics/kpi-series",
+    "revenue_by_month_category": "/analytics/revenue-by-month-category",
+    "repeat_rate": "/analytics/repeat-rate",
+    "cohort_retention": "/analytics/cohort-retention",
+    "rfm": "/analytics/rfm",
+    "rfm_segments": "/analytics/rfm/segments",
+    "top_products": "/analytics/top-products",
+    "low_stock": "/analytics/low-stock",
+    "order_funnel": "/analytics/order-funnel",
+}
+MAX_BATCH_QUERIES = 16
+
+# Shared by every batch request, so concurrent dashboards cannot exhaust the connection pool
+batch_executor = ThreadPoolExecutor(
+    max_workers=int(os.environ.get("BATCH_MAX_WORKERS", 4)), thread_name_prefix="batch"
+)
+
+# KPI snapshot for a day without paid orders
+EMPTY_KPI = {
+    "orders": 0,
+    "revenue": 0,
+    "aov": 0,
+    "unique_customers": 0,
+    "new_customers": 0,
+    "repeat_rate": 0,
+    "top_category": "N/A",
+    "top_product": "N/A",
+}
+
+def _stream_rows(name, params, output_format):
+    """Generate NDJSON lines or CSV text chunk by chunk from a server-side cursor"""
+    batches = stream_query(name, params)
+    columns = next(batches)
+    
+    if output_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(columns)
+        for batch in batches:
+            writer.writerows(batch)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    else:
+        for batch in batches:
+            yield "".join(current_app.json.dumps(dict(zip(columns, row))) + "\n" for row in batch)
+
+def row_level_response(name, params):
+    """Return all rows, one keyset page (page_size/cursor) or a streamed body (format=ndjson|csv).
+
+    format=columnar returns the rows as {"columns": [...], "data": [[...], ...]}.
+    """
+    output_format = request.args.get("format", "json")
+    if output_format in ("ndjson", "csv"):
+        mimetype = "text/csv" if output_format == "csv" else "application/x-ndjson"
+        return Response(stream_with_context(_stream_rows(name, params, output_format)), mimetype=mimetype)
+    
+    if "page_size" in request.args or "cursor" in request.args:
+        page_size = max(1, min(int(request.args.get("page_size", DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+        try:
+            rows, next_cursor = execute_page(name, params, request.args.get("cursor"), page_size)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return rows_response(rows, next_cursor=next_cursor)
+    
+    return rows_response(execute_named_query(name, params))
+
+def approx_method():
+    """None for exact results; approx=true estimates from sketches, approx=sample forces sampling"""
+    value = request.args.get("approx", "").lower()
+    if value in ("sample", "sampled"):
+        return "sample"
+    if value in ("1", "true", "yes"):
+        return "auto"
+    return None
+
+def month_end(month):
+    """The last day of a YYYY-MM month as YYYY-MM-DD; "-31" is no date at all in most months"""
+    start = datetime.strptime(month, "%Y-%m")
+    return f"{month}-{calendar.monthrange(start.year, start.month)[1]:02d}"
+
+def rfm_as_of_date():
+    """The as_of parameter (default today) as YYYY-MM-DD, the key RFM snapshots are stored under"""
+    as_of = request.args.get("as_of", datetime.now().strftime("%Y-%m-%d"))
+    return datetime.strptime(as_of, "%Y-%m-%d").date().isoformat()
+
+def _run_batch_query(app, path, params):
+    """Dispatch one batched query in its own request context, and so with its own session"""
+    started = time.perf_counter()
+    with app.test_request_context(path, query_string=params):
+        response = app.full_dispatch_request()
+        data = response.get_json()
+    return {
+        "status": response.status_code,
+        "data": data,
+        "ms": round((time.perf_counter() - started) * 1000, 2),
+    }
+
 def register_routes(app):
     
     @app.route("/")
@@ -21,25 +141,124 @@ def register_routes(app):
     
     @app.route("/load-data", methods=["POST"])
     def load_data():
-        """Load data from CSV files"""
+        """Start a background load of the CSV files (form post from the dashboard)"""
         try:
-            loader = DataLoader()
-            loader.load_all_data()
-            flash("Data loaded successfully!", "success")
+            job = start_load(current_app._get_current_object(), request.form.get("mode") or "rows")
+            flash(f"Data load started (job {job.id})", "success")
+        except LoadInProgress as e:
+            flash(f"A data load is already running (job {e.job.id})", "error")
         except Exception as e:
             logger.error(f"Data loading failed: {str(e)}")
             flash(f"Data loading failed: {str(e)}", "error")
         
         return redirect(url_for("index"))
     
+    @app.route("/load-jobs", methods=["POST"])
+    def create_load_job():
+        """Start a background load of the source files in data/; 409 with the running job if one is in progress.
+
+        The data directory is fixed: a request chooses only the mode, never a path on the server.
+        """
+        body = request.get_json(silent=True) or {}
+        try:
+            job = start_load(current_app._get_current_object(), body.get("mode", "rows"))
+        except LoadInProgress as e:
+            return jsonify({"error": str(e), "job": e.job.to_dict() if e.job else None}), 409
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        return jsonify(job.to_dict()), 202, {"Location": url_for("load_job_status", job_id=job.id)}
+    
+    @app.route("/load-jobs")
+    def load_jobs():
+        """Load jobs started by this worker process, newest first"""
+        return jsonify([job.to_dict() for job in list_jobs()])
+    
+    @app.route("/load-jobs/<job_id>")
+    def load_job_status(job_id):
+        """Status and per-table progress of one load job"""
+        job = get_job(job_id)
+        if job is None:
+            return jsonify({"error": "Unknown load job"}), 404
+        return jsonify(job.to_dict())
+    
+    @app.route("/load-jobs/<job_id>/cancel", methods=["POST"])
+    def cancel_load_job(job_id):
+        """Stop a load at its next stage, staged chunk or progress report and roll back what it wrote"""
+        job = get_job(job_id)
+        if job is None:
+            return jsonify({"error": "Unknown load job"}), 404
+        if not job.cancel():
+            return jsonify({"error": f"Load job already {job.status}", "job": job.to_dict()}), 409
+        return jsonify(job.to_dict()), 202
+    
+    @app.route("/metrics")
+    def metrics():
+        """Query and request latency histograms in Prometheus text format"""
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
+    
+    @app.route("/cache-stats")
+    def cache_stats():
+        """Query result cache hit/miss statistics"""
+        return jsonify(query_cache.stats())
+    
+    @app.route("/analytics/batch", methods=["POST"])
+    def analytics_batch():
+        """Run several dashboard queries concurrently and return their results together"""
+        try:
+            started = time.perf_counter()
+            body = request.get_json(silent=True) or {}
+            queries = body.get("queries")
+            if not isinstance(queries, list) or not queries:
+                return jsonify({"error": "queries must be a non-empty list"}), 400
+            if len(queries) > MAX_BATCH_QUERIES:
+                return jsonify({"error": f"A batch is limited to {MAX_BATCH_QUERIES} queries"}), 400
+            
+            jobs = {}
+            for query in queries:
+                name = query.get("name") if isinstance(query, dict) else None
+                if name not in BATCH_ROUTES:
+                    return jsonify({"error": f"Unknown query: {name}"}), 400
+                params = query.get("params") or {}
+                if not isinstance(params, dict) or params.get("format", "columnar") != "columnar":
+                    return jsonify({"error": f"Invalid params for {name}"}), 400
+                query_id = query.get("id", name)
+                if query_id in jobs:
+                    return jsonify({"error": f"Duplicate query id: {query_id}"}), 400
+                jobs[query_id] = (BATCH_ROUTES[name], params)
+            
+            target = current_app._get_current_object()
+            futures = {
+                query_id: batch_executor.submit(_run_batch_query, target, path, params)
+                for query_id, (path, params) in jobs.items()
+            }
+            results = {query_id: future.result() for query_id, future in futures.items()}
+            
+            return jsonify({
+                "results": results,
+                "ms": round((time.perf_counter() - started) * 1000, 2),
+            })
+            
+        except Exception as e:
+            logger.error(f"Batch query failed: {str(e)}")
+            return jsonify({"error": str(e)}), 500
+    
     @app.route("/analytics/kpi")
     def kpi():
         """Daily KPI snapshot"""
         try:
             date_param = request.args.get("date", datetime.now().strftime("%Y-%m-%d"))
             
-            query = load_sql_query("kpi.sql")
-            result = execute_query(query, {"target_date": date_param})
+            next_date = (datetime.strptime(date_param, "%Y-%m-%d") + timedelta(days=1)).strftime("%Y-%m-%d")
+            
+            if approx_method():
+                snapshot, estimate = query_cache.get_or_execute(
+                    "kpi:approx", {"target_date": date_param}, lambda: approximate_kpi(date_param, next_date)
+                )
+                if snapshot is None:
+                    return jsonify({"error": "No data found for the specified date"}), 404
+                return jsonify(dict(snapshot, approximate=estimate))
+            
+            result = execute_named_query("kpi", {"target_date": date_param, "next_date": next_date})
             
             if result:
                 return jsonify(result[0])
@@ -50,6 +269,45 @@ def register_routes(app):
             logger.error(f"KPI query failed: {str(e)}")
             return jsonify({"error": str(e)}), 500
     
+    @app.route("/analytics/kpi-series")
+    def kpi_series():
+        """Daily KPI snapshots for every day in a date range"""
+        try:
+            end_param = request.args.get("end", datetime.now().strftime("%Y-%m-%d"))
+            end_date = datetime.strptime(end_param, "%Y-%m-%d").date()
+            start_param = request.args.get("start", (end_date - timedelta(days=29)).isoformat())
+            start_date = datetime.strptime(start_param, "%Y-%m-%d").date()
+            
+            if end_date < start_date:
+                return jsonify({"error": "end must not be before start"}), 400
+            if (end_date - start_date).days >= MAX_KPI_SERIES_DAYS:
+                return jsonify({"error": f"Range is limited to {MAX_KPI_SERIES_DAYS} days"}), 400
+            
+            result = execute_named_query("kpi_series", {
+                "start_date": start_date.isoformat(),
+                "end_date": (end_date + timedelta(days=1)).isoformat()
+            })
+            
+            # Days without paid orders get the same zero snapshot /analytics/kpi returns
+            by_day = {str(row["date"])[:10]: row for row in result}
+            series = []
+            day = start_date
+            while day <= end_date:
+                row = by_day.get(day.isoformat())
+                if row is None:
+                    row = dict(EMPTY_KPI)
+                else:
+                    row = dict(row)
+                row["date"] = day.isoformat()
+                series.append(row)
+                day += timedelta(days=1)
+            
+            return rows_response(series)
+            
+        except Exception as e:
+            logger.error(f"KPI series query failed: {str(e)}")
+            return jsonify({"error": str(e)}), 500
+    
     @app.route("/analytics/revenue-by-month-category")
     def revenue_by_month_category():
         """Revenue by month and category"""
@@ -59,15 +317,14 @@ def register_routes(app):
             
             # Convert to full dates
             start_date_full = f"{start_date}-01"
-            end_date_full = f"{end_date}-31"
+            end_date_full = month_end(end_date)
             
-            query = load_sql_query("revenue_by_month_category.sql")
-            result = execute_query(query, {
+            result = execute_named_query("revenue_by_month_category", {
                 "start_date": start_date_full,
                 "end_date": end_date_full
             })
             
-            return jsonify(result)
+            return rows_response(result)
             
         except Exception as e:
             logger.error(f"Revenue by month-category query failed: {str(e)}")
@@ -81,15 +338,22 @@ def register_routes(app):
             end_date = request.args.get("end", "2024-12")
             
             start_date_full = f"{start_date}-01"
-            end_date_full = f"{end_date}-31"
+            end_date_full = month_end(end_date)
             
-            query = load_sql_query("repeat_rate.sql")
-            result = execute_query(query, {
+            method = approx_method()
+            if method:
+                rows, estimate = query_cache.get_or_execute(
+                    "repeat_rate:approx", {"start": start_date, "end": end_date, "method": method},
+                    lambda: approximate_repeat_rate(start_date_full, f"{end_date}-01", method)
+                )
+                return rows_response(rows, approximate=estimate)
+            
+            result = execute_named_query("repeat_rate", {
                 "start_date": start_date_full,
                 "end_date": end_date_full
             })
             
-            return jsonify(result)
+            return rows_response(result)
             
         except Exception as e:
             logger.error(f"Repeat rate query failed: {str(e)}")
@@ -104,16 +368,27 @@ def register_routes(app):
             horizon = int(request.args.get("horizon", 12))
             
             start_date_full = f"{start_date}-01"
-            end_date_full = f"{end_date}-31"
+            end_date_full = month_end(end_date)
+            
+            method = approx_method()
+            if method:
+                # Estimates are a preview: one unpaged JSON (or columnar) body
+                rows, estimate = query_cache.get_or_execute(
+                    "cohort_retention:approx",
+                    {"start": start_date, "end": end_date, "horizon": horizon, "method": method},
+                    lambda: approximate_cohort_retention(start_date_full, f"{end_date}-01", horizon, method)
+                )
+                return rows_response(rows, approximate=estimate)
             
-            query = load_sql_query("cohort_retention.sql")
-            result = execute_query(query, {
+            params = {
                 "start_date": start_date_full,
                 "end_date": end_date_full,
                 "horizon": horizon
-            })
+            }
+            if current_app.config.get("ANALYTICS_ENGINE") == "columnar":
+                return row_level_response("cohort_retention", params)
             
-            return jsonify(result)
+            return row_level_response("cohort_retention_matrix", params)
             
         except Exception as e:
             logger.error(f"Cohort retention query failed: {str(e)}")
@@ -121,19 +396,42 @@ def register_routes(app):
     
     @app.route("/analytics/rfm")
     def rfm():
-        """RFM customer scoring"""
+        """RFM customer scoring, read from the persisted snapshot as of the date when a load built one"""
         try:
-            as_of_date = request.args.get("as_of", datetime.now().strftime("%Y-%m-%d"))
+            as_of_date = rfm_as_of_date()
             
-            query = load_sql_query("rfm.sql")
-            result = execute_query(query, {"as_of_date": as_of_date})
+            if current_app.config.get("ANALYTICS_ENGINE") == "columnar":
+                return row_level_response("rfm", {"as_of_date": as_of_date})
             
-            return jsonify(result)
+            if snapshot_exists(as_of_date):
+                return row_level_response("rfm_snapshot", {"as_of_date": as_of_date})
+            # Requests never write: dates without a snapshot are scored live
+            return row_level_response("rfm", {"as_of_date": as_of_date})
             
         except Exception as e:
             logger.error(f"RFM query failed: {str(e)}")
             return jsonify({"error": str(e)}), 500
     
+    @app.route("/analytics/rfm/segments")
+    def rfm_segments():
+        """Customers, revenue and average metrics per RFM segment, with the quintile breakpoints"""
+        try:
+            as_of_date = rfm_as_of_date()
+            
+            if snapshot_exists(as_of_date):
+                result = execute_named_query("rfm_segments", {"as_of_date": as_of_date})
+                return rows_response(result, breakpoints=snapshot_breakpoints(as_of_date))
+            
+            result, breakpoints = query_cache.get_or_execute(
+                "rfm_segments:live", {"as_of_date": as_of_date},
+                lambda: live_segments(as_of_date)
+            )
+            return rows_response(result, breakpoints=breakpoints)
+            
+        except Exception as e:
+            logger.error(f"RFM segments query failed: {str(e)}")
+            return jsonify({"error": str(e)}), 500
+    
     @app.route("/analytics/top-products")
     def top_products():
         """Top products by margin"""
@@ -143,29 +441,23 @@ def register_routes(app):
             start_date = request.args.get("start", "2024-01-01")
             end_date = request.args.get("end", "2024-12-31")
             
-            query = load_sql_query("top_products.sql")
-            result = execute_query(query, {
+            return row_level_response("top_products", {
                 "start_date": start_date,
                 "end_date": end_date,
                 "limit_n": n
             })
             
-            return jsonify(result)
-            
         except Exception as e:
             logger.error(f"Top products query failed: {str(e)}")
             return jsonify({"error": str(e)}), 500
     
     @app.route("/analytics/low-stock")
     def low_stock():
-        """Low stock alerts"""
+        """Low stock alerts, with days of cover at each product's recent sales rate"""
         try:
             n = min(int(request.args.get("n", 20)), 100)  # Clamp to 100
             
-            query = load_sql_query("low_stock.sql")
-            result = execute_query(query, {"limit_n": n})
-            
-            return jsonify(result)
+            return row_level_response("low_stock_alerts", {"limit_n": n})
             
         except Exception as e:
             logger.error(f"Low stock query failed: {str(e)}")
@@ -178,13 +470,12 @@ def register_routes(app):
             start_date = request.args.get("start", "2024-01-01")
             end_date = request.args.get("end", "2024-12-31")
             
-            query = load_sql_query("order_funnel.sql")
-            result = execute_query(query, {
+            result = execute_named_query("order_funnel", {
                 "start_date": start_date,
                 "end_date": end_date
             })
             
-            return jsonify(result)
+            return rows_response(result)
             
         except Exception as e:
             logger.error(f"Order funnel query failed: {str(e)}")
@@ -0,0 +1,434 @@
+import os
+import math
+import logging
+import hashlib
+from datetime import date, timedelta
+
+try:
+    import numpy as np
+except ImportError:  # optional dependency; dense sketches are merged in pure Python instead
+    np = None
+
+logger = logging.getLogger(__name__)
+
+# HyperLogLog registers are 2 ** precision; relative standard error is 1.04 / sqrt(registers)
+SKETCH_PRECISION = int(os.environ.get("SKETCH_PRECISION", 14))
+
+# Share of customers read by the sampling fallback, in 1/1024ths of the hashtext() range
+SAMPLE_BUCKETS = 1024
+SAMPLE_PERCENT = float(os.environ.get("SKETCH_SAMPLE_PERCENT", 10))
+
+# Two standard errors: estimates fall within the bound about 95% of the time
+CONFIDENCE = 0.95
+CONFIDENCE_Z = 2.0
+
+# Paid orders of each cohort on one day, for every day with paid orders
+SKETCH_ROWS_SQL = """
+    SELECT o.order_date::date AS day, fp.cohort_month, o.customer_id
+    FROM orders o
+    JOIN customer_first_purchases fp ON fp.customer_id = o.customer_id
+    WHERE o.payment_status = 'paid'
+      AND o.order_date >= :start_date
+      AND o.order_date < :end_date
+"""
+
+SPARSE_MARKER = b"S"
+DENSE_MARKER = b"D"
+
+def _register(value, precision):
+    """Register index and rank (position of the first 1 bit) of a value's 64-bit hash"""
+    digest = int.from_bytes(hashlib.blake2b(value.encode("utf-8"), digest_size=8).digest(), "big")
+    width = 64 - precision
+    return digest >> width, width - (digest & ((1 << width) - 1)).bit_length() + 1
+
+class HyperLogLog:
+    """Mergeable distinct-count sketch; sparse until a dense register array is smaller"""
+
+    def __init__(self, precision=SKETCH_PRECISION):
+        self.precision = precision
+        self.m = 1 << precision
+        self.sparse = {}
+        self.dense = None
+
+    @property
+    def error(self):
+        """Relative standard error of the estimate"""
+        return 1.04 / math.sqrt(self.m)
+
+    def add(self, value):
+        self.set_register(*_register(value, self.precision))
+
+    def set_register(self, index, rank):
+        if self.dense is not None:
+            if rank > self.dense[index]:
+                self.dense[index] = rank
+        elif rank > self.sparse.get(index, 0):
+            self.sparse[index] = rank
+            # Three bytes per sparse register against one per dense register
+            if len(self.sparse) * 3 > self.m:
+                self._densify()
+
+    def _densify(self):
+        if self.dense is None:
+            self.dense = bytearray(self.m)
+            for index, rank in self.sparse.items():
+                self.dense[index] = rank
+            self.sparse = {}
+
+    def merge(self, other):
+        """Union of the two sketches' sets, in place"""
+        if other.precision != self.precision:
+            raise ValueError("Cannot merge sketches of different precision")
+        if other.dense is None:
+            for index, rank in other.sparse.items():
+                self.set_register(index, rank)
+            return self
+        self._densify()
+        if np is not None:
+            np.maximum(
+                np.frombuffer(self.dense, dtype=np.uint8), np.frombuffer(other.dense, dtype=np.uint8),
+                out=np.frombuffer(self.dense, dtype=np.uint8)
+            )
+        else:
+            self.dense = bytearray(map(max, self.dense, other.dense))
+        return self
+
+    def estimate(self):
+        if self.dense is None:
+            zeros = self.m - len(self.sparse)
+            harmonic = zeros + sum(2.0 ** -rank for rank in self.sparse.values())
+        else:
+            # Register values are small, so counting each one is cheaper than a per-register sum
+            zeros = self.dense.count(0)
+            harmonic = sum(self.dense.count(rank) * 2.0 ** -rank for rank in range(66 - self.precision))
+        raw = 0.7213 / (1 + 1.079 / self.m) * self.m * self.m / harmonic
+        if raw <= 2.5 * self.m and zeros:
+            # Linear counting is more accurate while many registers are still empty
+            return self.m * math.log(self.m / zeros)
+        return raw
+
+    def to_bytes(self):
+        header = bytes([self.precision])
+        if self.dense is not None:
+            return DENSE_MARKER + header + bytes(self.dense)
+        return SPARSE_MARKER + header + b"".join(
+            index.to_bytes(2, "big") + bytes([rank]) for index, rank in sorted(self.sparse.items())
+        )
+
+    @classmethod
+    def from_bytes(cls, data):
+        data = bytes(data)
+        sketch = cls(precision=data[1])
+        if data[:1] == DENSE_MARKER:
+            sketch.dense = bytearray(data[2:])
+        else:
+            sketch.sparse = {
+                int.from_bytes(data[i:i + 2], "big"): data[i + 2] for i in range(2, len(data), 3)
+            }
+        return sketch
+
+def _to_date(value):
+    from rollups import _to_date as to_date
+    return to_date(value)
+
+def _month_start(value):
+    return _to_date(value).replace(day=1)
+
+def _next_month(month):
+    return date(month.year + (month.month == 12), month.month % 12 + 1, 1)
+
+def _write_sketches(grain, sketches):
+    from app import db
+    from models import CustomerSketch
+
+    db.session.bulk_insert_mappings(CustomerSketch, [
+        {"grain": grain, "period_start": period, "cohort_month": cohort, "registers": sketch.to_bytes()}
+        for (period, cohort), sketch in sketches.items()
+    ])
+
+def _rebuild_days(start, end):
+    """Sketch every (day, cohort) in start..end from the orders, returning the months touched"""
+    from app import db
+    from models import CustomerSketch
+    from db_utils import translate_sql, get_db_dialect
+
+    db.session.query(CustomerSketch).filter(
+        CustomerSketch.grain == "day", CustomerSketch.period_start >= start, CustomerSketch.period_start < end
+    ).delete(synchronize_session=False)
+
+    registers = {}
+    days = {}
+    result = db.session.execute(
+        db.text(translate_sql(SKETCH_ROWS_SQL, get_db_dialect())),
+        {"start_date": start.isoformat(), "end_date": end.isoformat()}
+    )
+    for day, cohort_month, customer_id in result:
+        key = (_to_date(day), _to_date(cohort_month))
+        sketch = days.get(key)
+        if sketch is None:
+            sketch = days[key] = HyperLogLog()
+        # Customers order on many days; hash each one once
+        register = registers.get(customer_id)
+        if register is None:
+            register = registers[customer_id] = _register(customer_id, SKETCH_PRECISION)
+        sketch.set_register(*register)
+    _write_sketches("day", days)
+    return {day.replace(day=1) for day, cohort in days}
+
+def _rebuild_months(months):
+    """Merge the day sketches of each month into its month sketches"""
+    from app import db
+    from models import CustomerSketch
+
+    for month in sorted(months):
+        db.session.query(CustomerSketch).filter(
+            CustomerSketch.grain == "month", CustomerSketch.period_start == month
+        ).delete(synchronize_session=False)
+        merged = {}
+        rows = db.session.query(CustomerSketch.cohort_month, CustomerSketch.registers).filter(
+            CustomerSketch.grain == "day",
+            CustomerSketch.period_start >= month,
+            CustomerSketch.period_start < _next_month(month)
+        )
+        for cohort_month, registers in rows:
+            sketch = HyperLogLog.from_bytes(registers)
+            if cohort_month in merged:
+                merged[cohort_month].merge(sketch)
+            else:
+                merged[cohort_month] = sketch
+        _write_sketches("month", {(month, cohort): sketch for cohort, sketch in merged.items()})
+
+def refresh_customer_sketches(days=None):
+    """Rebuild the day and month customer sketches for the given days, or for all history"""
+    from app import db
+    from models import CustomerSketch
+    from rollups import FULL_HISTORY, _day_ranges
+
+    try:
+        if days is None:
+            db.session.query(CustomerSketch).delete(synchronize_session=False)
+            ranges = [FULL_HISTORY]
+        else:
+            ranges = _day_ranges({_to_date(day) for day in days})
+        months = set()
+        for start, end in ranges:
+            months |= _rebuild_days(start, end)
+            # A day that lost its last paid order leaves no day sketch behind, but its month still changed
+            if days is not None:
+                month = start.replace(day=1)
+                while month < end:
+                    months.add(month)
+                    month = _next_month(month)
+        _rebuild_months(months)
+        db.session.commit()
+        logger.info(f"Customer sketches refreshed for {len(months)} month(s)")
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error refreshing customer sketches: {str(e)}")
+        raise
+
+def customer_cohorts(customer_ids, batch_size=500):
+    """Current cohort month of each of the given customers that has one"""
+    from app import db
+
+    customer_ids = sorted(customer_ids)
+    cohorts = {}
+    for i in range(0, len(customer_ids), batch_size):
+        rows = db.session.execute(
+            db.text("SELECT customer_id, cohort_month FROM customer_first_purchases WHERE customer_id IN :customer_ids")
+            .bindparams(db.bindparam("customer_ids", expanding=True)),
+            {"customer_ids": customer_ids[i:i + batch_size]}
+        )
+        cohorts.update((customer_id, _to_date(cohort_month)) for customer_id, cohort_month in rows)
+    return cohorts
+
+def customer_order_days(customer_ids, batch_size=500):
+    """Days with paid orders of the given customers, whose sketches a cohort change affects"""
+    from app import db
+    from db_utils import translate_sql, get_db_dialect
+
+    customer_ids = sorted(customer_ids)
+    statement = translate_sql(
+        "SELECT DISTINCT DATE(order_date) FROM orders WHERE customer_id IN :customer_ids AND payment_status = 'paid'",
+        get_db_dialect()
+    )
+    days = set()
+    for i in range(0, len(customer_ids), batch_size):
+        rows = db.session.execute(
+            db.text(statement).bindparams(db.bindparam("customer_ids", expanding=True)),
+            {"customer_ids": customer_ids[i:i + batch_size]}
+        )
+        days.update(_to_date(row[0]) for row in rows)
+    return days
+
+def sketches_available():
+    from app import db
+    from models import CustomerSketch
+
+    return db.session.query(CustomerSketch.grain).first() is not None
+
+def _sketch_counts(grain, start, end, cohort_start=None, cohort_end=None):
+    """Estimated distinct customers per (period, cohort) from the stored sketches of one grain"""
+    from app import db
+    from models import CustomerSketch
+
+    query = db.session.query(CustomerSketch.period_start, CustomerSketch.cohort_month, CustomerSketch.registers).filter(
+        CustomerSketch.grain == grain, CustomerSketch.period_start >= start, CustomerSketch.period_start < end
+    )
+    if cohort_start is not None:
+        query = query.filter(CustomerSketch.cohort_month >= cohort_start, CustomerSketch.cohort_month < cohort_end)
+    return {
+        (_to_date(period), _to_date(cohort)): HyperLogLog.from_bytes(registers).estimate()
+        for period, cohort, registers in query
+    }
+
+def _sampled_counts(start, end, cohort_start=None, cohort_end=None):
+    """Distinct customers per (month, cohort) among a hash-selected share of customers, scaled up.
+
+    Returns the counts and the relative error bound of the smallest non-empty sampled cell.
+    """
+    from app import db
+    from query_registry import query_registry
+
+    buckets = max(1, min(SAMPLE_BUCKETS, round(SAMPLE_BUCKETS * SAMPLE_PERCENT / 100)))
+    fraction = buckets / SAMPLE_BUCKETS
+    params = {
+        "start_date": start.isoformat(),
+        "end_date": end.isoformat(),
+        "cohort_start": (cohort_start or date(1900, 1, 1)).isoformat(),
+        "cohort_end": (cohort_end or date(9999, 12, 31)).isoformat(),
+        "sample_buckets": buckets,
+    }
+    rows = db.session.execute(query_registry.statement("approx/sampled_customers", params), params)
+    counts = {}
+    smallest = None
+    for month, cohort_month, customers in rows:
+        counts[(_month_start(month), _to_date(cohort_month))] = customers / fraction
+        smallest = customers if smallest is None else min(smallest, customers)
+    # Nothing sampled says nothing about the population: the bound is the whole estimate
+    error = math.sqrt((1 - fraction) / smallest) if smallest else 0.5
+    return counts, {"method": "sample", "sample_rate": round(fraction, 4), "error": error}
+
+def monthly_cohort_customers(start_month, end_month, cohort_start=None, cohort_end=None, method=None):
+    """Estimated paid customers per (activity month, cohort month) for months start_month..end_month.
+
+    Cohorts partition customers, so a month's distinct customers is the sum over its cohorts.
+    Uses the loader's sketches, or customer-hash sampling when there are none or method="sample".
+    Returns the counts and a description of the estimate with its relative error bound.
+    """
+    end = _next_month(_month_start(end_month))
+    start = _month_start(start_month)
+    if method != "sample" and sketches_available():
+        counts = _sketch_counts("month", start, end, cohort_start, cohort_end)
+        estimate = _hll_estimate()
+    else:
+        counts, estimate = _sampled_counts(start, end, cohort_start, cohort_end)
+    return counts, describe_estimate(estimate)
+
+def _hll_estimate():
+    return {"method": "hll", "precision": SKETCH_PRECISION, "error": HyperLogLog().error}
+
+def _months_between(start, end):
+    return (end.year - start.year) * 12 + end.month - start.month
+
+def _add_months(month, count):
+    total = month.year * 12 + month.month - 1 + count
+    return date(total // 12, total % 12 + 1, 1)
+
+def approximate_kpi(target_date, next_date):
+    """The daily KPI snapshot with unique customers (and so repeat rate) estimated from day sketches.
+
+    Without stored sketches the exact snapshot is returned; a single day needs no sampling.
+    """
+    from db_utils import execute_query, execute_named_query
+    from query_registry import query_registry
+
+    params = {"target_date": target_date, "next_date": next_date}
+    if not sketches_available():
+        rows = execute_named_query("kpi", params)
+        return (rows[0] if rows else None), describe_estimate({"method": "exact", "error": 0.0})
+
+    rows = execute_query(query_registry.statement("approx/kpi", params), params, read_only=True, name="approx/kpi")
+    if not rows:
+        return None, describe_estimate(_hll_estimate())
+    snapshot = dict(rows[0])
+    day = _to_date(target_date)
+    estimate = sum(_sketch_counts("day", day, day + timedelta(days=1)).values())
+    # Every new customer ordered that day, so fewer unique customers than that is only sketch error
+    unique_customers = max(int(round(estimate)), snapshot["new_customers"]) if snapshot["orders"] else 0
+    snapshot["unique_customers"] = unique_customers
+    snapshot["repeat_rate"] = (
+        round((unique_customers - snapshot["new_customers"]) * 100.0 / unique_customers, 2) if unique_customers else 0
+    )
+    return snapshot, describe_estimate(_hll_estimate())
+
+def approximate_repeat_rate(start_month, end_month, method=None):
+    """Monthly total and repeat customers, as repeat_rate.sql returns them, from estimated counts"""
+    counts, estimate = monthly_cohort_customers(start_month, end_month, method=method)
+    totals = {}
+    repeats = {}
+    for (month, cohort_month), customers in counts.items():
+        totals[month] = totals.get(month, 0.0) + customers
+        if cohort_month < month:
+            repeats[month] = repeats.get(month, 0.0) + customers
+    rows = []
+    for month in sorted(totals):
+        total_customers = int(round(totals[month]))
+        repeat_customers = min(int(round(repeats.get(month, 0.0))), total_customers)
+        rows.append({
+            "month": month.isoformat(),
+            "total_customers": total_customers,
+            "repeat_customers": repeat_customers,
+            "repeat_rate": round(repeat_customers * 100.0 / total_customers, 2) if total_customers else 0,
+        })
+    return rows, estimate
+
+def approximate_cohort_retention(start_month, end_month, horizon, method=None):
+    """Cohort retention rows, as cohort_retention.sql returns them, with estimated active customers.
+
+    Cohort sizes are exact: customer_first_purchases holds one row per customer.
+    """
+    from app import db
+
+    first_cohort = _month_start(start_month)
+    end_cohort = _next_month(_month_start(end_month))
+    sizes = {
+        _to_date(cohort_month): cohort_size
+        for cohort_month, cohort_size in db.session.execute(db.text(
+            "SELECT cohort_month, COUNT(*) FROM customer_first_purchases "
+            "WHERE cohort_month >= :start_date AND cohort_month < :end_date GROUP BY cohort_month"
+        ), {"start_date": first_cohort.isoformat(), "end_date": end_cohort.isoformat()})
+    }
+    counts, estimate = monthly_cohort_customers(
+        first_cohort, _add_months(end_cohort, max(horizon, 0)), first_cohort, end_cohort, method=method
+    )
+    rows = []
+    for (month, cohort_month), customers in sorted(counts.items(), key=lambda item: (item[0][1], item[0][0])):
+        months_since = _months_between(cohort_month, month)
+        cohort_size = sizes.get(cohort_month)
+        if not cohort_size or months_since < 0 or months_since > horizon:
+            continue
+        active_customers = min(int(round(customers)), cohort_size)
+        if not active_customers:
+            continue
+        rows.append({
+            "cohort_month": cohort_month.isoformat(),
+            "months_since": months_since,
+            "active_customers": active_customers,
+            "cohort_size": cohort_size,
+            "retention_rate": round(active_customers * 100.0 / cohort_size, 2),
+        })
+    return rows, estimate
+
+def describe_estimate(estimate):
+    """Response metadata for an estimate: method, error bound (relative) and its confidence"""
+    described = {key: value for key, value in estimate.items() if key != "error"}
+    described["error_bound"] = round(CONFIDENCE_Z * estimate["error"], 4)
+    described["confidence"] = CONFIDENCE
+    return described
+
+if __name__ == "__main__":
+    from app import app
+
+    with app.app_context():
+        refresh_customer_sketches()
@@ -0,0 +1,301 @@
+import re
+from collections import namedtuple
+
+# Queries are written for PostgreSQL. Translation tokenizes them and nests parenthesized groups,
+# so rewrites see whole call arguments and cast operands, and never touch strings or comments.
+
+Token = namedtuple("Token", ["kind", "text"])
+
+TOKEN_PATTERN = re.compile(r"""
+    (?P<space>\s+)
+  | (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<string>'(?:[^']|'')*')
+  | (?P<quoted>"(?:[^"]|"")*")
+  | (?P<cast>::)
+  | (?P<param>:[A-Za-z_]\w*)
+  | (?P<number>\d+(?:\.\d*)?|\.\d+)
+  | (?P<word>[A-Za-z_]\w*)
+  | (?P<open>\()
+  | (?P<close>\))
+  | (?P<symbol><=|>=|<>|!=|\|\||[-+*/%<>=&|~^,.;])
+""", re.VERBOSE | re.DOTALL)
+
+# Words that can precede a parenthesized group without making it a function call
+KEYWORDS = {
+    "and", "or", "not", "in", "exists", "select", "from", "where", "join", "on", "as", "by",
+    "having", "when", "then", "else", "case", "between", "is", "over", "values", "with", "using",
+}
+
+SQLITE_DATE_PARTS = {"year": "%Y", "month": "%m", "day": "%d"}
+
+SQLITE_TRUNC_FORMATS = {"month": "%Y-%m-01", "day": "%Y-%m-%d"}
+
+# Reads of orders and order_items on SQLite go through views that include the yearly archives
+SQLITE_ARCHIVED_TABLES = {"orders", "order_items"}
+
+# Calls that must not survive translation, by target dialect
+UNTRANSLATED_CALLS = {
+    "sqlite": {"date_trunc", "extract"},
+    "postgresql": {"strftime", "julianday"},
+    "duckdb": {"strftime", "julianday"},
+}
+
+DIALECTS = ("postgresql", "sqlite", "duckdb")
+
+class QueryTranslationError(Exception):
+    """Raised when a query uses constructs that cannot be translated to the active dialect"""
+
+class Group(list):
+    """The nodes between a pair of parentheses"""
+
+def parse(sql):
+    """Tokenize SQL into a list of tokens and nested groups"""
+    stack = [[]]
+    pos = 0
+    while pos < len(sql):
+        match = TOKEN_PATTERN.match(sql, pos)
+        if not match:
+            raise QueryTranslationError(f"Cannot tokenize SQL at position {pos}: {sql[pos:pos + 20]!r}")
+        kind = match.lastgroup
+        if kind == "open":
+            stack.append(Group())
+        elif kind == "close":
+            if len(stack) == 1:
+                raise QueryTranslationError(f"Unbalanced parentheses at position {pos}")
+            group = stack.pop()
+            stack[-1].append(group)
+        else:
+            stack[-1].append(Token(kind, match.group()))
+        pos = match.end()
+    if len(stack) != 1:
+        raise QueryTranslationError("Unbalanced parentheses at end of query")
+    return stack[0]
+
+def render(nodes):
+    """Turn parsed nodes back into SQL text"""
+    return "".join("(" + render(node) + ")" if isinstance(node, Group) else node.text for node in nodes)
+
+def _is_word(node, *words):
+    return isinstance(node, Token) and node.kind == "word" and (not words or node.text.lower() in words)
+
+def _is_symbol(node, symbol):
+    return isinstance(node, Token) and node.kind == "symbol" and node.text == symbol
+
+def _is_string(node):
+    return isinstance(node, Token) and node.kind == "string"
+
+def _significant(node):
+    return isinstance(node, Group) or node.kind not in ("space", "comment")
+
+def _next(nodes, i):
+    """Index of the first significant node after i, or None"""
+    for j in range(i + 1, len(nodes)):
+        if _significant(nodes[j]):
+            return j
+    return None
+
+def _previous(nodes, i):
+    """Index of the last significant node before i, or None"""
+    for j in range(i - 1, -1, -1):
+        if _significant(nodes[j]):
+            return j
+    return None
+
+def _strip(nodes):
+    """Nodes without leading and trailing whitespace and comments"""
+    kept = [i for i, node in enumerate(nodes) if _significant(node)]
+    return list(nodes[kept[0]:kept[-1] + 1]) if kept else []
+
+def _split(nodes, is_separator):
+    """Split nodes at top-level separators; groups are never split"""
+    parts = [[]]
+    for node in nodes:
+        if is_separator(node):
+            parts.append([])
+        else:
+            parts[-1].append(node)
+    return [_strip(part) for part in parts]
+
+def _call(name, *args):
+    """Nodes of the call name(arg, ...)"""
+    inner = Group()
+    for i, arg in enumerate(args):
+        if i:
+            inner.extend([Token("symbol", ","), Token("space", " ")])
+        inner.extend(arg)
+    return [Token("word", name), inner]
+
+def _cast(expr, type_nodes):
+    """Nodes of CAST(expr AS type)"""
+    return _call("CAST", expr + [Token("space", " "), Token("word", "AS"), Token("space", " ")] + type_nodes)
+
+def _literal(text):
+    return [Token("string", "'" + text.replace("'", "''") + "'")]
+
+def _operand_start(nodes, end):
+    """Index where the operand ending at nodes[end] starts: a call, a qualified name or a single node"""
+    start = end
+    if isinstance(nodes[end], Group):
+        previous = _previous(nodes, end)
+        if previous is not None and _is_word(nodes[previous]) and nodes[previous].text.lower() not in KEYWORDS:
+            start = previous
+    # Qualifiers of a column or function name, e.g. o.order_date
+    while start >= 2 and _is_symbol(nodes[start - 1], ".") and _is_word(nodes[start - 2]):
+        start -= 2
+    return start
+
+def _normalize_casts(nodes):
+    """Rewrite every expr::type into CAST(expr AS type)"""
+    out = []
+    i = 0
+    while i < len(nodes):
+        node = nodes[i]
+        if isinstance(node, Token) and node.kind == "cast":
+            while out and not _significant(out[-1]):
+                out.pop()
+            if not out:
+                raise QueryTranslationError("Cast without an operand")
+            start = _operand_start(out, len(out) - 1)
+            operand = out[start:]
+            del out[start:]
+            type_index = _next(nodes, i)
+            if type_index is None or not _is_word(nodes[type_index]):
+                raise QueryTranslationError("Cast without a type")
+            type_nodes = [nodes[type_index]]
+            i = type_index + 1
+            if i < len(nodes) and isinstance(nodes[i], Group):
+                # Type modifiers, e.g. numeric(10, 2)
+                type_nodes.append(nodes[i])
+                i += 1
+            out.extend(_cast(operand, type_nodes))
+            continue
+        out.append(node)
+        i += 1
+    return out
+
+def _sqlite_cast(args):
+    parts = _split(args, lambda node: _is_word(node, "as"))
+    if len(parts) != 2 or len(parts[1]) != 1 or not _is_word(parts[1][0], "date", "timestamp"):
+        return None
+    return _call("DATE" if parts[1][0].text.lower() == "date" else "DATETIME", parts[0])
+
+def _sqlite_date_trunc(args):
+    parts = _split(args, lambda node: _is_symbol(node, ","))
+    if len(parts) != 2 or len(parts[0]) != 1 or not _is_string(parts[0][0]):
+        return None
+    period = parts[0][0].text.strip("'").lower()
+    if period not in SQLITE_TRUNC_FORMATS:
+        return None
+    return _call("strftime", _literal(SQLITE_TRUNC_FORMATS[period]), parts[1])
+
+def _sqlite_extract(args):
+    parts = _split(args, lambda node: _is_word(node, "from"))
+    if len(parts) != 2 or len(parts[0]) != 1 or not _is_word(parts[0][0]):
+        return None
+    part, expr = parts[0][0].text.lower(), parts[1]
+    if part in SQLITE_DATE_PARTS:
+        return _cast(_call("strftime", _literal(SQLITE_DATE_PARTS[part]), expr), [Token("word", "INTEGER")])
+    if part == "epoch":
+        if len(expr) == 1 and isinstance(expr[0], Group):
+            # Epoch of a timestamp difference: subtract the two epochs instead
+            terms = _split(expr[0], lambda node: _is_symbol(node, "-"))
+            if len(terms) == 2:
+                return [Group(
+                    _call("strftime", _literal("%s"), terms[0])
+                    + [Token("space", " "), Token("symbol", "-"), Token("space", " ")]
+                    + _call("strftime", _literal("%s"), terms[1])
+                )]
+        return _cast(_call("strftime", _literal("%s"), expr), [Token("word", "INTEGER")])
+    return None
+
+def _duckdb_hashtext(args):
+    # Any stable hash serves the customer-hash sampling; DuckDB's hash() is a 64-bit one
+    return _call("hash", _strip(args))
+
+CALL_REWRITES = {
+    "sqlite": {"cast": _sqlite_cast, "date_trunc": _sqlite_date_trunc, "extract": _sqlite_extract},
+    "postgresql": {},
+    "duckdb": {"hashtext": _duckdb_hashtext},
+}
+
+def _rewrite(nodes, dialect):
+    """Translate one level of nodes, innermost groups first"""
+    nodes = [Group(_rewrite(node, dialect)) if isinstance(node, Group) else node for node in nodes]
+    if dialect == "sqlite":
+        nodes = _normalize_casts(nodes)
+
+    rewrites = CALL_REWRITES[dialect]
+    out = []
+    i = 0
+    while i < len(nodes):
+        node = nodes[i]
+        following = _next(nodes, i)
+        if _is_word(node) and following is not None:
+            name = node.text.lower()
+            if name in rewrites and isinstance(nodes[following], Group):
+                replacement = rewrites[name](nodes[following])
+                if replacement is not None:
+                    out.extend(replacement)
+                    i = following + 1
+                    continue
+            if dialect == "sqlite" and name == "interval" and _is_string(nodes[following]):
+                # INTERVAL '7 days' becomes the date() modifier '+7 days'
+                match = re.match(r"^'(\d+) (\w+)'$", nodes[following].text)
+                if match:
+                    out.extend(_literal(f"+{match.group(1)} {match.group(2)}"))
+                    i = following + 1
+                    continue
+            if dialect == "sqlite" and name in ("from", "join") and _is_word(nodes[following], *SQLITE_ARCHIVED_TABLES):
+                previous = _previous(nodes, i)
+                if not (name == "from" and previous is not None and _is_word(nodes[previous], "delete")):
+                    out.extend(nodes[i:following])
+                    out.append(Token("word", nodes[following].text + "_all"))
+                    i = following + 1
+                    continue
+        out.append(node)
+        i += 1
+    return out
+
+def _check(nodes, dialect):
+    """Raise on constructs the target dialect cannot run"""
+    for i, node in enumerate(nodes):
+        if isinstance(node, Group):
+            _check(node, dialect)
+            continue
+        following = _next(nodes, i)
+        if following is None:
+            continue
+        if _is_word(node, *UNTRANSLATED_CALLS[dialect]) and isinstance(nodes[following], Group):
+            raise QueryTranslationError(f"Cannot translate '{node.text}(' for {dialect}")
+        if dialect == "sqlite":
+            if node.kind == "cast":
+                raise QueryTranslationError(f"Cannot translate '::' for {dialect}")
+            if _is_word(node, "interval") and _is_string(nodes[following]):
+                raise QueryTranslationError(f"Cannot translate 'INTERVAL {nodes[following].text}' for {dialect}")
+            if _is_word(node, "cast") and isinstance(nodes[following], Group) and _sqlite_cast(nodes[following]):
+                raise QueryTranslationError(f"Cannot translate '{render([node, nodes[following]])}' for {dialect}")
+
+def translate_sql(query, dialect):
+    """Translate a query written for PostgreSQL into the given dialect"""
+    if dialect not in DIALECTS:
+        raise QueryTranslationError(f"Unknown dialect {dialect}")
+    nodes = parse(query)
+    if dialect != "postgresql":
+        nodes = _rewrite(nodes, dialect)
+    _check(nodes, dialect)
+    return render(nodes)
+
+def referenced_tables(query):
+    """Lower-cased names read after FROM or JOIN anywhere in a query, CTE names included"""
+    tables = set()
+
+    def visit(nodes):
+        for i, node in enumerate(nodes):
+            if isinstance(node, Group):
+                visit(node)
+                continue
+            following = _next(nodes, i)
+            if _is_word(node, "from", "join") and following is not None and _is_word(nodes[following]):
+                tables.add(nodes[following].text.lower())
+    visit(parse(query))
+    return tables
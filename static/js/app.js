@@ -8,6 +8,9 @@ document.addEventListener('DOMContentLoaded', function() {
 
     // Bind event listeners
     bindEventListeners();
+
+    // Fill every panel with one batched request
+    loadDashboard();
 });
 
 function bindEventListeners() {
@@ -25,6 +28,9 @@ function bindEventListeners() {
     
     // CSV download
     document.getElementById('downloadRFM').addEventListener('click', downloadRFMAsCSV);
+    
+    // Background data load
+    document.getElementById('loadDataForm').addEventListener('submit', startDataLoad);
 }
 
 // Utility functions
@@ -65,10 +71,120 @@ function formatCurrency(amount) {
     }).format(amount);
 }
 
+// Rows from a format=columnar response ({columns: [...], data: [[...], ...]}) as objects
+function fromColumnar(payload) {
+    return payload.data.map(values => {
+        const row = {};
+        payload.columns.forEach((column, i) => { row[column] = values[i]; });
+        return row;
+    });
+}
+
 function formatNumber(num) {
     return new Intl.NumberFormat('en-US').format(num);
 }
 
+// Initial dashboard load: all panel queries in one round trip, run concurrently on the server
+async function loadDashboard() {
+    const value = id => document.getElementById(id).value;
+    const panels = [
+        { name: 'kpi', target: 'kpiResults', params: { date: value('kpiDate') }, render: renderKPI },
+        { name: 'revenue_by_month_category', target: 'revenueResults', params: { start: value('revenueStart'), end: value('revenueEnd'), format: 'columnar' }, render: data => renderRevenueTable(fromColumnar(data)) },
+        { name: 'repeat_rate', target: 'repeatResults', params: { start: value('repeatStart'), end: value('repeatEnd'), format: 'columnar' }, render: data => renderRepeatRateTable(fromColumnar(data)) },
+        { name: 'cohort_retention', target: 'cohortResults', params: { start: value('cohortStart'), end: value('cohortEnd'), horizon: value('cohortHorizon'), format: 'columnar' }, render: data => renderCohortTable(fromColumnar(data)) },
+        { name: 'rfm', target: 'rfmResults', params: { as_of: value('rfmDate'), page_size: RFM_PAGE_SIZE, format: 'columnar' }, render: data => {
+            rfmAsOfDate = value('rfmDate');
+            renderRFMTable(fromColumnar(data), data.next_cursor !== null);
+            document.getElementById('downloadRFM').disabled = false;
+        } },
+        { name: 'top_products', target: 'productsResults', params: { metric: value('productsMetric'), n: value('productsN'), start: value('productsStart'), end: value('productsEnd'), format: 'columnar' }, render: data => renderTopProductsTable(fromColumnar(data)) },
+        { name: 'low_stock', target: 'inventoryResults', params: { n: value('inventoryN'), format: 'columnar' }, render: data => renderLowStockTable(fromColumnar(data)) },
+        { name: 'order_funnel', target: 'funnelResults', params: { start: value('funnelStart'), end: value('funnelEnd'), format: 'columnar' }, render: data => renderOrderFunnelTable(fromColumnar(data)) }
+    ];
+
+    panels.forEach(panel => showLoading(panel.target));
+
+    try {
+        const response = await fetch('/analytics/batch', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ queries: panels.map(panel => ({ name: panel.name, params: panel.params })) })
+        });
+        const data = await response.json();
+
+        if (!response.ok) {
+            panels.forEach(panel => showError(panel.target, data.error || 'Failed to load dashboard data.'));
+            return;
+        }
+
+        panels.forEach(panel => {
+            const result = data.results[panel.name];
+            if (result.status === 200) {
+                panel.render(result.data);
+            } else {
+                showError(panel.target, (result.data && result.data.error) || 'Failed to load data.');
+            }
+        });
+    } catch (error) {
+        panels.forEach(panel => showError(panel.target, 'Network error occurred.'));
+    }
+}
+
+// Background data load: start a job, show its progress, and refresh the panels once it commits
+const LOAD_POLL_MS = 1000;
+
+async function startDataLoad(event) {
+    event.preventDefault();
+    const status = document.getElementById('loadStatus');
+    try {
+        const response = await fetch('/load-jobs', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ mode: 'rows' })
+        });
+        const data = await response.json();
+        const job = response.status === 409 ? data.job : data;
+        if (!job) {
+            status.textContent = data.error || 'Data load failed to start.';
+            return;
+        }
+        document.getElementById('loadDataButton').disabled = true;
+        pollDataLoad(job.id);
+    } catch (error) {
+        status.textContent = 'Network error occurred.';
+    }
+}
+
+async function pollDataLoad(jobId) {
+    const status = document.getElementById('loadStatus');
+    let job;
+    try {
+        job = await (await fetch(`/load-jobs/${jobId}`)).json();
+    } catch (error) {
+        setTimeout(() => pollDataLoad(jobId), LOAD_POLL_MS);
+        return;
+    }
+
+    if (['queued', 'running', 'canceling'].includes(job.status)) {
+        const current = job.tables.length ? job.tables[job.tables.length - 1] : null;
+        status.textContent = current
+            ? `Loading ${current.table}: ${formatNumber(current.rows_done)}` +
+              (current.rows_total ? ` / ${formatNumber(current.rows_total)}` : '') +
+              ` rows (${formatNumber(Math.round(current.rows_per_sec))}/s)`
+            : 'Load queued...';
+        setTimeout(() => pollDataLoad(jobId), LOAD_POLL_MS);
+        return;
+    }
+
+    document.getElementById('loadDataButton').disabled = false;
+    if (job.status === 'succeeded') {
+        status.textContent = 'Data loaded.';
+        loadDashboard();
+    } else {
+        status.textContent = job.error ? `Data load ${job.status}: ${job.error}` : `Data load ${job.status}.`;
+    }
+}
+
 // KPI Dashboard
 async function loadKPI() {
     const date = document.getElementById('kpiDate').value;
@@ -161,11 +277,11 @@ async function loadRevenue() {
     showLoading('revenueResults');
 
     try {
-        const response = await fetch(`/analytics/revenue-by-month-category?start=${start}&end=${end}`);
+        const response = await fetch(`/analytics/revenue-by-month-category?start=${start}&end=${end}&format=columnar`);
         const data = await response.json();
 
         if (response.ok) {
-            renderRevenueTable(data);
+            renderRevenueTable(fromColumnar(data));
         } else {
             showError('revenueResults', data.error || 'Failed to load revenue data.');
         }
@@ -226,11 +342,11 @@ async function loadRepeatRate() {
     showLoading('repeatResults');
 
     try {
-        const response = await fetch(`/analytics/repeat-rate?start=${start}&end=${end}`);
+        const response = await fetch(`/analytics/repeat-rate?start=${start}&end=${end}&format=columnar`);
         const data = await response.json();
 
         if (response.ok) {
-            renderRepeatRateTable(data);
+            renderRepeatRateTable(fromColumnar(data));
         } else {
             showError('repeatResults', data.error || 'Failed to load repeat rate data.');
         }
@@ -294,11 +410,11 @@ async function loadCohortRetention() {
     showLoading('cohortResults');
 
     try {
-        const response = await fetch(`/analytics/cohort-retention?start=${start}&end=${end}&horizon=${horizon}`);
+        const response = await fetch(`/analytics/cohort-retention?start=${start}&end=${end}&horizon=${horizon}&format=columnar`);
         const data = await response.json();
 
         if (response.ok) {
-            renderCohortTable(data);
+            renderCohortTable(fromColumnar(data));
         } else {
             showError('cohortResults', data.error || 'Failed to load cohort data.');
         }
@@ -375,7 +491,8 @@ function renderCohortTable(data) {
 }
 
 // RFM Analysis
-let rfmData = [];
+const RFM_PAGE_SIZE = 100;
+let rfmAsOfDate = null;
 
 async function loadRFM() {
     const asOfDate = document.getElementById('rfmDate').value;
@@ -388,12 +505,13 @@ async function loadRFM() {
     showLoading('rfmResults');
 
     try {
-        const response = await fetch(`/analytics/rfm?as_of=${asOfDate}`);
+        // Only the first keyset page is rendered; the CSV download streams every row
+        const response = await fetch(`/analytics/rfm?as_of=${asOfDate}&page_size=${RFM_PAGE_SIZE}&format=columnar`);
         const data = await response.json();
 
         if (response.ok) {
-            rfmData = data;
-            renderRFMTable(data);
+            rfmAsOfDate = asOfDate;
+            renderRFMTable(fromColumnar(data), data.next_cursor !== null);
             document.getElementById('downloadRFM').disabled = false;
         } else {
             showError('rfmResults', data.error || 'Failed to load RFM data.');
@@ -403,7 +521,7 @@ async function loadRFM() {
     }
 }
 
-function renderRFMTable(data) {
+function renderRFMTable(data, hasMore) {
     if (!data || data.length === 0) {
         showNoData('rfmResults');
         return;
@@ -428,7 +546,7 @@ function renderRFMTable(data) {
                 <tbody>
     `;
 
-    data.slice(0, 100).forEach(row => { // Limit to first 100 for performance
+    data.forEach(row => {
         const segmentClass = getSegmentClass(row.segment);
         tableHtml += `
             <tr>
@@ -451,8 +569,8 @@ function renderRFMTable(data) {
         </div>
     `;
 
-    if (data.length > 100) {
-        tableHtml += `<p class="text-muted">Showing first 100 customers. Use download CSV for full data.</p>`;
+    if (hasMore) {
+        tableHtml += `<p class="text-muted">Showing first ${RFM_PAGE_SIZE} customers. Use download CSV for full data.</p>`;
     }
 
     document.getElementById('rfmResults').innerHTML = tableHtml;
@@ -470,36 +588,16 @@ function getSegmentClass(segment) {
 }
 
 function downloadRFMAsCSV() {
-    if (!rfmData || rfmData.length === 0) {
+    if (!rfmAsOfDate) {
         alert('No RFM data to download. Please run the analysis first.');
         return;
     }
 
-    const csv = convertToCSV(rfmData);
-    const blob = new Blob([csv], { type: 'text/csv' });
-    const url = window.URL.createObjectURL(blob);
+    // The server streams the CSV, so the full customer set never sits in browser memory
     const a = document.createElement('a');
-    a.href = url;
+    a.href = `/analytics/rfm?as_of=${rfmAsOfDate}&format=csv`;
     a.download = `rfm_analysis_${new Date().toISOString().split('T')[0]}.csv`;
     a.click();
-    window.URL.revokeObjectURL(url);
-}
-
-function convertToCSV(data) {
-    if (!data || data.length === 0) return '';
-
-    const headers = Object.keys(data[0]);
-    const csvContent = [
-        headers.join(','),
-        ...data.map(row => 
-            headers.map(header => {
-                const value = row[header];
-                return typeof value === 'string' ? `"${value}"` : value;
-            }).join(',')
-        )
-    ].join('\n');
-
-    return csvContent;
 }
 
 // Top Products Analysis
@@ -517,11 +615,11 @@ async function loadTopProducts() {
     showLoading('productsResults');
 
     try {
-        const response = await fetch(`/analytics/top-products?metric=${metric}&n=${n}&start=${start}&end=${end}`);
+        const response = await fetch(`/analytics/top-products?metric=${metric}&n=${n}&start=${start}&end=${end}&format=columnar`);
         const data = await response.json();
 
         if (response.ok) {
-            renderTopProductsTable(data);
+            renderTopProductsTable(fromColumnar(data));
         } else {
             showError('productsResults', data.error || 'Failed to load products data.');
         }
@@ -583,11 +681,11 @@ async function loadLowStock() {
     showLoading('inventoryResults');
 
     try {
-        const response = await fetch(`/analytics/low-stock?n=${n}`);
+        const response = await fetch(`/analytics/low-stock?n=${n}&format=columnar`);
         const data = await response.json();
 
         if (response.ok) {
-            renderLowStockTable(data);
+            renderLowStockTable(fromColumnar(data));
         } else {
             showError('inventoryResults', data.error || 'Failed to load inventory data.');
         }
@@ -613,6 +711,8 @@ function renderLowStockTable(data) {
                         <th>On Hand</th>
                         <th>Reorder Point</th>
                         <th>Recommended Order</th>
+                        <th>Sold / Day</th>
+                        <th>Days of Cover</th>
                         <th>Urgency</th>
                     </tr>
                 </thead>
@@ -629,6 +729,8 @@ function renderLowStockTable(data) {
                 <td>${formatNumber(row.on_hand_qty)}</td>
                 <td>${formatNumber(row.reorder_point)}</td>
                 <td>${formatNumber(row.recommended_order_qty)}</td>
+                <td>${formatNumber(row.daily_sales_rate)}</td>
+                <td>${row.days_of_cover === null ? '-' : formatNumber(row.days_of_cover)}</td>
                 <td><span class="${urgencyClass}">${row.urgency}</span></td>
             </tr>
         `;
@@ -665,11 +767,11 @@ async function loadOrderFunnel() {
     showLoading('funnelResults');
 
     try {
-        const response = await fetch(`/analytics/order-funnel?start=${start}&end=${end}`);
+        const response = await fetch(`/analytics/order-funnel?start=${start}&end=${end}&format=columnar`);
         const data = await response.json();
 
         if (response.ok) {
-            renderOrderFunnelTable(data);
+            renderOrderFunnelTable(fromColumnar(data));
         } else {
             showError('funnelResults', data.error || 'Failed to load funnel data.');
         }
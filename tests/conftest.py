@@ -0,0 +1,33 @@
+import os
+import shutil
+import tempfile
+
+import pytest
+
+# The app binds its database when it is imported, so the test database is chosen before any test imports it
+WORK_DIR = tempfile.mkdtemp(prefix="analytics-tests-")
+os.environ["DATABASE_URL"] = "sqlite:///" + os.path.join(WORK_DIR, "analytics.db")
+os.environ.setdefault("LOG_LEVEL", "WARNING")
+for name in ("DATABASE_READ_URL", "ANALYTICS_MIRROR_PATH", "ANALYTICS_ENGINE"):
+    os.environ.pop(name, None)
+
+# Small enough to load in about a second, large enough for every month of both years to have orders
+CUSTOMERS = 300
+PRODUCTS = 60
+SEED = 7
+
+@pytest.fixture(scope="session")
+def app():
+    from app import app
+
+    yield app
+    shutil.rmtree(WORK_DIR, ignore_errors=True)
+
+@pytest.fixture(scope="session")
+def source_dir():
+    """Generated CSV files of the full dataset"""
+    from generate_data import DataGenerator
+
+    path = os.path.join(WORK_DIR, "source")
+    DataGenerator(customers=CUSTOMERS, products=PRODUCTS, seed=SEED).generate(path)
+    return path
@@ -0,0 +1,89 @@
+import pytest
+
+from test_incremental_load import (
+    ANALYTICS_PATHS, reset_database, load, analytics_responses, write_initial_files, copy_order_files
+)
+
+duckdb = pytest.importorskip("duckdb")
+pytest.importorskip("duckdb_engine")
+
+def mirror_contents(path):
+    from analytics_mirror import MIRRORED_TABLES
+
+    connection = duckdb.connect(path, read_only=True)
+    try:
+        return {
+            table: sorted(connection.execute(f"SELECT * FROM {table}").fetchall(), key=repr)
+            for table in MIRRORED_TABLES
+        }
+    finally:
+        connection.close()
+
+@pytest.fixture
+def mirror_refreshes(monkeypatch, tmp_path):
+    """Point loads at a mirror file and record the result of every refresh"""
+    import analytics_mirror
+
+    refreshes = []
+    refresh = analytics_mirror.refresh_analytics_mirror
+
+    def recorded(path=None, changes=None):
+        refreshes.append(refresh(path, changes))
+        return refreshes[-1]
+
+    monkeypatch.setattr(analytics_mirror, "MIRROR_PATH", str(tmp_path / "mirror.duckdb"))
+    monkeypatch.setattr(analytics_mirror, "refresh_analytics_mirror", recorded)
+    return refreshes
+
+def test_incremental_load_refreshes_only_what_changed(app, source_dir, tmp_path, mirror_refreshes):
+    from analytics_mirror import MIRROR_PATH, refresh_analytics_mirror
+
+    data_dir = str(tmp_path / "data")
+    write_initial_files(source_dir, data_dir)
+    with app.app_context():
+        reset_database()
+        load(data_dir, bulk=True)
+        copy_order_files(source_dir, data_dir)
+        load(data_dir, bulk=True, incremental=True)
+
+        initial, incremental = mirror_refreshes
+        assert not initial["incremental"]
+        assert incremental["incremental"]
+        # Catalog tables the incremental load did not read are kept from the previous mirror
+        assert "products" not in incremental["rows"] and "customers" not in incremental["rows"]
+        assert incremental["rows"]["orders"] < initial["rows"]["orders"]
+
+        full_path = str(tmp_path / "full.duckdb")
+        assert not refresh_analytics_mirror(full_path)["incremental"]
+        assert mirror_contents(MIRROR_PATH) == mirror_contents(full_path)
+
+def test_mirror_serves_what_the_primary_serves_while_it_is_current(app, source_dir, monkeypatch, mirror_refreshes):
+    from app import db
+    from analytics_mirror import MIRROR_PATH, AnalyticsMirror
+    from query_cache import query_cache
+
+    with app.app_context():
+        reset_database()
+        load(source_dir, bulk=True)
+        expected = analytics_responses(app)
+
+        mirror = AnalyticsMirror(MIRROR_PATH)
+        mirror.configure()
+        monkeypatch.setitem(app.extensions, "analytics_mirror", mirror)
+        assert {"kpi", "top_products", "low_stock_alerts", "approx/kpi"} <= mirror.queries
+        assert mirror.serves("kpi")
+
+        query_cache.invalidate()
+        mirrored = analytics_responses(app)
+        for path in ANALYTICS_PATHS:
+            if "approx=sample" in path:
+                # DuckDB hashes customer ids with another function than SQLite, so it samples others
+                continue
+            assert mirrored[path] == expected[path], f"{path} differs"
+
+        # A load the mirror has not caught up with sends every query back to the primary
+        db.session.execute(db.text("UPDATE data_version SET version = version + 1 WHERE id = 1"))
+        db.session.commit()
+        query_cache.invalidate()
+        assert not mirror.serves("kpi")
+        assert analytics_responses(app) == expected
@@ -0,0 +1,30 @@
+from test_incremental_load import reset_database, load
+
+# KPI fields approx=true computes exactly, with the same SQL as the exact snapshot
+EXACT_KPI_FIELDS = ("date", "orders", "revenue", "aov", "new_customers", "top_category", "top_product")
+
+def test_approximate_kpi_matches_the_exact_kpi_on_ties(app, source_dir):
+    from app import db
+    from query_cache import query_cache
+
+    client = app.test_client()
+    with app.app_context():
+        reset_database()
+        load(source_dir)
+        day = "2024-06-05"
+        # Every category and product sold that day ties, so the top ones are decided by name alone
+        db.session.execute(db.text("UPDATE daily_category_sales SET revenue = 100 WHERE sale_date = :day"), {"day": day})
+        db.session.execute(db.text("UPDATE daily_product_sales SET units = 3 WHERE sale_date = :day"), {"day": day})
+        db.session.commit()
+        query_cache.invalidate()
+
+        exact = client.get(f"/analytics/kpi?date={day}").get_json()
+        approximate = client.get(f"/analytics/kpi?date={day}&approx=true").get_json()
+        assert approximate["approximate"]["method"] == "hll"
+        assert {field: approximate[field] for field in EXACT_KPI_FIELDS} == {field: exact[field] for field in EXACT_KPI_FIELDS}
+
+        tied_categories = db.session.execute(db.text(
+            "SELECT COUNT(DISTINCT category_id) FROM daily_category_sales WHERE sale_date = :day"
+        ), {"day": day}).scalar()
+        assert tied_categories > 1
+        reset_database()
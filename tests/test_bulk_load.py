@@ -0,0 +1,12 @@
+from test_incremental_load import reset_database, load, loaded_state, assert_same_state
+
+def test_staged_bulk_load_matches_row_by_row_load(app, source_dir):
+    with app.app_context():
+        reset_database()
+        load(source_dir)
+        expected = loaded_state(app)
+
+        # Small chunks, so customers, orders and order lines are each staged in several of them
+        reset_database()
+        load(source_dir, bulk=True, chunk_size=97)
+        assert_same_state(loaded_state(app), expected)
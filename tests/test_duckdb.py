@@ -0,0 +1,73 @@
+import os
+import json
+import sys
+import subprocess
+
+import pytest
+
+pytest.importorskip("duckdb_engine")
+
+from test_incremental_load import ANALYTICS_PATHS, reset_database, load, analytics_responses
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# order_items as created on DuckDB before line numbers and order dates
+OLD_ORDER_ITEMS = (
+    "CREATE TABLE order_items (order_item_id INTEGER PRIMARY KEY, order_id VARCHAR(50) NOT NULL, "
+    "product_id INTEGER NOT NULL, quantity INTEGER NOT NULL, unit_price NUMERIC(10, 2) NOT NULL, "
+    "discount NUMERIC(10, 2))"
+)
+
+def run_app(database_path, code=""):
+    """Import the app on a DuckDB database in a new process, as a deployment starts it, then run code"""
+    env = dict(os.environ, DATABASE_URL=f"duckdb:///{database_path}", LOG_LEVEL="WARNING")
+    for name in ("DATABASE_READ_URL", "ANALYTICS_MIRROR_PATH", "ANALYTICS_ENGINE"):
+        env.pop(name, None)
+    script = "from app import app, db\nwith app.app_context():\n    pass\n" + code
+    result = subprocess.run(
+        [sys.executable, "-c", script], cwd=REPO_DIR, env=env, capture_output=True, text=True, timeout=300
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    return result.stdout
+
+def test_app_starts_on_a_new_and_an_old_duckdb_database(tmp_path):
+    database_path = str(tmp_path / "analytics.duckdb")
+    run_app(database_path)
+    # A second start migrates nothing
+    run_app(database_path)
+
+    run_app(database_path, (
+        "    db.session.execute(db.text('DROP TABLE order_items CASCADE'))\n"
+        f"    db.session.execute(db.text({OLD_ORDER_ITEMS!r}))\n"
+        "    db.session.execute(db.text(\"INSERT INTO order_items VALUES (1, 'ORD1', 1, 1, 10, 0), (2, 'ORD1', 2, 1, 10, 0)\"))\n"
+        "    db.session.commit()\n"
+    ))
+    output = run_app(database_path, (
+        "with app.app_context():\n"
+        "    print(db.session.execute(db.text(\n"
+        "        'SELECT order_item_id, line_number FROM order_items ORDER BY order_item_id'\n"
+        "    )).fetchall())\n"
+    ))
+    assert output.strip() == "[(1, 1), (2, 2)]"
+
+def test_duckdb_load_serves_what_sqlite_serves(app, source_dir, tmp_path):
+    with app.app_context():
+        reset_database()
+        load(source_dir, bulk=True)
+        expected = analytics_responses(app)
+
+    # The bulk load stages each chunk through DuckDB's COPY from a spooled CSV file
+    output = run_app(str(tmp_path / "analytics.duckdb"), (
+        "import json\n"
+        "from data_loader import DataLoader\n"
+        "with app.app_context():\n"
+        f"    DataLoader(data_dir={source_dir!r}, bulk=True, chunk_size=500).load_all_data()\n"
+        "client = app.test_client()\n"
+        f"print(json.dumps({{path: client.get(path).get_json() for path in {ANALYTICS_PATHS!r}}}))\n"
+    ))
+    actual = json.loads(output.splitlines()[-1])
+    for path in ANALYTICS_PATHS:
+        if "approx=sample" in path:
+            # Each dialect hashes customer ids with its own function, so samples pick other customers
+            continue
+        assert actual[path] == expected[path], f"{path} differs"
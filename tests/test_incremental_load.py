@@ -0,0 +1,217 @@
+import os
+import shutil
+from decimal import Decimal
+
+import pytest
+
+# Tables a load writes, with the columns that legitimately differ between equivalent loads left out:
+# surrogate ids, build times and which earlier snapshot an RFM snapshot was derived from
+LOADED_TABLES = {
+    "orders": (),
+    "order_items": ("order_item_id",),
+    "daily_product_sales": (),
+    "daily_category_sales": (),
+    "customer_first_purchases": (),
+    "cohort_retention": (),
+    "product_sales_velocity": (),
+    "low_stock_alerts": (),
+    "customer_sketches": (),
+    "rfm_snapshots": (),
+    "rfm_snapshot_runs": ("base_as_of_date", "built_at"),
+}
+
+# Every analytics GET the dashboard uses, exact and approximate, over the generated date range
+ANALYTICS_PATHS = [
+    "/analytics/kpi?date=2024-06-05",
+    "/analytics/kpi?date=2024-06-05&approx=true",
+    "/analytics/kpi-series?start=2024-05-01&end=2024-06-30",
+    "/analytics/revenue-by-month-category?start=2023-01&end=2024-12",
+    "/analytics/repeat-rate?start=2023-01&end=2024-12",
+    "/analytics/repeat-rate?start=2023-01&end=2024-12&approx=true",
+    "/analytics/repeat-rate?start=2023-01&end=2024-12&approx=sample",
+    "/analytics/cohort-retention?start=2023-01&end=2024-12&horizon=12",
+    "/analytics/cohort-retention?start=2023-01&end=2024-12&horizon=12&approx=true",
+    "/analytics/rfm?as_of=2024-06-30",
+    "/analytics/rfm?as_of=2024-12-31",
+    "/analytics/rfm/segments?as_of=2024-06-30",
+    "/analytics/rfm/segments?as_of=2024-12-31",
+    "/analytics/top-products?start=2023-01-01&end=2024-12-31&n=25",
+    "/analytics/low-stock?n=100",
+    "/analytics/order-funnel?start=2023-01-01&end=2024-12-31",
+]
+
+# Share of the orders in the initial load; the rest arrive with the incremental one
+INITIAL_SHARE = 0.6
+
+def reset_database():
+    """Drop and recreate every table, as on a new deployment"""
+    from app import db
+    from partitions import reset_partitions
+    from query_cache import query_cache
+
+    db.session.remove()
+    db.drop_all()
+    db.create_all()
+    reset_partitions()
+    query_cache.invalidate()
+
+def load(data_dir, **options):
+    from data_loader import DataLoader
+    from query_cache import query_cache
+
+    DataLoader(data_dir=data_dir, **options).load_all_data()
+    # The test reads straight after the load, inside the cache's version check interval
+    query_cache.invalidate()
+
+def _plain(value):
+    if isinstance(value, (float, Decimal)):
+        return round(float(value), 6)
+    return value
+
+def table_contents():
+    """Rows of every loaded table, in a stable order"""
+    from app import db
+
+    contents = {}
+    for table, excluded in LOADED_TABLES.items():
+        columns = [column.name for column in db.metadata.tables[table].columns if column.name not in excluded]
+        rows = db.session.execute(db.text(f"SELECT {', '.join(columns)} FROM {table}")).fetchall()
+        contents[table] = sorted((tuple(_plain(value) for value in row) for row in rows), key=repr)
+    db.session.rollback()
+    return contents
+
+def analytics_responses(app):
+    """JSON body of every analytics path"""
+    client = app.test_client()
+    responses = {}
+    for path in ANALYTICS_PATHS:
+        response = client.get(path)
+        assert response.status_code == 200, (path, response.get_data(as_text=True))
+        responses[path] = response.get_json()
+    return responses
+
+def loaded_state(app):
+    responses = analytics_responses(app)
+    return responses, table_contents()
+
+def assert_same_state(actual, expected):
+    actual_responses, actual_tables = actual
+    expected_responses, expected_tables = expected
+    for table in LOADED_TABLES:
+        assert actual_tables[table] == expected_tables[table], f"{table} differs"
+    for path in ANALYTICS_PATHS:
+        assert actual_responses[path] == expected_responses[path], f"{path} differs"
+
+def write_initial_files(source_dir, target_dir):
+    """Copy the source files with orders.csv and order_items.csv cut after the first INITIAL_SHARE of orders.
+
+    Order lines follow their orders, so both cut files are byte prefixes of the full ones, as an
+    append-only export leaves them between two loads.
+    """
+    shutil.copytree(source_dir, target_dir)
+    with open(os.path.join(source_dir, "orders.csv"), "rb") as f:
+        orders = f.readlines()
+    with open(os.path.join(source_dir, "order_items.csv"), "rb") as f:
+        items = f.readlines()
+
+    kept = orders[:1 + int((len(orders) - 1) * INITIAL_SHARE)]
+    order_ids = {line.split(b",", 1)[0] for line in kept[1:]}
+    cut = 1
+    while cut < len(items) and items[cut].split(b",", 1)[0] in order_ids:
+        cut += 1
+    assert not any(line.split(b",", 1)[0] in order_ids for line in items[cut:])
+
+    with open(os.path.join(target_dir, "orders.csv"), "wb") as f:
+        f.writelines(kept)
+    with open(os.path.join(target_dir, "order_items.csv"), "wb") as f:
+        f.writelines(items[:cut])
+    return len(kept) - 1
+
+def copy_order_files(source_dir, target_dir):
+    for filename in ("orders.csv", "order_items.csv"):
+        shutil.copyfile(os.path.join(source_dir, filename), os.path.join(target_dir, filename))
+
+@pytest.mark.parametrize("bulk", [True, False], ids=["bulk", "rows"])
+def test_appended_incremental_load_matches_full_load(app, source_dir, tmp_path, bulk):
+    with app.app_context():
+        reset_database()
+        load(source_dir, bulk=bulk)
+        expected = loaded_state(app)
+
+        data_dir = str(tmp_path / "data")
+        write_initial_files(source_dir, data_dir)
+        reset_database()
+        load(data_dir, bulk=bulk)
+        # Cached results of the initial data must not survive the incremental load
+        analytics_responses(app)
+        copy_order_files(source_dir, data_dir)
+        load(data_dir, bulk=bulk, incremental=True)
+
+        assert_same_state(loaded_state(app), expected)
+
+@pytest.mark.parametrize("bulk", [True, False], ids=["bulk", "rows"])
+def test_replaying_the_same_files_changes_nothing(app, source_dir, bulk):
+    from app import db
+    from models import LoadWatermark
+
+    with app.app_context():
+        reset_database()
+        load(source_dir, bulk=bulk)
+        expected = loaded_state(app)
+
+        load(source_dir, bulk=bulk)
+        assert_same_state(loaded_state(app), expected)
+
+        # Without watermarks an incremental load reads every row again and upserts it on its key
+        db.session.query(LoadWatermark).delete()
+        db.session.commit()
+        load(source_dir, bulk=bulk, incremental=True)
+        assert_same_state(loaded_state(app), expected)
+
+def test_rewritten_file_is_rescanned_by_key(app, source_dir, tmp_path):
+    from app import db
+
+    data_dir = str(tmp_path / "data")
+    initial_orders = write_initial_files(source_dir, data_dir)
+
+    # The rewritten export changes the last order of the initial load, which is inside the hashed tail,
+    # and adds a late order dated before its customer's first order, so the customer's cohort moves.
+    # An order line for an order that is in neither file is dropped by both loads.
+    rewritten_dir = str(tmp_path / "rewritten")
+    shutil.copytree(source_dir, rewritten_dir)
+    with open(os.path.join(rewritten_dir, "orders.csv"), "rb") as f:
+        orders = f.readlines()
+    changed = orders[initial_orders].rstrip(b"\r\n").split(b",")
+    changed[3], changed[5] = b"canceled", b"refunded"
+    orders[initial_orders] = b",".join(changed) + b"\r\n"
+    customer_id = orders[1].split(b",")[1].decode()
+    orders.append(f"ORD9999999999,{customer_id},2023-01-02 10:00:00,delivered,50.00,paid\r\n".encode())
+    with open(os.path.join(rewritten_dir, "orders.csv"), "wb") as f:
+        f.writelines(orders)
+    with open(os.path.join(rewritten_dir, "order_items.csv"), "ab") as f:
+        f.write(b"ORD9999999999,1,2,25.00,0.00\r\n")
+        f.write(b"ORD9999999998,1,1,25.00,0.00\r\n")
+
+    with app.app_context():
+        reset_database()
+        load(rewritten_dir, bulk=True)
+        expected = loaded_state(app)
+
+        reset_database()
+        load(data_dir, bulk=True)
+        analytics_responses(app)
+        copy_order_files(rewritten_dir, data_dir)
+        load(data_dir, bulk=True, incremental=True)
+        actual = loaded_state(app)
+
+        assert_same_state(actual, expected)
+        assert db.session.execute(db.text(
+            "SELECT COUNT(*) FROM order_items i WHERE NOT EXISTS "
+            "(SELECT 1 FROM orders o WHERE o.order_id = i.order_id)"
+        )).scalar() == 0
+        assert db.session.execute(db.text(
+            "SELECT order_status FROM orders WHERE order_id = :order_id"
+        ), {"order_id": changed[0].decode()}).scalar() == "canceled"
+        assert db.session.execute(db.text(
+            "SELECT cohort_month FROM customer_first_purchases WHERE customer_id = :customer_id"
+        ), {"customer_id": customer_id}).scalar().startswith("2023-01")
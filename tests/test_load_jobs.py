@@ -0,0 +1,53 @@
+from test_incremental_load import reset_database
+
+def test_cancel_stops_a_bulk_load_after_the_staged_chunk_and_rolls_back(app, source_dir, monkeypatch):
+    from app import db
+    from data_loader import DataLoader
+    from load_jobs import LoadJob, LOAD_MODES, _run_job
+
+    job = LoadJob("bulk", dict(LOAD_MODES["bulk"], data_dir=source_dir, chunk_size=100))
+    staged = []
+    stage_chunk = DataLoader._stage_chunk
+
+    def cancel_after_first_chunk(self, table, *args):
+        staged.append(table)
+        count = stage_chunk(self, table, *args)
+        if table == "orders":
+            # As if the cancel request arrived during this chunk's COPY
+            job.cancel()
+        return count
+
+    monkeypatch.setattr(DataLoader, "_stage_chunk", cancel_after_first_chunk)
+    with app.app_context():
+        reset_database()
+        db.session.remove()
+        _run_job(app, job)
+
+        assert job.status == "canceled"
+        assert staged.count("orders") == 1
+        assert "order_items" not in staged
+        # The whole load ran in one transaction, so not even the tables loaded before orders are kept
+        assert db.session.execute(db.text("SELECT COUNT(*) FROM customers")).scalar() == 0
+        db.session.rollback()
+
+def test_cancel_route_stops_a_queued_load_before_it_writes(app, source_dir, monkeypatch):
+    import load_jobs
+    from app import db
+    from load_jobs import LoadJob, LOAD_MODES, _run_job
+
+    job = LoadJob("rows", dict(LOAD_MODES["rows"], data_dir=source_dir))
+    monkeypatch.setitem(load_jobs._jobs, job.id, job)
+    client = app.test_client()
+    with app.app_context():
+        reset_database()
+        db.session.remove()
+
+        response = client.post(f"/load-jobs/{job.id}/cancel")
+        assert response.status_code == 202 and response.get_json()["status"] == "canceling"
+        _run_job(app, job)
+
+        assert client.get(f"/load-jobs/{job.id}").get_json()["status"] == "canceled"
+        assert db.session.execute(db.text("SELECT COUNT(*) FROM categories")).scalar() == 0
+        db.session.rollback()
+        assert client.post(f"/load-jobs/{job.id}/cancel").status_code == 409
+        assert client.post("/load-jobs/unknown/cancel").status_code == 404
@@ -0,0 +1,54 @@
+import csv
+import os
+import shutil
+
+from test_incremental_load import reset_database, load
+
+LOW_STOCK_PATH = "/analytics/low-stock?n=100"
+
+def set_stock(data_dir, on_hand):
+    """Rewrite inventory.csv with new on-hand quantities for some products"""
+    path = os.path.join(data_dir, "inventory.csv")
+    with open(path, newline="") as f:
+        header, *rows = csv.reader(f)
+    with open(path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in rows:
+            if int(row[0]) in on_hand:
+                row[1] = str(on_hand[int(row[0])])
+            writer.writerow(row)
+
+def test_an_inventory_only_load_rebuilds_the_alerts(app, source_dir, tmp_path):
+    from app import db
+
+    client = app.test_client()
+    data_dir = str(tmp_path / "data")
+    shutil.copytree(source_dir, data_dir)
+    with app.app_context():
+        reset_database()
+        load(data_dir, bulk=True)
+        alerts = client.get(LOW_STOCK_PATH).get_json()
+        assert alerts
+        ranks = [(alert["urgency_rank"], alert["on_hand_qty"], alert["product_id"]) for alert in alerts]
+        assert ranks == sorted(ranks)
+
+        alerted = {alert["product_id"] for alert in alerts}
+        active = db.session.execute(db.text(
+            "SELECT product_id FROM products WHERE is_active = true ORDER BY product_id"
+        )).scalars().all()
+        db.session.rollback()
+        sold_out = next(product_id for product_id in active if product_id not in alerted)
+        restocked = alerts[-1]["product_id"]
+
+        set_stock(data_dir, {sold_out: 0, restocked: 100000})
+        load(data_dir, bulk=True, incremental=True)
+        updated = client.get(LOW_STOCK_PATH).get_json()
+        urgency = {alert["product_id"]: alert["urgency"] for alert in updated}
+
+        assert urgency[sold_out] == "Out of Stock"
+        assert restocked not in urgency
+
+        reset_database()
+        load(data_dir, bulk=True)
+        assert client.get(LOW_STOCK_PATH).get_json() == updated
@@ -0,0 +1,46 @@
+from test_incremental_load import reset_database
+
+# order_items as created before line numbers and order dates
+OLD_ORDER_ITEMS = """
+CREATE TABLE order_items (
+    order_item_id INTEGER NOT NULL PRIMARY KEY,
+    order_id VARCHAR(50) NOT NULL REFERENCES orders (order_id),
+    product_id INTEGER NOT NULL REFERENCES products (product_id),
+    quantity INTEGER NOT NULL,
+    unit_price NUMERIC(10, 2) NOT NULL,
+    discount NUMERIC(10, 2)
+)
+"""
+
+def test_old_order_items_are_numbered_without_deleting_rows(app):
+    from app import db
+    from migrations import migrate
+
+    with app.app_context():
+        reset_database()
+        db.session.execute(db.text("DROP TABLE order_items"))
+        db.session.execute(db.text(OLD_ORDER_ITEMS))
+        db.session.execute(db.text(
+            "INSERT INTO orders (order_id, customer_id, order_date, order_status, payment_amount, payment_status) "
+            "VALUES ('ORD1', 'CUST1', '2024-03-01 10:00:00', 'paid', 30, 'paid')"
+        ))
+        # Two lines of ORD1, loaded twice by the old loader
+        for _ in range(2):
+            db.session.execute(db.text(
+                "INSERT INTO order_items (order_id, product_id, quantity, unit_price, discount) "
+                "VALUES ('ORD1', 1, 1, 10, 0), ('ORD1', 2, 2, 10, 0)"
+            ))
+        db.session.commit()
+
+        assert migrate() == ["add_order_item_line_numbers", "add_order_item_order_dates"]
+        # Reload copies cannot be told from repeated lines, so every row is kept and numbered
+        rows = db.session.execute(db.text(
+            "SELECT line_number, product_id, order_date FROM order_items ORDER BY line_number"
+        )).fetchall()
+        assert [(row[0], row[1], row[2][:19]) for row in rows] == [
+            (1, 1, "2024-03-01 10:00:00"), (2, 2, "2024-03-01 10:00:00"),
+            (3, 1, "2024-03-01 10:00:00"), (4, 2, "2024-03-01 10:00:00"),
+        ]
+        assert migrate() == []
+
+        reset_database()
@@ -0,0 +1,79 @@
+import csv
+import io
+import json
+
+from test_incremental_load import reset_database, load
+
+TOP_PRODUCTS = {"start": "2023-01-01", "end": "2024-12-31", "n": 100}
+
+def pages(client, path, params, page_size):
+    """Every page of a keyset-paged GET, following next_cursor to the end"""
+    rows = []
+    cursor = None
+    while True:
+        query = dict(params, page_size=page_size)
+        if cursor is not None:
+            query["cursor"] = cursor
+        response = client.get(path, query_string=query)
+        assert response.status_code == 200, response.get_data(as_text=True)
+        body = response.get_json()
+        rows.extend(body["data"])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return rows
+        assert len(body["data"]) == page_size
+
+def test_keyset_pages_and_streams_return_the_whole_result(app, source_dir):
+    client = app.test_client()
+    with app.app_context():
+        reset_database()
+        load(source_dir)
+        expected = client.get("/analytics/top-products", query_string=TOP_PRODUCTS).get_json()
+        assert len(expected) > 7
+
+        # Several pages, then one page holding exactly every row, so no cursor follows it
+        for page_size in (7, len(expected)):
+            assert pages(client, "/analytics/top-products", TOP_PRODUCTS, page_size) == expected
+
+        ndjson = client.get("/analytics/top-products", query_string=dict(TOP_PRODUCTS, format="ndjson"))
+        assert [json.loads(line) for line in ndjson.get_data(as_text=True).splitlines()] == expected
+
+        text = client.get("/analytics/top-products", query_string=dict(TOP_PRODUCTS, format="csv"))
+        header, *rows = csv.reader(io.StringIO(text.get_data(as_text=True)))
+        assert sorted(header) == sorted(expected[0]) and len(rows) == len(expected)
+
+        response = client.get("/analytics/top-products", query_string=dict(TOP_PRODUCTS, cursor="not-a-cursor"))
+        assert response.status_code == 400
+
+def test_batch_returns_what_each_query_returns_alone(app, source_dir):
+    from routes import BATCH_ROUTES
+
+    client = app.test_client()
+    queries = [
+        {"name": "kpi", "params": {"date": "2024-06-05"}},
+        {"id": "top_margin", "name": "top_products", "params": TOP_PRODUCTS},
+        {"id": "top_page", "name": "top_products", "params": dict(TOP_PRODUCTS, page_size=5)},
+        {"name": "low_stock", "params": {"n": 100, "format": "columnar"}},
+        {"name": "rfm_segments", "params": {"as_of": "2024-06-30"}},
+    ]
+    with app.app_context():
+        reset_database()
+        load(source_dir)
+        response = client.post("/analytics/batch", json={"queries": queries})
+        assert response.status_code == 200
+        results = response.get_json()["results"]
+
+        assert set(results) == {"kpi", "top_margin", "top_page", "low_stock", "rfm_segments"}
+        for query in queries:
+            result = results[query.get("id", query["name"])]
+            alone = client.get(BATCH_ROUTES[query["name"]], query_string=query["params"])
+            assert result["status"] == alone.status_code == 200
+            assert result["data"] == alone.get_json()
+
+        for invalid in (
+            {"queries": []},
+            {"queries": [{"name": "orders"}]},
+            {"queries": [{"name": "kpi", "params": {"format": "csv"}}]},
+            {"queries": [{"name": "kpi"}, {"name": "kpi"}]},
+        ):
+            assert client.post("/analytics/batch", json=invalid).status_code == 400
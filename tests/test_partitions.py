@@ -0,0 +1,44 @@
+from test_incremental_load import reset_database, load, analytics_responses
+
+def row_counts(*tables):
+    from app import db
+
+    counts = {table: db.session.execute(db.text(f"SELECT COUNT(*) FROM {table}")).scalar() for table in tables}
+    db.session.rollback()
+    return counts
+
+def test_archived_years_stay_queryable_and_late_rows_join_their_archive(app, source_dir):
+    from app import db
+    from partitions import archive_before, archived_years
+    from query_cache import query_cache
+
+    with app.app_context():
+        reset_database()
+        load(source_dir)
+        expected = analytics_responses(app)
+        totals = row_counts("orders", "order_items")
+
+        assert archive_before("2024-03-15") == [2023]
+        assert archived_years() == [2023]
+        counts = row_counts("orders", "order_items", "orders_archive_2023", "order_items_archive_2023",
+                            "orders_all", "order_items_all")
+        assert counts["orders"] and counts["orders_archive_2023"]
+        assert counts["orders"] + counts["orders_archive_2023"] == counts["orders_all"] == totals["orders"]
+        assert counts["order_items_all"] == totals["order_items"]
+        assert db.session.execute(db.text(
+            "SELECT COUNT(*) FROM orders WHERE order_date < '2024-01-01'"
+        )).scalar() == 0
+
+        query_cache.invalidate()
+        assert analytics_responses(app) == expected
+
+        # Replaying the files writes 2023 rows to the live tables again; the load moves them back,
+        # replacing the archived copies rather than adding to them
+        load(source_dir)
+        assert row_counts("orders_all", "order_items_all") == {
+            "orders_all": totals["orders"], "order_items_all": totals["order_items"]
+        }
+        assert row_counts("orders", "orders_archive_2023") == {
+            "orders": counts["orders"], "orders_archive_2023": counts["orders_archive_2023"]
+        }
+        assert analytics_responses(app) == expected
@@ -0,0 +1,24 @@
+from test_incremental_load import reset_database, load
+
+LOW_STOCK_PATH = "/analytics/low-stock?n=100"
+
+def test_a_data_version_bump_by_another_process_clears_cached_results(app, source_dir, monkeypatch):
+    from app import db
+    from query_cache import query_cache
+
+    monkeypatch.setattr(query_cache, "version_check_interval", 0.0)
+    client = app.test_client()
+    with app.app_context():
+        reset_database()
+        load(source_dir)
+        alerts = client.get(LOW_STOCK_PATH).get_json()
+        assert alerts
+
+        # Another worker's load: the data and the version change, but this process's cache is not told
+        db.session.execute(db.text("DELETE FROM low_stock_alerts"))
+        db.session.commit()
+        assert client.get(LOW_STOCK_PATH).get_json() == alerts
+
+        db.session.execute(db.text("UPDATE data_version SET version = version + 1 WHERE id = 1"))
+        db.session.commit()
+        assert client.get(LOW_STOCK_PATH).get_json() == []
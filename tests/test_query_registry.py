@@ -0,0 +1,51 @@
+import os
+import sys
+import shutil
+import subprocess
+
+import pytest
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def copy_queries(tmp_path):
+    query_dir = str(tmp_path / "queries")
+    shutil.copytree(os.path.join(REPO_DIR, "queries"), query_dir)
+    return query_dir
+
+@pytest.mark.parametrize("dialect", ["sqlite", "postgresql", "duckdb"])
+def test_every_query_compiles_including_subdirectories(app, dialect):
+    from query_registry import QueryRegistry
+
+    registry = QueryRegistry(os.path.join(REPO_DIR, "queries"))
+    registry.configure(dialect)
+    registry.load_all()
+    assert {"kpi", "approx/kpi", "approx/sampled_customers"} <= set(registry.names())
+    assert not any(name.startswith("maintenance/") for name in registry.names())
+
+def test_a_subdirectory_query_that_does_not_translate_fails_the_load(app, tmp_path):
+    from query_registry import QueryRegistry
+    from sql_dialects import QueryTranslationError
+
+    query_dir = copy_queries(tmp_path)
+    with open(os.path.join(query_dir, "approx", "broken.sql"), "w") as f:
+        f.write("SELECT COUNT(* FROM orders")
+
+    registry = QueryRegistry(query_dir)
+    registry.configure("sqlite")
+    with pytest.raises(QueryTranslationError, match="approx/broken.sql"):
+        registry.load_all()
+
+def test_app_does_not_start_with_a_query_that_does_not_translate(tmp_path):
+    # The registry reads queries/ relative to the working directory, as a deployment runs the app
+    query_dir = copy_queries(tmp_path)
+    with open(os.path.join(query_dir, "broken.sql"), "w") as f:
+        f.write("SELECT COUNT(* FROM orders")
+
+    env = dict(os.environ, PYTHONPATH=REPO_DIR, DATABASE_URL=f"sqlite:///{tmp_path / 'analytics.db'}")
+    for name in ("DATABASE_READ_URL", "ANALYTICS_MIRROR_PATH", "ANALYTICS_ENGINE"):
+        env.pop(name, None)
+    result = subprocess.run(
+        [sys.executable, "-c", "import app"], cwd=str(tmp_path), env=env, capture_output=True, text=True, timeout=300
+    )
+    assert result.returncode != 0
+    assert "QueryTranslationError" in result.stderr and "broken.sql" in result.stderr
@@ -0,0 +1,24 @@
+from datetime import datetime, timedelta
+
+from test_incremental_load import reset_database, load
+
+def test_if_modified_since_before_today_is_revalidated(app, source_dir):
+    from app import db
+    from query_cache import query_cache
+
+    client = app.test_client()
+    with app.app_context():
+        reset_database()
+        load(source_dir)
+        # The last load finished two days ago: a response fetched yesterday may have defaulted to yesterday
+        db.session.execute(db.text("UPDATE data_version SET updated_at = :updated_at"),
+                           {"updated_at": datetime.utcnow() - timedelta(days=2)})
+        db.session.commit()
+        query_cache.invalidate()
+
+        yesterday = (datetime.utcnow() - timedelta(days=1)).strftime("%a, %d %b %Y %H:%M:%S GMT")
+        response = client.get("/analytics/kpi", headers={"If-Modified-Since": yesterday})
+        assert response.status_code == 200
+
+        response = client.get("/analytics/kpi", headers={"If-Modified-Since": response.headers["Last-Modified"]})
+        assert response.status_code == 304
@@ -0,0 +1,35 @@
+from test_incremental_load import reset_database, load
+
+RFM_PATHS = ["/analytics/rfm?as_of={}", "/analytics/rfm/segments?as_of={}"]
+
+def snapshot_dates():
+    from app import db
+
+    dates = db.session.execute(db.text("SELECT as_of_date FROM rfm_snapshot_runs")).scalars().all()
+    db.session.rollback()
+    return sorted(str(value)[:10] for value in dates)
+
+def test_requests_serve_dates_without_a_snapshot_live(app, source_dir):
+    from app import db
+    from query_cache import query_cache
+
+    client = app.test_client()
+    with app.app_context():
+        reset_database()
+        load(source_dir)
+        built = snapshot_dates()
+        assert len(built) == 12 and all(day.endswith(("28", "29", "30", "31")) for day in built)
+        as_of = built[-1]
+
+        from_snapshot = {path: client.get(path.format(as_of)).get_data() for path in RFM_PATHS}
+        for path in RFM_PATHS:
+            client.get(path.format("2024-06-15"))
+        assert snapshot_dates() == built
+
+        db.session.execute(db.text("DELETE FROM rfm_snapshots"))
+        db.session.execute(db.text("DELETE FROM rfm_snapshot_runs"))
+        db.session.commit()
+        query_cache.invalidate()
+        live = {path: client.get(path.format(as_of)).get_data() for path in RFM_PATHS}
+        assert live == from_snapshot
+        assert snapshot_dates() == []